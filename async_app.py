@@ -0,0 +1,86 @@
+import os
+import json
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+import test_api_walk_4 as service
+
+# ASGI front end: รับคำขอแบบ async แล้วส่งการค้นหาไปทำใน process pool ไม่ให้ event loop ถูกบล็อก
+# รันด้วย: uvicorn async_app:app --host 0.0.0.0 --port 5000
+SEARCH_PROCESSES = int(os.environ.get("SEARCH_PROCESSES", os.cpu_count() or 1))
+
+# process ใน pool เริ่มจาก forkserver (ดู service.POOL_CONTEXT) ไม่ fork ขณะที่ event loop และ watcher ทำงานอยู่
+EXECUTOR = ProcessPoolExecutor(SEARCH_PROCESSES, mp_context=service.POOL_CONTEXT)
+EXECUTOR_VERSION = service.route_data().version
+
+
+def get_executor(data):
+    """pool ที่โหลดกราฟชุด data เมื่อกราฟถูกโหลดใหม่จะสร้าง pool ใหม่ (pool เดิมทำงานที่ค้างจนเสร็จ)"""
+    global EXECUTOR, EXECUTOR_VERSION
+    if EXECUTOR_VERSION != data.version:
+        previous = EXECUTOR
+        EXECUTOR = ProcessPoolExecutor(SEARCH_PROCESSES, mp_context=service.POOL_CONTEXT)
+        EXECUTOR_VERSION = data.version
+        previous.shutdown(wait=False)
+    return EXECUTOR
+
+
+async def read_body(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body", False):
+            return body
+
+
+async def send_json(send, body, status):
+    payload = json.dumps(body, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())],
+    })
+    await send({"type": "http.response.body", "body": payload})
+
+
+async def find_paths(receive):
+    try:
+        data = json.loads(await read_body(receive) or b"{}")
+    except ValueError:
+        return {"error": "⚠️ body ต้องเป็น JSON"}, 400
+    if not isinstance(data, dict):
+        return {"error": "⚠️ body ต้องเป็น JSON object"}, 400
+
+    with service.using_route_data() as route_data:
+        params, error = service.parse_path_request(data)
+    if error is not None:
+        return error
+    # งบเวลา CPU ถูกบังคับใน worker (solve_path_request รันใน main thread ของ worker)
+    # ส่ง disruption รุ่นปัจจุบันไปด้วยเพราะ worker ไม่ได้ตรวจไฟล์ disruption และไม่เห็นการอัปเดต
+    return await asyncio.get_running_loop().run_in_executor(
+        get_executor(route_data), service.solve_pooled_request, params, route_data.disruptions.current)
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        while True:
+            message = await receive()
+            if message["type"] == "lifespan.startup":
+                service.start_watchers()
+                await send({"type": "lifespan.startup.complete"})
+            elif message["type"] == "lifespan.shutdown":
+                EXECUTOR.shutdown(wait=False, cancel_futures=True)
+                await send({"type": "lifespan.shutdown.complete"})
+                return
+
+    if scope["type"] != "http":
+        return
+
+    route = (scope["method"], scope["path"])
+    if route == ("POST", "/find_paths"):
+        body, status = await find_paths(receive)
+    elif route == ("GET", "/health"):
+        body, status = {"status": "OK", "search_processes": SEARCH_PROCESSES, "graph": service.GRAPHS.stats()}, 200
+    else:
+        body, status = {"error": "⚠️ ไม่พบ endpoint"}, 404
+    await send_json(send, body, status)
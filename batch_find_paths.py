@@ -0,0 +1,28 @@
+import sys
+import json
+import time
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้ (ผลลัพธ์ออก stdout ข้อความสถานะออก stderr)
+sys.stdout.reconfigure(encoding='utf-8')
+
+if len(sys.argv) < 2:
+    print("วิธีใช้: python batch_find_paths.py <requests.jsonl> [จำนวน process]", file=sys.stderr)
+    sys.exit(1)
+
+INPUT_PATH = sys.argv[1]
+PROCESSES = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+if __name__ == '__main__':
+    # ข้อความระหว่างค้นหาของ service ถูกส่งไป stderr เพื่อให้ stdout เป็น NDJSON ล้วน
+    stdout = sys.stdout
+    sys.stdout = sys.stderr
+    from test_api_walk_4 import run_batch
+
+    with open(INPUT_PATH, encoding='utf-8') as file:
+        items = [json.loads(line) for line in file if line.strip()]
+
+    t0 = time.perf_counter()
+    for result in run_batch(items, PROCESSES):
+        stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+        stdout.flush()
+    print(f"✅ ค้นหา {len(items)} คำขอเสร็จใน {time.perf_counter() - t0:.2f} วินาที", file=sys.stderr)
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import random
+from graph_store import load_graph
+from path_search import k_shortest_feasible_paths
+from heuristics import load_stop_coords, fastest_speed, geographic_bounds, build_landmarks, landmark_bounds, \
+    landmark_path, load_landmarks, save_landmarks
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+NUM_PAIRS = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+GRAPHML_PATH = 'graph/graph_updated.graphml'
+LANDMARK_PATH = landmark_path(GRAPHML_PATH)
+WALK_THRESHOLD = 2
+
+G = load_graph(GRAPHML_PATH, compiled=True)
+lats, lons = load_stop_coords("namtang-gtfs", G)
+speed = fastest_speed(G, lats, lons)
+print(f"🏎️ ความเร็วเส้นตรงสูงสุดบน edge: {speed:.1f} m/s")
+
+if os.path.exists(LANDMARK_PATH):
+    landmarks = load_landmarks(LANDMARK_PATH)
+else:
+    t0 = time.perf_counter()
+    landmarks = build_landmarks(G, lats, lons)
+    print(f"🗺️ คำนวณ landmark: {time.perf_counter() - t0:.2f} วินาที")
+    save_landmarks(landmarks, LANDMARK_PATH)
+
+modes = {
+    "dijkstra": lambda target: None,
+    "astar": lambda target: geographic_bounds(lats, lons, speed, target),
+    "alt": lambda target: landmark_bounds(landmarks, target),
+}
+
+random.seed(42)
+stop_ids = list(G.index)
+# ใช้เฉพาะคู่ที่มีเส้นทางถึงกัน คู่ที่ไปไม่ถึงจบเร็วทุกโหมดจึงไม่ช่วยให้เห็นความต่าง
+pairs = []
+while len(pairs) < NUM_PAIRS:
+    start, end = random.sample(stop_ids, 2)
+    if k_shortest_feasible_paths(G, start, end, k=1, walk_threshold=WALK_THRESHOLD):
+        pairs.append((start, end))
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+for k in (1, 5):
+    print(f"🔍 k = {k} บน {len(pairs)} คู่ป้าย")
+    baseline = {}
+    for mode, heuristic_for in modes.items():
+        times, expanded, mismatches = [], [], 0
+        for start, end in pairs:
+            stats = {}
+            t0 = time.perf_counter()
+            paths = k_shortest_feasible_paths(G, start, end, k=k, walk_threshold=WALK_THRESHOLD,
+                                              heuristic=heuristic_for(G.index[end]), stats=stats)
+            times.append(time.perf_counter() - t0)
+            expanded.append(stats["nodes_expanded"])
+            costs = [cost for cost, _, _ in paths]
+            if mode == "dijkstra":
+                baseline[start, end] = costs
+            elif costs != baseline[start, end]:
+                mismatches += 1
+        print(f"  {mode:>8}: node ที่ขยาย p50 {percentile(expanded, 0.5):,} p99 {percentile(expanded, 0.99):,}"
+              f" | เวลา p50 {percentile(times, 0.5) * 1000:.1f} ms p99 {percentile(times, 0.99) * 1000:.1f} ms"
+              f" | cost ไม่ตรงกับ dijkstra {mismatches}")
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import random
+import pandas as pd
+import networkx as nx
+from graph_store import load_graph
+from contraction import build_contraction_hierarchy, ch_shortest_path, hierarchy_path, load_contraction_hierarchy, \
+    save_contraction_hierarchy
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+NUM_PAIRS = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+GRAPHML_PATH = 'graph/graph_updated.graphml'
+CH_PATH = hierarchy_path(GRAPHML_PATH)
+
+G_nx = nx.read_graphml(GRAPHML_PATH)
+G = load_graph(GRAPHML_PATH, compiled=True)
+
+if os.path.exists(CH_PATH):
+    ch = load_contraction_hierarchy(CH_PATH)
+else:
+    t0 = time.perf_counter()
+    ch = build_contraction_hierarchy(G)
+    print(f"🏔️ สร้าง Contraction Hierarchies: {time.perf_counter() - t0:.2f} วินาที")
+    save_contraction_hierarchy(ch, CH_PATH)
+print(f"📦 edges เดิม {G.number_of_edges()}, หลังเพิ่ม shortcut {len(ch['up_indices']) + len(ch['down_indices'])}")
+
+# สุ่มคู่ป้ายจาก stops.txt ที่อยู่ในกราฟ
+stops = pd.read_csv("namtang-gtfs/stops.txt", dtype={'stop_id': str})
+stop_ids = [stop_id for stop_id in stops['stop_id'] if stop_id in G]
+random.seed(42)
+pairs = [tuple(random.sample(stop_ids, 2)) for _ in range(NUM_PAIRS)]
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+nx_times, ch_times = [], []
+mismatches = 0
+for start, end in pairs:
+    t0 = time.perf_counter()
+    try:
+        nx_path = next(nx.shortest_simple_paths(G_nx, start, end, weight='weight'))
+        nx_cost = nx.path_weight(G_nx, nx_path, 'weight')
+    except nx.NetworkXNoPath:
+        nx_cost = None
+    nx_times.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    best = ch_shortest_path(ch, G, start, end)
+    ch_times.append(time.perf_counter() - t0)
+
+    ch_cost = best[0] if best is not None else None
+    if nx_cost != ch_cost:
+        mismatches += 1
+        print(f"  ❌ {start} → {end}: networkx {nx_cost}, CH {ch_cost}")
+
+print(f"🐢 nx.shortest_simple_paths (เส้นแรก): p50 {percentile(nx_times, 0.5):.2f} ms, p99 {percentile(nx_times, 0.99):.2f} ms")
+print(f"🚀 Contraction Hierarchies: p50 {percentile(ch_times, 0.5):.2f} ms, p99 {percentile(ch_times, 0.99):.2f} ms")
+print(f"🔍 cost ไม่ตรงกัน: {mismatches}/{len(pairs)}")
@@ -0,0 +1,56 @@
+import os
+import sys
+import time
+import random
+import logging
+import statistics
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+NUM_PAIRS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+MAX_PATHS = 5
+
+import test_api_walk_4 as service
+from search_log import TRACE, request_log
+
+# เขียน log ทิ้งไปที่ /dev/null เพื่อวัดเฉพาะต้นทุนการสร้าง record ไม่ใช่ความเร็วของ terminal
+devnull = open(os.devnull, 'w', encoding='utf-8')
+for handler in service.LOG.handlers:
+    handler.setStream(devnull)
+# ปิดการสร้างต้นไม้ของต้นทาง ไม่เช่นนั้นรอบที่สองของแต่ละคู่จะได้ต้นไม้ไปใช้
+service.SPT_CACHE.min_requests = float('inf')
+
+random.seed(42)
+stop_ids = list(service.route_data().G.index)
+requests = []
+while len(requests) < NUM_PAIRS:
+    start, end = random.sample(stop_ids, 2)
+    params, error = service.parse_path_request({"start_station": start, "end_station": end, "max_paths": MAX_PATHS})
+    if error is None:
+        requests.append(params)
+
+
+def solve(params, level):
+    service.LOG.setLevel(level)
+    # ล้าง cache ทุกครั้งเพื่อให้ทุกรอบค้นหาจริง
+    service.RESULT_CACHE.clear()
+    t0 = time.perf_counter()
+    with request_log(service.LOG, "/find_paths"):
+        service.solve_path_request(params)
+    return time.perf_counter() - t0
+
+
+timings = {"INFO": [], "TRACE": []}
+for params in requests:
+    # สลับลำดับระหว่างสองโหมดในทุกคู่ ไม่ให้ผลของ cache ของ CPU เข้าข้างโหมดใดโหมดหนึ่ง
+    for name, level in (("INFO", logging.INFO), ("TRACE", TRACE)):
+        timings[name].append(solve(params, level))
+
+print(f"📊 {len(requests)} คำขอ (max_paths={MAX_PATHS})")
+for name, values in timings.items():
+    values = sorted(values)
+    print(f"   {name:<5} เฉลี่ย {statistics.mean(values) * 1000:.2f} ms, p50 {values[len(values) // 2] * 1000:.2f} ms,"
+          f" รวม {sum(values):.3f} วินาที")
+overhead = sum(timings["TRACE"]) / sum(timings["INFO"]) - 1
+print(f"⚖️ TRACE ช้ากว่า INFO {overhead * 100:.1f}%")
@@ -0,0 +1,44 @@
+import os
+import sys
+import time
+import random
+import numpy as np
+from graph_store import load_graph
+from path_search import k_shortest_feasible_paths
+from matrix import travel_time_matrix
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+SIZES = [int(size) for size in sys.argv[1:]] or [100, 1000]
+WALK_THRESHOLD = 2
+PROCESSES = os.cpu_count() or 1
+
+if __name__ == '__main__':
+    G = load_graph('graph/graph_updated.graphml', compiled=True)
+    random.seed(42)
+    stop_ids = list(G.index)
+
+    for size in SIZES:
+        origins = random.sample(stop_ids, size)
+        destinations = random.sample(stop_ids, size)
+        print(f"🧮 เมทริกซ์ {size} × {size}")
+
+        results = {}
+        for processes in sorted({1, PROCESSES}):
+            t0 = time.perf_counter()
+            results[processes] = travel_time_matrix(G, origins, destinations, WALK_THRESHOLD, processes=processes)
+            elapsed = time.perf_counter() - t0
+            print(f"  {processes} process: {elapsed:.2f} วินาที ({size * size / elapsed:,.0f} คู่/วินาที,"
+                  f" {elapsed / size * 1000:.1f} ms ต่อต้นทาง)")
+        times = results[1]
+        assert all(np.array_equal(times, other) for other in results.values())
+
+        # ตรวจกับ k_shortest_feasible_paths (k=1) บางคู่
+        mismatches = 0
+        for _ in range(50):
+            i, j = random.randrange(size), random.randrange(size)
+            paths = k_shortest_feasible_paths(G, origins[i], destinations[j], k=1, walk_threshold=WALK_THRESHOLD)
+            expected = paths[0][0] if paths else (0 if origins[i] == destinations[j] else np.inf)
+            mismatches += expected != times[i, j]
+        print(f"  ไปถึงได้ {int(np.isfinite(times).sum()):,} คู่, ไม่ตรงกับ k_shortest_feasible_paths {mismatches}/50")
@@ -0,0 +1,68 @@
+import sys
+import time
+import numpy as np
+from walking_edges import haversine_m
+from stop_index import StopIndex, normalize_name
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+NUM_QUERIES = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+K = 5
+
+t0 = time.perf_counter()
+index = StopIndex.from_gtfs('namtang-gtfs')
+print(f"🏗️ สร้างดัชนี {len(index)} ป้ายใน {time.perf_counter() - t0:.2f} วินาที")
+
+rng = np.random.default_rng(0)
+located = np.flatnonzero(np.isfinite(index.lats))
+# จุดค้นหาสุ่มรอบป้ายจริง (ห่างไม่เกินราว 1 กม.)
+picked = rng.choice(located, NUM_QUERIES)
+lats = index.lats[picked] + rng.uniform(-0.01, 0.01, NUM_QUERIES)
+lons = index.lons[picked] + rng.uniform(-0.01, 0.01, NUM_QUERIES)
+
+
+def brute_force_nearest(lat, lon, k):
+    distances = haversine_m(lat, lon, index.lats[located], index.lons[located])
+    order = np.argsort(distances, kind='stable')[:k]
+    return located[order].tolist()
+
+
+t0 = time.perf_counter()
+nearest = [index.nearest(lat, lon, K) for lat, lon in zip(lats.tolist(), lons.tolist())]
+grid_seconds = time.perf_counter() - t0
+t0 = time.perf_counter()
+expected = [brute_force_nearest(lat, lon, K) for lat, lon in zip(lats.tolist(), lons.tolist())]
+brute_seconds = time.perf_counter() - t0
+print(f"📍 nearest (k={K}): grid {grid_seconds / NUM_QUERIES * 1000:.3f} ms/ครั้ง, "
+      f"เทียบทุกป้าย {brute_seconds / NUM_QUERIES * 1000:.3f} ms/ครั้ง")
+
+# ป้ายที่ระยะเท่ากันอาจสลับลำดับได้ จึงเทียบระยะแทน stop
+mismatched = sum(
+    not np.allclose([distance for _, distance in got],
+                    haversine_m(lat, lon, index.lats[want], index.lons[want]))
+    for got, want, lat, lon in zip(nearest, expected, lats.tolist(), lons.tolist())
+)
+print("✅ ผลตรงกับการเทียบทุกป้าย" if mismatched == 0 else f"❌ ผลต่างกัน {mismatched} ครั้ง")
+
+# คำค้นจากชื่อป้ายจริง: ทั้งชื่อ, 3-6 ตัวอักษรแรกของชื่อไทย/อังกฤษ และชื่อที่พิมพ์ผิดหนึ่งตัว
+queries = []
+for idx in rng.choice(len(index), NUM_QUERIES).tolist():
+    name_th, name_en = index.names[idx]
+    name = normalize_name(name_en if name_en and rng.random() < 0.5 else name_th)
+    if not name:
+        continue
+    kind = rng.integers(3)
+    if kind == 0:
+        queries.append(name)
+    elif kind == 1:
+        queries.append(name[:int(rng.integers(3, 7))])
+    else:
+        typo = int(rng.integers(len(name)))
+        queries.append(name[:typo] + "x" + name[typo + 1:])
+
+t0 = time.perf_counter()
+found = [index.search(query, 10) for query in queries]
+search_seconds = time.perf_counter() - t0
+print(f"🔎 search: {search_seconds / len(queries) * 1000:.3f} ms/ครั้ง "
+      f"(พบผลลัพธ์ {sum(1 for results in found if results)}/{len(queries)} คำค้น)")
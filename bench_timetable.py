@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import random
+from datetime import datetime
+from timetable import build_timetable, save_timetable, load_timetable
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+NUM_LOOKUPS = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+GTFS_DIR = "namtang-gtfs"
+TIMETABLE_PATH = "graph/timetable.npz"
+
+t0 = time.perf_counter()
+timetable = build_timetable(GTFS_DIR)
+print(f"🕒 สร้างตารางเวลาจาก GTFS: {time.perf_counter() - t0:.2f} วินาที "
+      f"({len(timetable.keys)} กลุ่ม, {len(timetable.window_start)} ช่วงเวลา, {len(timetable.offset_stop)} ป้าย)")
+
+os.makedirs(os.path.dirname(TIMETABLE_PATH), exist_ok=True)
+save_timetable(timetable, TIMETABLE_PATH)
+t0 = time.perf_counter()
+timetable = load_timetable(TIMETABLE_PATH)
+print(f"💾 โหลดจากไฟล์ {TIMETABLE_PATH}: {(time.perf_counter() - t0) * 1000:.1f} มิลลิวินาที")
+
+array_bytes = sum(getattr(timetable, name).nbytes for name in
+                  ("window_ptr", "window_start", "window_end", "window_headway",
+                   "offset_ptr", "offset_stop", "offset_seconds"))
+print(f"📦 ขนาด array ทั้งหมด: {array_bytes / 1024:.1f} KB")
+
+# สุ่มคำค้นหา (กลุ่ม, ป้ายในกลุ่ม, เวลา) ล่วงหน้า เพื่อวัดเฉพาะเวลาค้นหา
+random.seed(42)
+queries = []
+for _ in range(NUM_LOOKUPS):
+    i = random.randrange(len(timetable.keys))
+    route_id, direction_id, service_id = timetable.keys[i]
+    stops = timetable.offset_stops[i]
+    stop_id = timetable.stop_ids[random.choice(stops)] if stops else None
+    queries.append((route_id, direction_id, service_id, stop_id, random.randrange(5 * 3600, 24 * 3600)))
+
+t0 = time.perf_counter()
+found = 0
+for route_id, direction_id, service_id, stop_id, seconds in queries:
+    if timetable.next_departure(route_id, direction_id, service_id, stop_id, seconds) is not None:
+        found += 1
+elapsed = time.perf_counter() - t0
+print(f"🚌 next_departure: {NUM_LOOKUPS / elapsed:,.0f} ครั้ง/วินาที ({elapsed / NUM_LOOKUPS * 1e6:.2f} µs ต่อครั้ง, พบรถ {found})")
+
+wait = timetable.wait_function(datetime(2025, 3, 17, 7, 30))
+t0 = time.perf_counter()
+for route_id, _, _, stop_id, seconds in queries:
+    wait(route_id, seconds - 7 * 3600, stop_id)
+elapsed = time.perf_counter() - t0
+print(f"⏳ wait (เวลารอเฉลี่ย): {NUM_LOOKUPS / elapsed:,.0f} ครั้ง/วินาที ({elapsed / NUM_LOOKUPS * 1e6:.2f} µs ต่อครั้ง)")
@@ -0,0 +1,69 @@
+import sys
+import time
+import random
+from graph_store import load_graph, shortest_simple_paths
+from route_edges import assign_routes
+from transfer_search import pareto_transfer_paths
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+NUM_PAIRS = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+MAX_PATHS = 20
+WALK_THRESHOLD = 2
+MAX_SKIPPED = 10
+
+
+def yen_pipeline(G, start, end):
+    """ขั้นตอนเดิม: ไล่ Yen's กรองการเดิน แล้วเรียงตามจำนวนเปลี่ยนสายทีหลัง"""
+    all_paths = []
+    skipped_paths = 0
+    try:
+        for path in shortest_simple_paths(G, start, end):
+            if len(all_paths) >= MAX_PATHS:
+                break
+            walk_count = sum(1 for i in range(len(path) - 1) if G[path[i]][path[i + 1]]['route_id'] == "WALK")
+            if walk_count > WALK_THRESHOLD:
+                skipped_paths += 1
+                if skipped_paths >= MAX_SKIPPED:
+                    break
+                continue
+            assigned_routes, num_route_changes = assign_routes(G, path)
+            all_paths.append((num_route_changes, sum(time for _, time in assigned_routes)))
+    except Exception:
+        return []
+    return sorted(all_paths)
+
+
+G = load_graph('graph/graph_updated.graphml', compiled=True)
+
+random.seed(42)
+stop_ids = list(G.index)
+pairs = [tuple(random.sample(stop_ids, 2)) for _ in range(NUM_PAIRS)]
+
+print(f"⏱️ เปรียบเทียบบน {len(pairs)} คู่ป้าย...")
+yen_times, pareto_times = [], []
+fewer_changes = 0
+for start, end in pairs:
+    t0 = time.perf_counter()
+    yen_paths = yen_pipeline(G, start, end)
+    yen_times.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    pareto_paths = pareto_transfer_paths(G, start, end, walk_threshold=WALK_THRESHOLD)
+    pareto_times.append(time.perf_counter() - t0)
+
+    if pareto_paths and (not yen_paths or pareto_paths[0][0] < yen_paths[0][0]):
+        fewer_changes += 1
+    print(f"  {start} → {end} | Yen's: {yen_paths[:1]} {yen_times[-1] * 1000:.1f} ms"
+          f" | Pareto: {[(p[0], p[1]) for p in pareto_paths]} {pareto_times[-1] * 1000:.1f} ms")
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+print(f"🐢 Yen's + เรียงทีหลัง: p50 {percentile(yen_times, 0.5):.1f} ms, p99 {percentile(yen_times, 0.99):.1f} ms")
+print(f"🚀 Pareto (RAPTOR): p50 {percentile(pareto_times, 0.5):.1f} ms, p99 {percentile(pareto_times, 0.99):.1f} ms")
+print(f"🔁 คู่ที่ Pareto พบเส้นทางเปลี่ยนสายน้อยกว่า: {fewer_changes}/{len(pairs)}")
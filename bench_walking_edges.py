@@ -0,0 +1,64 @@
+import sys
+import time
+import pandas as pd
+from geopy.distance import geodesic
+from walking_edges import WALKING_SPEED, WALKING_DISTANCE_THRESHOLD, build_walking_edges
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+# ลูปเดิมใช้เวลาหลายชั่วโมงกับป้ายทั้งหมด จึงเทียบบนป้ายชุดย่อย (ค่าเริ่มต้น 2,000 ป้าย)
+SAMPLE_SIZE = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+
+def old_walking_edges(stop_ids, lats, lons):
+    """ลูป O(n²) แบบเดิมจาก create_graph.py"""
+    edges = []
+    for i in range(len(stop_ids)):
+        for j in range(i + 1, len(stop_ids)):
+            distance = geodesic((lats[i], lons[i]), (lats[j], lons[j])).meters
+            if distance <= WALKING_DISTANCE_THRESHOLD:
+                walking_time = int(distance / WALKING_SPEED)
+                edges.append((stop_ids[i], stop_ids[j], walking_time))
+                edges.append((stop_ids[j], stop_ids[i], walking_time))
+    return edges
+
+
+stops = pd.read_csv('namtang-gtfs/stops.txt')
+
+# เลือกป้ายที่อยู่ใกล้จุดกึ่งกลางของข้อมูลมากที่สุด เพื่อให้มีคู่ที่เดินถึงกันจำนวนมาก
+center_lat, center_lon = stops['stop_lat'].median(), stops['stop_lon'].median()
+order = ((stops['stop_lat'] - center_lat) ** 2 + (stops['stop_lon'] - center_lon) ** 2).argsort()
+sample = stops.iloc[order[:SAMPLE_SIZE]]
+
+stop_ids = sample['stop_id'].astype(str).tolist()
+lats = sample['stop_lat'].tolist()
+lons = sample['stop_lon'].tolist()
+
+print(f"⏱️ เปรียบเทียบการสร้างเส้นทางเดินบน {len(stop_ids)} ป้าย...")
+
+t0 = time.perf_counter()
+old_edges = old_walking_edges(stop_ids, lats, lons)
+old_seconds = time.perf_counter() - t0
+print(f"🐢 ลูปเดิม: {old_seconds:.2f} วินาที ({len(old_edges)} edges)")
+
+t0 = time.perf_counter()
+new_edges = build_walking_edges(stop_ids, lats, lons)
+new_seconds = time.perf_counter() - t0
+print(f"🚀 grid index: {new_seconds:.2f} วินาที ({len(new_edges)} edges)")
+
+if set(old_edges) == set(new_edges):
+    print("✅ edges และ weight ตรงกันทุกเส้น")
+else:
+    print(f"❌ edges ไม่ตรงกัน: ขาด {len(set(old_edges) - set(new_edges))} เกิน {len(set(new_edges) - set(old_edges))}")
+
+print(f"📈 เร็วขึ้น {old_seconds / new_seconds:.1f} เท่า")
+
+# ประมาณเวลาของลูปเดิมบนป้ายทั้งหมด (เพิ่มขึ้นตามจำนวนคู่)
+full_pairs = len(stops) * (len(stops) - 1) / 2
+sample_pairs = len(stop_ids) * (len(stop_ids) - 1) / 2
+print(f"🧮 ลูปเดิมบนป้ายทั้งหมด {len(stops)} ป้าย จะใช้ประมาณ {old_seconds * full_pairs / sample_pairs / 3600:.1f} ชั่วโมง")
+
+t0 = time.perf_counter()
+all_edges = build_walking_edges(stops['stop_id'], stops['stop_lat'], stops['stop_lon'])
+print(f"🚀 grid index บนป้ายทั้งหมด: {time.perf_counter() - t0:.2f} วินาที ({len(all_edges)} edges)")
@@ -0,0 +1,54 @@
+import os
+import sys
+import time
+import networkx as nx
+from graph_store import compile_graph, compiled_path, save_compiled_graph, load_compiled_graph
+from timetable import build_timetable, save_timetable
+from contraction import build_contraction_hierarchy, hierarchy_path, save_contraction_hierarchy
+from heuristics import load_stop_coords, build_landmarks, landmark_path, save_landmarks
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+# ไฟล์ GraphML ที่จะคอมไพล์ (ค่าเริ่มต้นคือไฟล์ที่ modify_weight.py เขียนไว้)
+GRAPHML_PATH = sys.argv[1] if len(sys.argv) > 1 else "graph/graph_updated.graphml"
+BIN_PATH = compiled_path(GRAPHML_PATH)
+CH_PATH = hierarchy_path(GRAPHML_PATH)
+LANDMARK_PATH = landmark_path(GRAPHML_PATH)
+TIMETABLE_PATH = os.path.join(os.path.dirname(GRAPHML_PATH), "timetable.npz")
+GTFS_DIR = "namtang-gtfs"
+
+print(f"📥 กำลังโหลดกราฟจาก {GRAPHML_PATH}...")
+t0 = time.perf_counter()
+G = nx.read_graphml(GRAPHML_PATH)
+print(f"✅ โหลด GraphML เสร็จใน {time.perf_counter() - t0:.2f} วินาที ({G.number_of_nodes()} nodes, {G.number_of_edges()} edges)")
+
+print("🧱 กำลังคอมไพล์กราฟเป็น CSR...")
+save_compiled_graph(compile_graph(G), BIN_PATH)
+
+t0 = time.perf_counter()
+compiled = load_compiled_graph(BIN_PATH)
+print(f"⚡ โหลดไฟล์ที่คอมไพล์แล้วด้วย memmap ใน {(time.perf_counter() - t0) * 1000:.1f} มิลลิวินาที")
+
+print(f"✅ กราฟถูกบันทึกในไฟล์ {BIN_PATH}")
+
+# Contraction Hierarchies สำหรับหาเส้นทางที่สั้นที่สุดเส้นแรกแบบเร็ว (ต้องสร้างใหม่ทุกครั้งที่น้ำหนักเปลี่ยน)
+print("🏔️ กำลังสร้าง Contraction Hierarchies...")
+t0 = time.perf_counter()
+ch = build_contraction_hierarchy(compiled)
+save_contraction_hierarchy(ch, CH_PATH)
+print(f"✅ สร้างเสร็จใน {time.perf_counter() - t0:.2f} วินาที "
+      f"({len(ch['up_indices']) + len(ch['down_indices'])} edges รวม shortcut) บันทึกในไฟล์ {CH_PATH}")
+
+# ระยะทางจาก/ไปยัง landmark สำหรับค้นหาแบบ ALT
+print("🗺️ กำลังคำนวณระยะทางของ landmark...")
+t0 = time.perf_counter()
+lats, lons = load_stop_coords(GTFS_DIR, compiled)
+landmarks = build_landmarks(compiled, lats, lons)
+save_landmarks(landmarks, LANDMARK_PATH)
+print(f"✅ {len(landmarks['landmarks'])} landmarks เสร็จใน {time.perf_counter() - t0:.2f} วินาที บันทึกในไฟล์ {LANDMARK_PATH}")
+
+# ตารางเวลาของสายที่วิ่งตามความถี่ บันทึกไว้ข้างไฟล์กราฟ
+print(f"🕒 กำลังสร้างตารางเวลาจาก {GTFS_DIR}...")
+save_timetable(build_timetable(GTFS_DIR), TIMETABLE_PATH)
+print(f"✅ ตารางเวลาถูกบันทึกในไฟล์ {TIMETABLE_PATH}")
@@ -0,0 +1,237 @@
+import os
+import heapq
+import numpy as np
+
+# จำกัดขนาด witness search ตอนตัด node (ค้นหาน้อยลง = preprocessing เร็วขึ้น แต่อาจได้ shortcut เกิน)
+WITNESS_SETTLE_LIMIT = 60
+
+ARRAY_DTYPES = {
+    "rank": np.int32,          # ลำดับการตัด node (สูง = สำคัญ)
+    "up_indptr": np.int64,     # edge u → v ที่ rank[v] > rank[u] จัดเก็บตาม u
+    "up_indices": np.int32,
+    "up_weights": np.int32,
+    "up_middle": np.int32,     # node กลางของ shortcut (-1 คือ edge จริง)
+    "down_indptr": np.int64,   # edge u → v ที่ rank[u] > rank[v] จัดเก็บตาม v (ใช้ค้นหาย้อนจากปลายทาง)
+    "down_indices": np.int32,
+    "down_weights": np.int32,
+    "down_middle": np.int32,
+}
+
+
+def witness_exists(out_adj, contracted, source, target, skip, limit_cost):
+    """มีเส้นทางจาก source ไป target ที่ไม่ผ่าน skip และ cost ไม่เกิน limit_cost หรือไม่ (ค้นหาแบบจำกัดขนาด)"""
+    dist = {source: 0}
+    heap = [(0, source)]
+    settled = 0
+    while heap and settled < WITNESS_SETTLE_LIMIT:
+        d, u = heapq.heappop(heap)
+        if d > limit_cost:
+            return False
+        if u == target:
+            return True
+        if d > dist.get(u, float('inf')):
+            continue
+        settled += 1
+        for v, (w, _) in out_adj[u].items():
+            if v == skip or contracted[v]:
+                continue
+            nd = d + w
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return dist.get(target, float('inf')) <= limit_cost
+
+
+def needed_shortcuts(out_adj, in_adj, contracted, v):
+    """shortcut ที่ต้องเพิ่มถ้าตัด node v ออก: list ของ (u, x, weight)"""
+    shortcuts = []
+    incoming = [(u, w) for u, (w, _) in in_adj[v].items() if not contracted[u]]
+    outgoing = [(x, w) for x, (w, _) in out_adj[v].items() if not contracted[x]]
+    for u, w_in in incoming:
+        for x, w_out in outgoing:
+            if u == x:
+                continue
+            weight = w_in + w_out
+            existing = out_adj[u].get(x)
+            if existing is not None and existing[0] <= weight:
+                continue
+            if not witness_exists(out_adj, contracted, u, x, v, weight):
+                shortcuts.append((u, x, weight))
+    return shortcuts
+
+
+def build_contraction_hierarchy(graph):
+    """
+    ทำ Contraction Hierarchies บน CompiledGraph
+    เลือกลำดับการตัด node ด้วย edge difference + จำนวนเพื่อนบ้านที่ถูกตัดไปแล้ว (lazy update)
+    คืนค่า dict ของ array ตาม ARRAY_DTYPES
+    """
+    n = graph.number_of_nodes()
+    out_adj = [dict() for _ in range(n)]
+    in_adj = [dict() for _ in range(n)]
+    indptr, indices, weights = graph.indptr.tolist(), graph.indices.tolist(), graph.weights.tolist()
+    for u in range(n):
+        for k in range(indptr[u], indptr[u + 1]):
+            v, w = indices[k], weights[k]
+            if u != v:
+                out_adj[u][v] = (w, -1)
+                in_adj[v][u] = (w, -1)
+
+    contracted = [False] * n
+    deleted_neighbours = [0] * n
+
+    def priority(v):
+        shortcuts = needed_shortcuts(out_adj, in_adj, contracted, v)
+        removed = sum(1 for u in in_adj[v] if not contracted[u]) + sum(1 for x in out_adj[v] if not contracted[x])
+        return len(shortcuts) - removed + deleted_neighbours[v], shortcuts
+
+    heap = [(priority(v)[0], v) for v in range(n)]
+    heapq.heapify(heap)
+    rank = [0] * n
+    next_rank = 0
+
+    while heap:
+        _, v = heapq.heappop(heap)
+        if contracted[v]:
+            continue
+        current, shortcuts = priority(v)
+        if heap and current > heap[0][0]:
+            heapq.heappush(heap, (current, v))
+            continue
+
+        for u, x, weight in shortcuts:
+            out_adj[u][x] = (weight, v)
+            in_adj[x][u] = (weight, v)
+        contracted[v] = True
+        rank[v] = next_rank
+        next_rank += 1
+        for neighbour in set(in_adj[v]) | set(out_adj[v]):
+            if not contracted[neighbour]:
+                deleted_neighbours[neighbour] += 1
+
+    up = [[] for _ in range(n)]
+    down = [[] for _ in range(n)]
+    for u in range(n):
+        for v, (w, middle) in out_adj[u].items():
+            if rank[v] > rank[u]:
+                up[u].append((v, w, middle))
+            else:
+                down[v].append((u, w, middle))
+
+    def to_csr(rows, prefix):
+        ptr = [0]
+        for row in rows:
+            row.sort()
+            ptr.append(ptr[-1] + len(row))
+        flat = [edge for row in rows for edge in row]
+        return {
+            f"{prefix}_indptr": np.asarray(ptr, dtype=np.int64),
+            f"{prefix}_indices": np.asarray([edge[0] for edge in flat], dtype=np.int32),
+            f"{prefix}_weights": np.asarray([edge[1] for edge in flat], dtype=np.int32),
+            f"{prefix}_middle": np.asarray([edge[2] for edge in flat], dtype=np.int32),
+        }
+
+    arrays = {"rank": np.asarray(rank, dtype=np.int32)}
+    arrays.update(to_csr(up, "up"))
+    arrays.update(to_csr(down, "down"))
+    return arrays
+
+
+def hierarchy_path(graphml_path):
+    """ชื่อไฟล์ Contraction Hierarchies ที่คู่กับไฟล์ GraphML"""
+    return os.path.splitext(graphml_path)[0] + ".ch.npz"
+
+
+def save_contraction_hierarchy(arrays, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **arrays)
+    os.replace(tmp_path, path)
+
+
+def load_contraction_hierarchy(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in ARRAY_DTYPES}
+
+
+def ch_edge(ch, u, v):
+    """weight และ node กลางของ edge u → v ใน hierarchy"""
+    if ch["rank"][v] > ch["rank"][u]:
+        prefix, row, target = "up", u, v
+    else:
+        prefix, row, target = "down", v, u
+    a, b = int(ch[f"{prefix}_indptr"][row]), int(ch[f"{prefix}_indptr"][row + 1])
+    k = a + int(np.searchsorted(ch[f"{prefix}_indices"][a:b], target))
+    return int(ch[f"{prefix}_weights"][k]), int(ch[f"{prefix}_middle"][k])
+
+
+def unpack_edge(ch, u, v):
+    """แตก shortcut u → v กลับเป็นลำดับ node ของ edge จริง (ไม่รวม u)"""
+    stack = [(u, v)]
+    nodes = []
+    while stack:
+        a, b = stack.pop()
+        _, middle = ch_edge(ch, a, b)
+        if middle < 0:
+            nodes.append(b)
+        else:
+            stack.append((middle, b))
+            stack.append((a, middle))
+    return nodes
+
+
+def ch_shortest_path(ch, graph, source, target):
+    """
+    ค้นหาแบบสองทิศทางบน Contraction Hierarchies (ขึ้นไปหา node ที่ rank สูงกว่าเท่านั้นทั้งสองฝั่ง)
+    คืนค่า (cost, path เป็น list ของ stop_id) หรือ None ถ้าไปไม่ถึง
+    """
+    index = graph.index
+    if source not in index or target not in index:
+        return None
+    source, target = index[source], index[target]
+    if source == target:
+        return 0, [graph.stop_ids[source]]
+
+    sides = [
+        (ch["up_indptr"], ch["up_indices"], ch["up_weights"], {source: 0}, {source: -1}, [(0, source)]),
+        (ch["down_indptr"], ch["down_indices"], ch["down_weights"], {target: 0}, {target: -1}, [(0, target)]),
+    ]
+    best, meeting = float('inf'), -1
+
+    while any(side[5] for side in sides):
+        for side, other in ((sides[0], sides[1]), (sides[1], sides[0])):
+            ptr, idx, wts, dist, pred, heap = side
+            if not heap:
+                continue
+            d, u = heapq.heappop(heap)
+            if d > dist.get(u, float('inf')):
+                continue
+            if d >= best:
+                heap.clear()
+                continue
+            if u in other[3] and d + other[3][u] < best:
+                best, meeting = d + other[3][u], u
+            a, b = int(ptr[u]), int(ptr[u + 1])
+            for v, w in zip(idx[a:b].tolist(), wts[a:b].tolist()):
+                nd = d + w
+                if nd < dist.get(v, float('inf')):
+                    dist[v] = nd
+                    pred[v] = u
+                    heapq.heappush(heap, (nd, v))
+
+    if meeting < 0:
+        return None
+
+    forward = [meeting]
+    while sides[0][4][forward[-1]] != -1:
+        forward.append(sides[0][4][forward[-1]])
+    forward.reverse()
+    backward = [meeting]
+    while sides[1][4][backward[-1]] != -1:
+        backward.append(sides[1][4][backward[-1]])
+
+    hierarchy_path = forward + backward[1:]
+    path = [hierarchy_path[0]]
+    for u, v in zip(hierarchy_path, hierarchy_path[1:]):
+        path.extend(unpack_edge(ch, u, v))
+    return best, [graph.stop_ids[node] for node in path]
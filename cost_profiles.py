@@ -0,0 +1,221 @@
+import os
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+PROFILE_CACHE_SIZE = 32  # จำนวน profile ที่เก็บ array ไว้ (profile ละ 9 ไบต์ × จำนวน edge: weight และ walk_edges)
+
+# route_type ของ GTFS ที่ใช้ใน namtang-gtfs
+ROUTE_TYPES = {"tram": 0, "subway": 1, "rail": 2, "bus": 3, "boat": 4}
+WALK_ROUTE_TYPE = -1  # edge เดินและสายที่ไม่พบใน routes.txt
+
+
+class CostProfile:
+    """
+    วิธีคิด cost ของการค้นหา ใช้คูณทับ weight ของกราฟตอนค้นหาโดยไม่แก้กราฟ
+    - walk_multiplier: ตัวคูณของ edge WALK (weight ในกราฟผ่าน modify_weight.py มาแล้ว ค่านี้คูณเพิ่มจากนั้น)
+    - transfer_penalty: วินาทีที่บวกเมื่อเปลี่ยนสายระหว่าง edge ที่ติดกัน (รวมถึงขึ้น/ลงจากการเดิน)
+    - route_type_factors: ตัวคูณตาม route_type ของ routes.txt เช่น {2: 0.8} ให้รถไฟคิดเวลา 80%
+    """
+
+    def __init__(self, walk_multiplier=1.0, transfer_penalty=0, route_type_factors=None):
+        self.walk_multiplier = float(walk_multiplier)
+        self.transfer_penalty = float(transfer_penalty)
+        self.route_type_factors = {int(route_type): float(factor) for route_type, factor in (route_type_factors or {}).items()}
+
+    @property
+    def key(self):
+        return (self.walk_multiplier, self.transfer_penalty, tuple(sorted(self.route_type_factors.items())))
+
+    @property
+    def is_default(self):
+        return self.walk_multiplier == 1 and self.transfer_penalty == 0 and all(
+            factor == 1 for factor in self.route_type_factors.values())
+
+    def min_factor(self):
+        """ตัวคูณที่น้อยที่สุดของ profile ใช้ย่อ lower bound ของ A* / ALT ให้ยังไม่เกินค่าจริง"""
+        return min([1.0, self.walk_multiplier, *self.route_type_factors.values()])
+
+    def __eq__(self, other):
+        return isinstance(other, CostProfile) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return (f"CostProfile(walk_multiplier={self.walk_multiplier}, transfer_penalty={self.transfer_penalty}, "
+                f"route_type_factors={dict(sorted(self.route_type_factors.items()))})")
+
+    def to_dict(self):
+        return {
+            "walk_multiplier": self.walk_multiplier,
+            "transfer_penalty": self.transfer_penalty,
+            "route_type_factors": {str(route_type): factor for route_type, factor in sorted(self.route_type_factors.items())},
+        }
+
+
+PROFILES = {
+    "default": CostProfile(),
+    "less_walking": CostProfile(walk_multiplier=2.0),
+    "fewer_transfers": CostProfile(transfer_penalty=300),
+    "prefer_rail": CostProfile(route_type_factors={ROUTE_TYPES["tram"]: 0.8, ROUTE_TYPES["subway"]: 0.8, ROUTE_TYPES["rail"]: 0.8}),
+    "prefer_bus": CostProfile(route_type_factors={ROUTE_TYPES["bus"]: 0.8}),
+    "avoid_boat": CostProfile(route_type_factors={ROUTE_TYPES["boat"]: 1.5}),
+}
+
+
+def parse_profile(value):
+    """
+    แปลงค่า cost_profile ของคำขอเป็น CostProfile
+    value เป็นชื่อใน PROFILES หรือ dict ของพารามิเตอร์ (ใส่ "base" เพื่อเริ่มจาก profile ที่มีชื่อแล้วปรับบางค่า)
+    ข้อมูลไม่ถูกต้องจะเกิด ValueError
+    """
+    if value is None:
+        return PROFILES["default"]
+    if isinstance(value, str):
+        if value not in PROFILES:
+            raise ValueError(f"ไม่พบ cost_profile ชื่อ {value} (มี {', '.join(PROFILES)})")
+        return PROFILES[value]
+    if not isinstance(value, dict):
+        raise ValueError("cost_profile ต้องเป็นชื่อ profile หรือ object ของพารามิเตอร์")
+
+    unknown = set(value) - {"base", "walk_multiplier", "transfer_penalty", "route_type_factors"}
+    if unknown:
+        raise ValueError(f"ไม่รู้จักพารามิเตอร์ของ cost_profile: {', '.join(sorted(unknown))}")
+    base = parse_profile(value.get("base", "default"))
+    params = {
+        "walk_multiplier": value.get("walk_multiplier", base.walk_multiplier),
+        "transfer_penalty": value.get("transfer_penalty", base.transfer_penalty),
+        "route_type_factors": {**base.route_type_factors},
+    }
+    factors = value.get("route_type_factors", {})
+    if not isinstance(factors, dict):
+        raise ValueError("route_type_factors ต้องเป็น object ของ route_type (หรือชื่อ เช่น bus) กับตัวคูณ")
+    for route_type, factor in factors.items():
+        route_type = ROUTE_TYPES.get(route_type, route_type)
+        try:
+            params["route_type_factors"][int(route_type)] = factor
+        except ValueError:
+            raise ValueError(f"route_type ไม่ถูกต้อง: {route_type}") from None
+
+    for number in [params["walk_multiplier"], *params["route_type_factors"].values()]:
+        if isinstance(number, bool) or not isinstance(number, (int, float)) or number <= 0:
+            raise ValueError("ตัวคูณของ cost_profile ต้องเป็นตัวเลขที่มากกว่า 0")
+    penalty = params["transfer_penalty"]
+    if isinstance(penalty, bool) or not isinstance(penalty, (int, float)) or penalty < 0:
+        raise ValueError("transfer_penalty ต้องเป็นตัวเลขที่ไม่ติดลบ")
+    return CostProfile(**params)
+
+
+def load_route_types(gtfs_dir, graph):
+    """route_type ของแต่ละรหัสสายใน graph.route_names (WALK และสายที่ไม่พบเป็น WALK_ROUTE_TYPE)"""
+    routes = pd.read_csv(os.path.join(gtfs_dir, "routes.txt"), dtype={'route_id': str})
+    route_type_of = dict(zip(routes['route_id'], routes['route_type'].astype(int)))
+    return np.asarray([route_type_of.get(name, WALK_ROUTE_TYPE) for name in graph.route_names], dtype=np.int32)
+
+
+def profile_weights(graph, route_types, profile, disruptions=None):
+    """
+    weight ของทุก edge ภายใต้ profile (คำนวณทั้ง array ครั้งเดียว)
+    คือค่าน้อยที่สุดของ (เวลาของสาย × ตัวคูณของสาย) ในทุกสายบน edge สายที่ได้ลดตัวคูณจึงชนะสายหลักที่เร็วกว่าได้
+    คืนค่า (weights, walk_edges) โดย walk_edges บอกว่าสายที่ให้ weight นั้นของแต่ละ edge เป็น WALK หรือไม่
+    (ใช้นับจำนวนครั้งที่เดินให้ตรงกับ weight แทนสายหลักของ edge)
+
+    disruptions (DisruptionOverlay ถ้ามี) คิดเฉพาะสายที่ยังเปิด โดยเวลาของสายรวมความล่าช้าของสายและของ edge
+    ก่อนคูณตัวคูณ edge ที่ปิดหรือไม่มีสายเปิดเหลือเป็น inf (ใช้แทน edge_deltas ซึ่งเทียบกับ weight ของกราฟ)
+    """
+    code_factors = np.ones(len(graph.route_names), dtype=np.float64)
+    for route_type, factor in profile.route_type_factors.items():
+        code_factors[route_types == route_type] = factor
+    if graph.walk_code >= 0:
+        code_factors[graph.walk_code] = profile.walk_multiplier
+    code_delays = np.zeros(len(graph.route_names), dtype=np.float64)
+    edge_delays = np.zeros(len(graph.weights), dtype=np.float64)
+    if disruptions is not None:
+        code_of = {name: code for code, name in enumerate(graph.route_names)}
+        for route_id, seconds in disruptions.route_delays.items():
+            if route_id in code_of:
+                code_delays[code_of[route_id]] = seconds
+        for route_id in disruptions.closed_routes:
+            if route_id in code_of:
+                code_delays[code_of[route_id]] = np.inf
+        for k, seconds in disruptions.ride_deltas(graph).items():
+            edge_delays[k] = seconds
+    route_codes = np.asarray(graph.route_codes)
+    weights = (np.asarray(graph.weights, dtype=np.float64) + code_delays[route_codes] + edge_delays) * code_factors[route_codes]
+    walk_edges = route_codes == graph.walk_code
+    # edge ที่ไม่มีรายการสาย (ไม่ควรเกิดจาก compile_graph) ใช้ตัวคูณของสายหลักตามเดิม
+    route_ptr = np.asarray(graph.route_ptr)
+    has_routes = np.diff(route_ptr) > 0
+    if has_routes.any():
+        route_list = np.asarray(graph.route_list)
+        entry_edges = np.repeat(np.arange(len(has_routes)), np.diff(route_ptr))
+        entry_weights = (np.asarray(graph.route_min_times, dtype=np.float64) + code_delays[route_list]
+                         + edge_delays[entry_edges]) * code_factors[route_list]
+        starts = route_ptr[:-1][has_routes]
+        cheapest = np.minimum.reduceat(entry_weights, starts)
+        weights[has_routes] = cheapest
+        # ตำแหน่งแรกของสายที่ให้ค่าน้อยที่สุดในแต่ละ edge (เสมอกันใช้สายที่มาก่อน คือสายที่เร็วกว่า)
+        positions = np.arange(len(entry_weights))
+        is_cheapest = entry_weights == np.repeat(cheapest, np.diff(route_ptr)[has_routes])
+        first = np.minimum.reduceat(np.where(is_cheapest, positions, len(entry_weights)), starts)
+        walk_edges[has_routes] = route_list[first] == graph.walk_code
+    return weights, walk_edges
+
+
+class ProfileWeightCache:
+    """
+    เก็บ array weight ที่คำนวณแล้วต่อ profile (ใช้ร่วมกันทุกคำขอ ไม่คัดลอกกราฟ)
+    ลบ profile ที่ใช้ล่าสุดนานที่สุดเมื่อเกิน max_entries และล้างทั้งหมดเมื่อ version ของกราฟเปลี่ยน
+    """
+
+    def __init__(self, route_types, max_entries=PROFILE_CACHE_SIZE):
+        self.route_types = route_types
+        self.max_entries = max_entries
+        self.weights = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, graph, profile, version=None, disruptions=None):
+        """
+        (weights, walk_edges) ของ profile (ดู profile_weights)
+        หรือ None สำหรับ profile ที่ไม่เปลี่ยน weight (ใช้ graph.weights กับ edge_deltas ได้เลย)
+        disruptions ที่มี edge_deltas ถูกรวมเข้าใน weight และเก็บแยกตามรุ่นของ disruption
+        """
+        if profile.walk_multiplier == 1 and all(factor == 1 for factor in profile.route_type_factors.values()):
+            return None
+        if disruptions is not None and not disruptions.edge_deltas:
+            disruptions = None
+        key = (profile.walk_multiplier, tuple(sorted(profile.route_type_factors.items())),
+               disruptions.version if disruptions is not None else None)
+        with self.lock:
+            if version != self.version:
+                self.weights.clear()
+                self.version = version
+            cached = self.weights.get(key)
+            if cached is not None:
+                self.weights.move_to_end(key)
+                self.hits += 1
+                return cached
+            self.misses += 1
+
+        cached = profile_weights(graph, self.route_types, profile, disruptions)
+        for array in cached:
+            array.setflags(write=False)
+        with self.lock:
+            if version == self.version:
+                self.weights[key] = cached
+                while len(self.weights) > self.max_entries:
+                    self.weights.popitem(last=False)
+        return cached
+
+    def stats(self):
+        return {
+            "profiles": len(self.weights),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
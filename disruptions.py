@@ -0,0 +1,298 @@
+import os
+import json
+import fcntl
+import hashlib
+import threading
+import numpy as np
+
+DISRUPTION_POLL_SECONDS = 5  # ความถี่ในการตรวจไฟล์ disruption ที่ถูกแก้ไข
+
+
+class DisruptionOverlay:
+    """
+    สถานะ disruption หนึ่งรุ่น (อ่านอย่างเดียว ไม่ถูกแก้หลังสร้าง) วางทับกราฟที่โหลดอยู่โดยไม่แก้กราฟ
+
+    - closed_stops / closed_edges ((from, to)) / closed_routes: ปิดใช้งาน
+    - edge_delays {(from, to): วินาที} / route_delays {route_id: วินาที}: เวลาที่เพิ่มขึ้น
+    - edge_deltas {ตำแหน่ง edge: วินาทีที่บวกเพิ่มจาก weight ของกราฟ} (inf = ผ่านไม่ได้) ใช้ตอนค้นหา
+    - version: hash ของเนื้อหา (ปิด/ล่าช้า) ทุก process ที่ได้ disruption ชุดเดียวกันจึงได้รุ่นเดียวกัน
+      และใช้เป็นส่วนหนึ่งของ key ใน cache ที่ใช้ร่วมกันหลาย worker ได้
+
+    คำขอที่เริ่มแล้วถือ reference ของรุ่นเดิมไว้จนจบ การอัปเดตจึงไม่กระทบคำขอที่กำลังค้นหาอยู่
+    """
+
+    def __init__(self, closed_stops=frozenset(), closed_edges=frozenset(), closed_routes=frozenset(),
+                 edge_delays=None, route_delays=None, edge_deltas=None):
+        self.closed_stops = frozenset(closed_stops)
+        self.closed_edges = frozenset(closed_edges)
+        self.closed_routes = frozenset(closed_routes)
+        self.edge_delays = dict(edge_delays or {})
+        self.route_delays = dict(route_delays or {})
+        self.edge_deltas = dict(edge_deltas or {})
+        content = self.as_update()
+        del content["replace"]
+        self.version = hashlib.sha1(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    @property
+    def is_empty(self):
+        return not (self.closed_stops or self.edge_deltas)
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "closed_stops": sorted(self.closed_stops),
+            "closed_edges": sorted(list(edge) for edge in self.closed_edges),
+            "closed_routes": sorted(self.closed_routes),
+            "edge_delays": [{"from": u, "to": v, "seconds": seconds} for (u, v), seconds in sorted(self.edge_delays.items())],
+            "route_delays": dict(sorted(self.route_delays.items())),
+            "affected_edges": len(self.edge_deltas),
+        }
+
+    def ride_deltas(self, graph):
+        """
+        เวลาที่บวกเพิ่มให้ทุกสายบน edge {ตำแหน่ง edge: วินาที} (inf = edge ที่ปิด) สำหรับการค้นหาที่นั่งตามสาย
+        ต่างจาก edge_deltas ที่เทียบกับสายที่เร็วที่สุดและรวมความล่าช้าของสายไว้แล้ว
+        """
+        index = graph.index
+        deltas = {graph.edge_index(index[u], index[v]): seconds for (u, v), seconds in self.edge_delays.items()}
+        deltas.update((graph.edge_index(index[u], index[v]), float('inf')) for u, v in self.closed_edges)
+        return deltas
+
+    def as_update(self):
+        """สถานะของรุ่นนี้ในรูปแบบที่ DisruptionManager.apply รับ (ใช้ย้าย disruption ไปยังกราฟที่โหลดใหม่)"""
+        return {
+            "replace": True,
+            "close_stops": sorted(self.closed_stops),
+            "close_edges": sorted(list(edge) for edge in self.closed_edges),
+            "close_routes": sorted(self.closed_routes),
+            "edge_delays": [{"from": u, "to": v, "seconds": float(seconds)} for (u, v), seconds in sorted(self.edge_delays.items())],
+            "route_delays": {route_id: float(seconds) for route_id, seconds in sorted(self.route_delays.items())},
+        }
+
+
+EMPTY_OVERLAY = DisruptionOverlay()
+
+
+def string_list(update, name):
+    value = update.get(name, [])
+    if not isinstance(value, list):
+        raise ValueError(f"{name} ต้องเป็น list")
+    return [str(item) for item in value]
+
+
+def edge_pairs(value, name):
+    if not isinstance(value, list):
+        raise ValueError(f"{name} ต้องเป็น list ของ [from, to]")
+    pairs = []
+    for pair in value:
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            raise ValueError(f"{name} ต้องเป็น list ของ [from, to]")
+        pairs.append((str(pair[0]), str(pair[1])))
+    return pairs
+
+
+def delay_seconds(value, name):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 0:
+        raise ValueError(f"{name} ต้องเป็นจำนวนวินาทีที่ไม่ติดลบ")
+    return value
+
+
+class DisruptionManager:
+    """
+    ถือ DisruptionOverlay รุ่นปัจจุบันของกราฟหนึ่งกราฟ และสร้างรุ่นใหม่จากการอัปเดต
+
+    การอัปเดตคำนวณใหม่เฉพาะ edge ที่เกี่ยวข้อง (edge ที่ระบุ และ edge ที่สายที่เปลี่ยนวิ่งผ่าน)
+    แล้วแทนที่ self.current ด้วยรุ่นใหม่ในครั้งเดียว (การกำหนด attribute เป็น atomic) ผู้อ่านจึงไม่ต้องล็อก
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.current = EMPTY_OVERLAY
+        self.lock = threading.Lock()
+        self.route_code_of = {name: code for code, name in enumerate(graph.route_names)}
+        # index ย้อนกลับที่สร้างครั้งเดียว: node ต้นทางของแต่ละ edge และ edge ทั้งหมดของแต่ละสาย
+        self.edge_source = np.repeat(np.arange(len(graph.indptr) - 1, dtype=np.int32), np.diff(graph.indptr))
+        entry_edge = np.repeat(np.arange(len(graph.indices), dtype=np.int64), np.diff(graph.route_ptr))
+        order = np.argsort(graph.route_list, kind='stable')
+        self.route_edge_ptr = np.searchsorted(graph.route_list[order], np.arange(len(graph.route_names) + 1))
+        self.route_edge_list = entry_edge[order]
+        self.watcher = None
+
+    def edges_of_route(self, route_id):
+        code = self.route_code_of[route_id]
+        return self.route_edge_list[self.route_edge_ptr[code]:self.route_edge_ptr[code + 1]].tolist()
+
+    def edge_at(self, u, v):
+        index = self.graph.index
+        if u not in index or v not in index:
+            raise ValueError(f"ไม่พบป้าย {u if u not in index else v} ในกราฟ")
+        k = self.graph.edge_index(index[u], index[v])
+        if k < 0:
+            raise ValueError(f"ไม่พบ edge {u} → {v} ในกราฟ")
+        return k
+
+    def edge_delta(self, k, closed_edges, closed_routes, edge_delays, route_delays):
+        """เวลาที่เพิ่มขึ้นของ edge k (inf ถ้าผ่านไม่ได้) จากสายที่เร็วที่สุดที่ยังเปิดอยู่บน edge"""
+        graph = self.graph
+        pair = (graph.stop_ids[self.edge_source[k]], graph.stop_ids[graph.indices[k]])
+        if pair in closed_edges:
+            return float('inf')
+        best = float('inf')
+        for route_id, travel_time in graph.edge_routes(k):
+            if route_id not in closed_routes:
+                best = min(best, travel_time + route_delays.get(route_id, 0))
+        if best == float('inf'):
+            return best
+        return best + edge_delays.get(pair, 0) - int(graph.weights[k])
+
+    def apply(self, update):
+        """
+        สร้างรุ่นใหม่จาก update (dict) แล้วสลับเข้าใช้งาน คืนค่ารุ่นใหม่ ข้อมูลไม่ถูกต้องจะเกิด ValueError
+        key ที่รองรับ: replace (ล้างของเดิมก่อน), close_stops / open_stops, close_edges / open_edges,
+        close_routes / open_routes, edge_delays ([{"from", "to", "seconds"}], 0 = ยกเลิก),
+        route_delays ({route_id: วินาที}, 0 = ยกเลิก)
+        """
+        if not isinstance(update, dict):
+            raise ValueError("การอัปเดตต้องเป็น JSON object")
+        unknown = set(update) - {"replace", "close_stops", "open_stops", "close_edges", "open_edges",
+                                 "close_routes", "open_routes", "edge_delays", "route_delays"}
+        if unknown:
+            raise ValueError(f"ไม่รู้จัก key: {', '.join(sorted(unknown))}")
+
+        with self.lock:
+            old = EMPTY_OVERLAY if update.get("replace") else self.current
+            closed_stops = set(old.closed_stops)
+            closed_edges = set(old.closed_edges)
+            closed_routes = set(old.closed_routes)
+            edge_delays = dict(old.edge_delays)
+            route_delays = dict(old.route_delays)
+            # edge ที่ต้องคำนวณใหม่ (ถ้า replace ต้องรวม edge ทั้งหมดของรุ่นก่อนเพื่อคืนค่าเดิม)
+            touched = set(self.current.edge_deltas) if update.get("replace") else set()
+
+            for stop_id in string_list(update, "close_stops"):
+                if stop_id not in self.graph.index:
+                    raise ValueError(f"ไม่พบป้าย {stop_id} ในกราฟ")
+                closed_stops.add(stop_id)
+            closed_stops.difference_update(string_list(update, "open_stops"))
+
+            for u, v in edge_pairs(update.get("close_edges", []), "close_edges"):
+                touched.add(self.edge_at(u, v))
+                closed_edges.add((u, v))
+            for u, v in edge_pairs(update.get("open_edges", []), "open_edges"):
+                touched.add(self.edge_at(u, v))
+                closed_edges.discard((u, v))
+
+            close_routes, open_routes = string_list(update, "close_routes"), string_list(update, "open_routes")
+            for route_id in close_routes + open_routes:
+                if route_id not in self.route_code_of:
+                    raise ValueError(f"ไม่พบสาย {route_id} ในกราฟ")
+                touched.update(self.edges_of_route(route_id))
+            closed_routes.update(close_routes)
+            closed_routes.difference_update(open_routes)
+
+            edge_updates = update.get("edge_delays", [])
+            if not isinstance(edge_updates, list):
+                raise ValueError("edge_delays ต้องเป็น list ของ {from, to, seconds}")
+            for delay in edge_updates:
+                if not isinstance(delay, dict):
+                    raise ValueError("edge_delays ต้องเป็น list ของ {from, to, seconds}")
+                u, v = str(delay.get("from")), str(delay.get("to"))
+                touched.add(self.edge_at(u, v))
+                seconds = delay_seconds(delay.get("seconds"), "edge_delays.seconds")
+                if seconds:
+                    edge_delays[(u, v)] = seconds
+                else:
+                    edge_delays.pop((u, v), None)
+
+            route_updates = update.get("route_delays", {})
+            if not isinstance(route_updates, dict):
+                raise ValueError("route_delays ต้องเป็น object ของ route_id กับวินาที")
+            for route_id, seconds in route_updates.items():
+                route_id = str(route_id)
+                if route_id not in self.route_code_of:
+                    raise ValueError(f"ไม่พบสาย {route_id} ในกราฟ")
+                touched.update(self.edges_of_route(route_id))
+                seconds = delay_seconds(seconds, "route_delays")
+                if seconds:
+                    route_delays[route_id] = seconds
+                else:
+                    route_delays.pop(route_id, None)
+
+            edge_deltas = {} if update.get("replace") else dict(old.edge_deltas)
+            for k in touched:
+                delta = self.edge_delta(k, closed_edges, closed_routes, edge_delays, route_delays)
+                if delta:
+                    edge_deltas[k] = delta
+                else:
+                    edge_deltas.pop(k, None)
+
+            overlay = DisruptionOverlay(
+                closed_stops=closed_stops,
+                closed_edges=closed_edges,
+                closed_routes=closed_routes,
+                edge_delays=edge_delays,
+                route_delays=route_delays,
+                edge_deltas=edge_deltas,
+            )
+            # เนื้อหาเดิม (เช่น watcher โหลดไฟล์ที่ตัวเองเพิ่งเขียน) ไม่ต้องสลับรุ่น
+            if overlay.version == self.current.version:
+                return self.current
+            self.current = overlay
+        return overlay
+
+    def load_file(self, path):
+        """แทนที่ disruption ทั้งหมดด้วยเนื้อหาของไฟล์ JSON (รูปแบบเดียวกับ apply)"""
+        with open(path, encoding='utf-8') as file:
+            update = json.load(file)
+        if not isinstance(update, dict):
+            raise ValueError("ไฟล์ disruption ต้องเป็น JSON object")
+        return self.apply({**update, "replace": True})
+
+    def publish(self, path, update):
+        """
+        apply update แล้วเขียนสถานะทั้งหมดลงไฟล์ path (แทนที่แบบ atomic) ทุก worker ที่ watch ไฟล์เดียวกัน
+        จึงโหลดได้รุ่นเดียวกัน ล็อกไฟล์ path.lock ระหว่างอ่าน-อัปเดต-เขียน และโหลดไฟล์ก่อน apply
+        การอัปเดตพร้อมกันจากหลาย worker จึงต่อกันโดยไม่ทับกัน
+        """
+        with open(path + ".lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            if os.path.exists(path):
+                self.load_file(path)
+            overlay = self.apply(update)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as file:
+                json.dump(overlay.as_update(), file, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+        return overlay
+
+    def watch(self, path, interval=DISRUPTION_POLL_SECONDS, on_error=None):
+        """ตรวจ mtime ของไฟล์ทุก interval วินาทีใน thread เบื้องหลัง และโหลดใหม่เมื่อไฟล์ถูกแก้ไข"""
+        stop, self.watcher = watch_file(path, lambda: self.load_file(path), interval, on_error)
+        return stop
+
+
+def watch_file(path, on_change, interval=DISRUPTION_POLL_SECONDS, on_error=None):
+    """
+    เรียก on_change() ใน thread เบื้องหลังทุกครั้งที่ mtime ของไฟล์เปลี่ยน (รวมถึงครั้งแรกที่พบไฟล์)
+    คืนค่า (Event สำหรับหยุด, thread)
+    """
+    stop = threading.Event()
+
+    def poll():
+        last_seen = None
+        while not stop.is_set():
+            try:
+                mtime = os.stat(path).st_mtime_ns
+                if mtime != last_seen:
+                    last_seen = mtime
+                    on_change()
+            except FileNotFoundError:
+                pass
+            except (OSError, ValueError) as error:
+                if on_error is not None:
+                    on_error(error)
+            stop.wait(interval)
+
+    thread = threading.Thread(target=poll, name="disruption-watcher", daemon=True)
+    thread.start()
+    return stop, thread
@@ -0,0 +1,142 @@
+import time
+import weakref
+import threading
+import numpy as np
+
+GRAPH_RELOAD_SECONDS = 30    # ความถี่ในการตรวจไฟล์กราฟใหม่
+MIN_NODE_RATIO = 0.5         # กราฟใหม่ที่มี node น้อยกว่าครึ่งหนึ่งของกราฟเดิมถือว่าเสีย (เช่นไฟล์เขียนไม่ครบ)
+
+
+def validate_graph(graph, previous=None):
+    """ตรวจ CompiledGraph ที่เพิ่งโหลดก่อนสลับเข้าใช้งาน ข้อมูลไม่สมเหตุสมผลจะเกิด ValueError"""
+    n = graph.number_of_nodes()
+    if n == 0 or graph.number_of_edges() == 0:
+        raise ValueError("กราฟไม่มี node หรือ edge")
+    if len(graph.index) != n:
+        raise ValueError("stop_id ในกราฟซ้ำกัน")
+    indptr = np.asarray(graph.indptr)
+    if len(indptr) != n + 1 or indptr[0] != 0 or indptr[-1] != graph.number_of_edges() or np.any(np.diff(indptr) < 0):
+        raise ValueError("indptr ของกราฟไม่ถูกต้อง")
+    indices = np.asarray(graph.indices)
+    if indices.min() < 0 or indices.max() >= n:
+        raise ValueError("indices ของกราฟชี้ไปนอกช่วงของ node")
+    if np.asarray(graph.weights).min() < 0:
+        raise ValueError("กราฟมี weight ติดลบ")
+    if previous is not None and n < previous.number_of_nodes() * MIN_NODE_RATIO:
+        raise ValueError(f"กราฟใหม่มี {n} node น้อยกว่าครึ่งหนึ่งของกราฟเดิม ({previous.number_of_nodes()})")
+
+
+class LoadedGraph:
+    """ข้อมูลที่โหลดจากไฟล์กราฟรุ่นหนึ่ง พร้อมรุ่นของไฟล์ เวลาที่โหลดเสร็จ และเวลาที่ใช้โหลด"""
+
+    def __init__(self, data, version, load_seconds):
+        self.data = data
+        self.version = version
+        self.load_seconds = load_seconds
+        self.loaded_at = time.time()
+
+
+class GraphReloader:
+    """
+    โหลดกราฟใหม่เบื้องหลังเมื่อไฟล์เปลี่ยน แล้วสลับ self.current ในครั้งเดียว (double buffering)
+
+    - load(previous_data) คืนข้อมูลชุดใหม่ (previous_data คือชุดที่ใช้อยู่ ใช้คัดลอกสถานะที่ต้องคงไว้)
+    - artifact_version() คืนรุ่นของไฟล์บนดิสก์ (เช่น mtime/ขนาด) เปลี่ยนเมื่อมีไฟล์ใหม่
+    - validate(new_data, previous_data) เกิด exception ถ้าข้อมูลใหม่ใช้ไม่ได้ (ชุดเดิมยังใช้งานต่อ)
+    - on_reload(loaded, error) ถูกเรียกหลังโหลดแต่ละครั้ง (สำเร็จ: LoadedGraph กับ None, ไม่สำเร็จ: None กับ exception)
+
+    คำขอที่เริ่มแล้วถือ reference ของชุดเดิมไว้จนจบ จะไม่เริ่มโหลดชุดใหม่จนกว่าชุดก่อนหน้าจะถูกปล่อย
+    หน่วยความจำจึงมีกราฟไม่เกินสองชุดพร้อมกัน
+    """
+
+    def __init__(self, load, artifact_version, validate=None, on_reload=None):
+        self.load = load
+        self.artifact_version = artifact_version
+        self.validate = validate
+        self.on_reload = on_reload
+        self.lock = threading.Lock()
+        self.loading = False
+        self.previous = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = None
+        self.failed_version = None
+        self.watcher = None
+
+        version = artifact_version()
+        t0 = time.perf_counter()
+        data = load(None)
+        self.current = LoadedGraph(data, version, time.perf_counter() - t0)
+
+    def previous_alive(self):
+        return self.previous is not None and self.previous() is not None
+
+    def check(self, wait=False):
+        """
+        เริ่มโหลดใหม่ถ้าไฟล์เปลี่ยน คืนค่า True ถ้าเริ่มโหลด
+        ไม่โหลดซ้ำถ้ากำลังโหลดอยู่ ชุดก่อนหน้ายังไม่ถูกปล่อย หรือรุ่นนี้เคยโหลดไม่ผ่านแล้ว
+        """
+        version = self.artifact_version()
+        with self.lock:
+            if version == self.current.version or version == self.failed_version:
+                return False
+            if self.loading or self.previous_alive():
+                return False
+            self.loading = True
+
+        thread = threading.Thread(target=self.reload, args=(version,), name="graph-reload", daemon=True)
+        thread.start()
+        if wait:
+            thread.join()
+        return True
+
+    def reload(self, version):
+        loaded = error = None
+        try:
+            old = self.current
+            t0 = time.perf_counter()
+            data = self.load(old.data)
+            if self.validate is not None:
+                self.validate(data, old.data)
+            loaded = LoadedGraph(data, version, time.perf_counter() - t0)
+            with self.lock:
+                self.current = loaded
+                self.previous = weakref.ref(old.data)
+                self.reloads += 1
+                self.last_error = None
+                self.failed_version = None
+        except Exception as exc:
+            error = exc
+            with self.lock:
+                self.failures += 1
+                self.last_error = str(error)
+                self.failed_version = version
+        finally:
+            with self.lock:
+                self.loading = False
+        if self.on_reload is not None:
+            self.on_reload(loaded, error)
+
+    def watch(self, interval=GRAPH_RELOAD_SECONDS):
+        """ตรวจไฟล์ทุก interval วินาทีใน thread เบื้องหลัง"""
+        stop = threading.Event()
+
+        def poll():
+            while not stop.wait(interval):
+                self.check()
+
+        self.watcher = threading.Thread(target=poll, name="graph-watcher", daemon=True)
+        self.watcher.start()
+        return stop
+
+    def stats(self):
+        return {
+            "version": self.current.version,
+            "loaded_at": round(self.current.loaded_at, 3),
+            "load_seconds": round(self.current.load_seconds, 3),
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_error": self.last_error,
+            "loading": self.loading,
+            "previous_in_use": self.previous_alive(),
+        }
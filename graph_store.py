@@ -0,0 +1,347 @@
+import os
+import json
+import heapq
+from time import perf_counter
+import numpy as np
+import networkx as nx
+from route_edges import ROUTE_SEPARATOR, edge_routes
+from path_search import DEADLINE_CHECK_INTERVAL
+from serving import check_cpu_budget
+
+# รูปแบบไฟล์: MAGIC (8 ไบต์) | ความยาว header (uint64) | header JSON | array ต่าง ๆ (จัดแนวทุก 64 ไบต์)
+MAGIC = b"GRCSR01\0"
+ALIGNMENT = 64
+
+ARRAY_DTYPES = {
+    "indptr": np.int64,              # จุดเริ่มของแต่ละ node ใน indices (ยาว n + 1)
+    "indices": np.int32,             # node ปลายทางของแต่ละ edge (เรียงตาม node ต้นทางและปลายทาง)
+    "weights": np.int32,             # weight ของแต่ละ edge
+    "route_codes": np.int32,         # รหัสสายหลัก (เร็วที่สุด) ของแต่ละ edge
+    "route_ptr": np.int64,           # จุดเริ่มของรายการสายของแต่ละ edge (ยาว m + 1)
+    "route_list": np.int32,          # รหัสสายทั้งหมดที่วิ่งผ่าน edge
+    "route_min_times": np.int32,     # เวลาเดินทางต่ำสุดของแต่ละสายบน edge
+    "route_median_times": np.int32,  # เวลาเดินทางมัธยฐานของแต่ละสายบน edge
+}
+
+
+class EdgeView:
+    """มุมมอง G[u] ให้ใช้ G[u][v] ได้เหมือน networkx"""
+
+    def __init__(self, graph, u):
+        self.graph = graph
+        self.u = u
+
+    def __getitem__(self, stop_id):
+        v = self.graph.index[stop_id]
+        k = self.graph.edge_index(self.u, v)
+        if k < 0:
+            raise KeyError(stop_id)
+        return self.graph.edge_data(k)
+
+    def __contains__(self, stop_id):
+        v = self.graph.index.get(stop_id)
+        return v is not None and self.graph.edge_index(self.u, v) >= 0
+
+    def __iter__(self):
+        a, b = self.graph.row(self.u)
+        return (self.graph.stop_ids[v] for v in self.graph.indices[a:b].tolist())
+
+    def __len__(self):
+        a, b = self.graph.row(self.u)
+        return b - a
+
+
+class CompiledGraph:
+    """
+    กราฟแบบ CSR (อ่านอย่างเดียว) ที่ array ทั้งหมดอาจเป็น np.memmap
+    ใช้แทน nx.DiGraph ในโค้ดค้นหาเส้นทางได้ (รองรับ `stop in G` และ `G[u][v]`)
+    """
+
+    def __init__(self, arrays, stop_ids, route_names, path=None, file_version=None):
+        for name in ARRAY_DTYPES:
+            setattr(self, name, arrays[name])
+        self.stop_ids = list(stop_ids)
+        self.route_names = list(route_names)
+        self.index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        self.walk_code = self.route_names.index("WALK") if "WALK" in self.route_names else -1
+        self.path = path
+        # รุ่นของไฟล์ที่ถูก memmap (mtime, ขนาด) ใช้ตรวจว่า process อื่นที่เปิด path เดียวกันได้กราฟชุดเดียวกัน
+        self.file_version = file_version
+
+    def __contains__(self, stop_id):
+        return stop_id in self.index
+
+    def __getitem__(self, stop_id):
+        return EdgeView(self, self.index[stop_id])
+
+    def __len__(self):
+        return len(self.stop_ids)
+
+    def number_of_nodes(self):
+        return len(self.stop_ids)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def row(self, u):
+        """ช่วง [a, b) ของ edge ที่ออกจาก node u"""
+        return int(self.indptr[u]), int(self.indptr[u + 1])
+
+    def edge_index(self, u, v):
+        """ตำแหน่งของ edge u → v (ค้นแบบ binary search ในแถว) หรือ -1 ถ้าไม่มี"""
+        a, b = self.row(u)
+        k = a + int(np.searchsorted(self.indices[a:b], v))
+        if k < b and self.indices[k] == v:
+            return k
+        return -1
+
+    def edge_routes(self, k):
+        """list ของ (route_id, travel_time) ของทุกสายบน edge k เรียงจากสายที่เร็วที่สุด"""
+        a, b = int(self.route_ptr[k]), int(self.route_ptr[k + 1])
+        codes = self.route_list[a:b].tolist()
+        times = self.route_min_times[a:b].tolist()
+        return [(self.route_names[code], time) for code, time in zip(codes, times)]
+
+    def edge_data(self, k):
+        return {
+            "weight": int(self.weights[k]),
+            "route_id": self.route_names[self.route_codes[k]],
+            "routes": self.edge_routes(k),
+        }
+
+
+def compile_graph(G):
+    """แปลง nx.DiGraph (จาก create_graph.py / modify_weight.py) เป็น CompiledGraph ในหน่วยความจำ"""
+    nodes = list(G.nodes)
+    stop_ids = [str(node) for node in nodes]
+    index = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+    route_names = []
+    route_code_of = {}
+
+    def route_code(route_id):
+        if route_id not in route_code_of:
+            route_code_of[route_id] = len(route_names)
+            route_names.append(route_id)
+        return route_code_of[route_id]
+
+    indptr = [0]
+    indices, weights, route_codes = [], [], []
+    route_ptr = [0]
+    route_list, route_min_times, route_median_times = [], [], []
+
+    for node in nodes:
+        row = sorted(((index[str(v)], data) for v, data in G[node].items()), key=lambda item: item[0])
+        for v, data in row:
+            indices.append(v)
+            weights.append(int(data.get('weight', 0)))
+            route_codes.append(route_code(str(data.get('route_id', 'N/A'))))
+
+            routes = edge_routes(data)
+            medians = str(data['route_median_times']).split(ROUTE_SEPARATOR) if data.get('route_median_times') else []
+            for position, (route_id, travel_time) in enumerate(routes):
+                route_list.append(route_code(route_id))
+                route_min_times.append(int(travel_time))
+                route_median_times.append(int(medians[position]) if position < len(medians) else int(travel_time))
+            route_ptr.append(len(route_list))
+        indptr.append(len(indices))
+
+    arrays = {
+        "indptr": indptr, "indices": indices, "weights": weights, "route_codes": route_codes,
+        "route_ptr": route_ptr, "route_list": route_list,
+        "route_min_times": route_min_times, "route_median_times": route_median_times,
+    }
+    arrays = {name: np.asarray(values, dtype=ARRAY_DTYPES[name]) for name, values in arrays.items()}
+    return CompiledGraph(arrays, stop_ids, route_names)
+
+
+def save_compiled_graph(graph, path):
+    """บันทึก CompiledGraph เป็นไฟล์เดียวที่ memmap กลับมาได้ทันที"""
+    layout = {}
+    offset = 0
+    for name, dtype in ARRAY_DTYPES.items():
+        array = np.ascontiguousarray(getattr(graph, name), dtype=dtype)
+        layout[name] = [np.dtype(dtype).str, offset, len(array)]
+        offset += -(-array.nbytes // ALIGNMENT) * ALIGNMENT
+
+    header = json.dumps({
+        "arrays": layout,
+        "stop_ids": graph.stop_ids,
+        "route_names": graph.route_names,
+    }, ensure_ascii=False).encode('utf-8')
+    data_start = -(-(len(MAGIC) + 8 + len(header)) // ALIGNMENT) * ALIGNMENT
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(len(header).to_bytes(8, 'little'))
+        file.write(header)
+        for name, dtype in ARRAY_DTYPES.items():
+            file.seek(data_start + layout[name][1])
+            file.write(np.ascontiguousarray(getattr(graph, name), dtype=dtype).tobytes())
+        file.truncate(data_start + offset)
+    # เขียนไฟล์ชั่วคราวก่อนแล้วค่อยย้าย เพื่อไม่ให้ process ที่กำลังอ่านเจอไฟล์ครึ่ง ๆ
+    os.replace(tmp_path, path)
+
+
+def load_compiled_graph(path):
+    """
+    โหลดไฟล์ที่ save_compiled_graph เขียนไว้ด้วย np.memmap (อ่านอย่างเดียว)
+    worker หลาย process ที่เปิดไฟล์เดียวกันจะใช้หน้า page cache ร่วมกัน
+    header, array และ file_version มาจากไฟล์ที่เปิดครั้งเดียว จึงตรงกันแม้ไฟล์จะถูกแทนที่ระหว่างโหลด
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"ไม่ใช่ไฟล์กราฟที่คอมไพล์แล้ว: {path}")
+        header_length = int.from_bytes(file.read(8), 'little')
+        header = json.loads(file.read(header_length).decode('utf-8'))
+        stat = os.fstat(file.fileno())
+        raw = np.memmap(file, dtype=np.uint8, mode='r')
+    data_start = -(-(len(MAGIC) + 8 + header_length) // ALIGNMENT) * ALIGNMENT
+
+    arrays = {}
+    for name, (dtype, offset, length) in header["arrays"].items():
+        start = data_start + offset
+        arrays[name] = raw[start:start + length * np.dtype(dtype).itemsize].view(dtype)
+
+    return CompiledGraph(arrays, header["stop_ids"], header["route_names"], path=path,
+                         file_version=f"{stat.st_mtime_ns}:{stat.st_size}")
+
+
+def compiled_path(graphml_path):
+    """ชื่อไฟล์กราฟที่คอมไพล์แล้วซึ่งคู่กับไฟล์ GraphML"""
+    return os.path.splitext(graphml_path)[0] + ".bin"
+
+
+def load_graph(graphml_path, compiled=False):
+    """
+    โหลดกราฟสำหรับ service: ถ้ามีไฟล์ .bin ที่ไม่เก่ากว่า GraphML ให้ memmap โหลด
+    ไม่งั้นอ่าน GraphML ด้วย networkx ตามเดิม (ถ้า compiled=True จะคอมไพล์เป็น CompiledGraph ในหน่วยความจำ)
+    """
+    bin_path = compiled_path(graphml_path)
+    if os.path.exists(bin_path) and (
+        not os.path.exists(graphml_path) or os.path.getmtime(bin_path) >= os.path.getmtime(graphml_path)
+    ):
+        return load_compiled_graph(bin_path)
+    G = nx.read_graphml(graphml_path)
+    return compile_graph(G) if compiled else G
+
+
+def dijkstra_path(graph, source, target, ignored_nodes=(), ignored_edges=()):
+    """Dijkstra บน CompiledGraph (ใช้เลข node) คืนค่า (cost, path) หรือ None ถ้าไปไม่ถึง"""
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    dist = {source: 0}
+    pred = {source: -1}
+    done = set()
+    heap = [(0, source)]
+
+    while heap:
+        d, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        if u == target:
+            path = [u]
+            while pred[path[-1]] != -1:
+                path.append(pred[path[-1]])
+            return d, path[::-1]
+        done.add(u)
+
+        a, b = int(indptr[u]), int(indptr[u + 1])
+        for v, w in zip(indices[a:b].tolist(), weights[a:b].tolist()):
+            if v in done or v in ignored_nodes or (u, v) in ignored_edges:
+                continue
+            nd = d + w
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+
+    return None
+
+
+def dijkstra_distances(graph, source, targets, ignored_nodes=(), deadline=None, edge_deltas=None):
+    """
+    Dijkstra จาก source ครั้งเดียวไปยังหลาย targets (ใช้เลข node) หยุดเมื่อ settle ครบทุก target
+    คืนค่า list ของ cost เรียงตาม targets (ไปไม่ถึงเป็น inf)
+    หรือ None ถ้าเลย deadline (ค่าของ time.perf_counter()) ก่อนค้นหาเสร็จ
+    edge_deltas (ถ้ามี) คือ dict ตำแหน่ง edge → เวลาที่บวกเพิ่ม (inf = ผ่านไม่ได้) แบบเดียวกับ k_shortest_feasible_paths
+    """
+    indptr, indices, weights = graph.indptr, graph.indices, graph.weights
+    remaining = set(targets) - {source}
+    dist = {source: 0}
+    done = set()
+    heap = [(0, source)]
+    pops = 0
+
+    while heap and remaining:
+        pops += 1
+        if pops % DEADLINE_CHECK_INTERVAL == 0:
+            check_cpu_budget()
+            if deadline is not None and perf_counter() > deadline:
+                return None
+        d, u = heapq.heappop(heap)
+        if u in done:
+            continue
+        done.add(u)
+        remaining.discard(u)
+
+        a, b = int(indptr[u]), int(indptr[u + 1])
+        for k, v, w in zip(range(a, b), indices[a:b].tolist(), weights[a:b].tolist()):
+            if v in done or v in ignored_nodes:
+                continue
+            nd = d + w + (edge_deltas.get(k, 0) if edge_deltas else 0)
+            if nd == float('inf'):
+                continue
+            if nd < dist.get(v, float('inf')):
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+
+    return [dist[target] if target in done or target == source else float('inf') for target in targets]
+
+
+def yen_simple_paths(graph, source, target):
+    """Yen's algorithm บน CompiledGraph: ให้ path (เป็นเลข node) เรียงจาก cost น้อยไปมาก"""
+    first = dijkstra_path(graph, source, target)
+    if first is None:
+        raise nx.NetworkXNoPath(f"ไม่มีเส้นทางจาก {source} ไปยัง {target}")
+
+    weights = graph.weights
+
+    def edge_weight(u, v):
+        return int(weights[graph.edge_index(u, v)])
+
+    accepted = [first[1]]
+    seen = {tuple(first[1])}
+    candidates = []
+    yield first[1]
+
+    while True:
+        previous = accepted[-1]
+        root_cost = 0
+        for i in range(len(previous) - 1):
+            spur = previous[i]
+            root = previous[:i + 1]
+            ignored_edges = {(path[i], path[i + 1]) for path in accepted if path[:i + 1] == root}
+            spur_result = dijkstra_path(graph, spur, target, set(root[:-1]), ignored_edges)
+            if spur_result is not None:
+                spur_cost, spur_path = spur_result
+                path = root[:-1] + spur_path
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (root_cost + spur_cost, len(path), path))
+            root_cost += edge_weight(previous[i], previous[i + 1])
+
+        if not candidates:
+            return
+        _, _, path = heapq.heappop(candidates)
+        accepted.append(path)
+        yield path
+
+
+def shortest_simple_paths(G, source, target, weight='weight'):
+    """ใช้แทน nx.shortest_simple_paths ได้ทั้งกับ nx.DiGraph และ CompiledGraph"""
+    if not isinstance(G, CompiledGraph):
+        yield from nx.shortest_simple_paths(G, source=source, target=target, weight=weight)
+        return
+    stop_ids = G.stop_ids
+    for path in yen_simple_paths(G, G.index[source], G.index[target]):
+        yield [stop_ids[node] for node in path]
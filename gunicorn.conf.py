@@ -0,0 +1,24 @@
+import os
+import multiprocessing
+
+# รันด้วย: gunicorn -c gunicorn.conf.py
+wsgi_app = "test_api_walk_4:create_app()"
+bind = os.environ.get("BIND", "0.0.0.0:5000")
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "sync"  # worker แบบ sync รันคำขอใน main thread งบเวลา CPU (serving.cpu_budget) จึงทำงานได้
+
+# โหลดกราฟครั้งเดียวใน master ก่อน fork แล้วให้ทุก worker ใช้ร่วมกันแบบ copy-on-write
+preload_app = True
+
+# ต้องนานกว่า REQUEST_CPU_BUDGET เพื่อให้คำขอที่เกินงบได้ตอบ 503 ก่อนถูก kill
+timeout = 30
+graceful_timeout = 30
+max_requests = 10000
+max_requests_jitter = 1000
+
+
+def post_fork(server, worker):
+    # thread ตรวจไฟล์กราฟและไฟล์ disruption ไม่ถูกคัดลอกไปกับ fork จึงเริ่มใหม่ในแต่ละ worker
+    # (แต่ละ worker โหลดกราฟใหม่เอง กราฟชุดใหม่จึงไม่ได้ใช้หน่วยความจำร่วมกันแบบ copy-on-write เหมือนชุดแรก)
+    import test_api_walk_4
+    test_api_walk_4.start_watchers()
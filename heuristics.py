@@ -0,0 +1,137 @@
+import os
+import heapq
+import numpy as np
+import pandas as pd
+from walking_edges import HAVERSINE_MARGIN, haversine_m
+
+NUM_LANDMARKS = 16  # จำนวน landmark สำหรับ ALT (มากขึ้น = bound แน่นขึ้น แต่ใช้หน่วยความจำ 2 × n × 4 ไบต์ต่อ landmark)
+
+
+def load_stop_coords(gtfs_dir, graph):
+    """พิกัดของทุก node ใน CompiledGraph จาก stops.txt (ป้ายที่ไม่มีพิกัดเป็น NaN)"""
+    stops = pd.read_csv(os.path.join(gtfs_dir, "stops.txt"), dtype={'stop_id': str})
+    stops = stops.drop_duplicates('stop_id').set_index('stop_id')
+    lats = stops['stop_lat'].reindex(graph.stop_ids).to_numpy(dtype=np.float64)
+    lons = stops['stop_lon'].reindex(graph.stop_ids).to_numpy(dtype=np.float64)
+    return lats, lons
+
+
+def fastest_speed(graph, lats, lons):
+    """
+    ความเร็วเส้นตรงสูงสุดบน edge ใด ๆ (เมตร/วินาที) ใช้เป็นความเร็วของโหมดที่เร็วที่สุด
+    ระยะเส้นตรง / ความเร็วนี้จึงไม่เกินเวลาเดินทางจริงเสมอ (edge ที่ weight เป็น 0 นับเป็น 1 วินาที)
+    """
+    sources = np.repeat(np.arange(graph.number_of_nodes()), np.diff(graph.indptr))
+    dist = haversine_m(lats[sources], lons[sources], lats[graph.indices], lons[graph.indices])
+    speed = dist / np.maximum(graph.weights, 1)
+    return float(np.nanmax(speed)) if np.any(np.isfinite(speed)) else 0.0
+
+
+def geographic_bounds(lats, lons, speed, target):
+    """lower bound ของเวลาเดินทางจากทุก node ไป target (ป้ายที่ไม่มีพิกัดได้ 0)"""
+    if speed <= 0 or np.isnan(lats[target]):
+        return np.zeros(len(lats))
+    bounds = haversine_m(lats, lons, lats[target], lons[target]) / speed
+    return np.nan_to_num(bounds, nan=0.0)
+
+
+def point_bounds(lats, lons, speed, lat, lon):
+    """
+    lower bound ของเวลาจากทุก node ไปยังพิกัด (lat, lon) ที่ไม่ใช่ป้าย (เช่นปลายทางของการค้นหาแบบพิกัด)
+    speed ต้องไม่น้อยกว่าความเร็วเดินของช่วงเดินออก จึงเผื่อความคลาดของ haversine และการปัดเวลาเดินลงอีกหนึ่งวินาที
+    """
+    if speed <= 0:
+        return np.zeros(len(lats))
+    bounds = haversine_m(lats, lons, lat, lon) / (speed * HAVERSINE_MARGIN) - 1
+    return np.maximum(np.nan_to_num(bounds, nan=0.0), 0.0)
+
+
+def reverse_csr(graph):
+    """CSR ของกราฟกลับทิศ (indptr, indices, weights) ใช้หาระยะทางจากทุก node มายัง landmark"""
+    n = graph.number_of_nodes()
+    sources = np.repeat(np.arange(n, dtype=np.int32), np.diff(graph.indptr))
+    order = np.argsort(graph.indices, kind='stable')
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(graph.indices, minlength=n), out=indptr[1:])
+    return indptr, sources[order], np.asarray(graph.weights)[order]
+
+
+def shortest_distances(indptr, indices, weights, source):
+    """Dijkstra แบบเต็มจาก source คืนค่า array ระยะทางไปทุก node (ไปไม่ถึงเป็น inf)"""
+    indptr, indices, weights = indptr.tolist(), indices.tolist(), weights.tolist()
+    dist = [float('inf')] * (len(indptr) - 1)
+    dist[source] = 0
+    heap = [(0, source)]
+    while heap:
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            nd = d + weights[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                heapq.heappush(heap, (nd, v))
+    return np.asarray(dist, dtype=np.float32)
+
+
+def build_landmarks(graph, lats, lons, count=NUM_LANDMARKS):
+    """
+    เลือก landmark แบบ farthest-point ตามพิกัด (เริ่มจากป้ายที่ไกลจุดศูนย์กลางที่สุด)
+    แล้วเก็บระยะทางจาก landmark ไปทุก node และจากทุก node มายัง landmark
+    """
+    degree = np.diff(graph.indptr)
+    candidates = np.flatnonzero(~np.isnan(lats) & (degree > 0))
+    if len(candidates) == 0:
+        candidates = np.arange(graph.number_of_nodes())
+        lats, lons = np.zeros(len(candidates)), np.zeros(len(candidates))
+
+    nearest = haversine_m(lats[candidates], lons[candidates],
+                          np.mean(lats[candidates]), np.mean(lons[candidates]))
+    landmarks = []
+    for _ in range(min(count, len(candidates))):
+        chosen = int(candidates[int(np.argmax(nearest))])
+        landmarks.append(chosen)
+        nearest = np.minimum(nearest, haversine_m(lats[candidates], lons[candidates], lats[chosen], lons[chosen]))
+
+    reverse = reverse_csr(graph)
+    from_landmark = np.stack([shortest_distances(graph.indptr, graph.indices, graph.weights, landmark)
+                              for landmark in landmarks])
+    to_landmark = np.stack([shortest_distances(*reverse, landmark) for landmark in landmarks])
+    return {
+        "landmarks": np.asarray(landmarks, dtype=np.int32),
+        "from_landmark": from_landmark,
+        "to_landmark": to_landmark,
+    }
+
+
+def landmark_bounds(landmarks, target):
+    """
+    lower bound แบบ ALT (ใช้อสมการสามเหลี่ยม) จากทุก node ไป target:
+    max ของ d(L, t) - d(L, v) และ d(v, L) - d(t, L) ทุก landmark L
+    node ที่ได้ inf ไปไม่ถึง target แน่นอน
+    """
+    from_landmark, to_landmark = landmarks["from_landmark"], landmarks["to_landmark"]
+    with np.errstate(invalid='ignore'):
+        forward = from_landmark[:, target:target + 1] - from_landmark
+        backward = to_landmark - to_landmark[:, target:target + 1]
+        bounds = np.fmax(forward, backward)
+    bounds = np.where(np.isnan(bounds), 0.0, bounds).max(axis=0)
+    return np.maximum(bounds, 0.0)
+
+
+def landmark_path(graphml_path):
+    """ชื่อไฟล์ landmark ที่คู่กับไฟล์ GraphML"""
+    return os.path.splitext(graphml_path)[0] + ".landmarks.npz"
+
+
+def save_landmarks(landmarks, path):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'wb') as file:
+        np.savez(file, **landmarks)
+    os.replace(tmp_path, path)
+
+
+def load_landmarks(path):
+    with np.load(path) as data:
+        return {name: data[name] for name in ("landmarks", "from_landmark", "to_landmark")}
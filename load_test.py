@@ -0,0 +1,64 @@
+import sys
+import json
+import time
+import random
+import urllib.request
+import urllib.error
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+
+# ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
+sys.stdout.reconfigure(encoding='utf-8')
+
+# วิธีใช้: python load_test.py [URL] [จำนวนคำขอ] [จำนวนคำขอพร้อมกัน] [ไฟล์ requests.jsonl (ถ้าไม่ระบุจะสุ่มจาก stops.txt)]
+URL = sys.argv[1] if len(sys.argv) > 1 else "http://127.0.0.1:5000/find_paths"
+NUM_REQUESTS = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+CONCURRENCY = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+REQUESTS_PATH = sys.argv[4] if len(sys.argv) > 4 else None
+
+
+def make_bodies():
+    if REQUESTS_PATH:
+        with open(REQUESTS_PATH, encoding='utf-8') as file:
+            bodies = [json.loads(line) for line in file if line.strip()]
+        return [bodies[i % len(bodies)] for i in range(NUM_REQUESTS)]
+    stops = pd.read_csv("namtang-gtfs/stops.txt", dtype={'stop_id': str})['stop_id'].tolist()
+    random.seed(42)
+    return [{"start_station": start, "end_station": end, "max_paths": 5}
+            for start, end in (random.sample(stops, 2) for _ in range(NUM_REQUESTS))]
+
+
+def send(body):
+    data = json.dumps(body).encode('utf-8')
+    req = urllib.request.Request(URL, data=data, headers={"Content-Type": "application/json"})
+    t0 = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=60) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as error:
+        status = error.code
+    except OSError:
+        status = "error"
+    return status, time.perf_counter() - t0
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+if __name__ == '__main__':
+    bodies = make_bodies()
+    print(f"🚀 ส่ง {len(bodies)} คำขอไปยัง {URL} พร้อมกันครั้งละ {CONCURRENCY}...")
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENCY) as executor:
+        results = list(executor.map(send, bodies))
+    elapsed = time.perf_counter() - t0
+
+    latencies = [latency for _, latency in results]
+    print(f"📈 throughput: {len(results) / elapsed:.1f} คำขอ/วินาที ({elapsed:.2f} วินาที)")
+    print(f"⏱️ latency: p50 {percentile(latencies, 0.5):.1f} ms, p99 {percentile(latencies, 0.99):.1f} ms,"
+          f" max {max(latencies) * 1000:.1f} ms")
+    print(f"📋 status: {dict(Counter(status for status, _ in results))}")
@@ -0,0 +1,152 @@
+import os
+import heapq
+import threading
+import multiprocessing
+import numpy as np
+from graph_store import load_compiled_graph
+from result_cache import file_version
+from path_search import DEADLINE_CHECK_INTERVAL
+from serving import check_cpu_budget
+
+MIN_POOL_ORIGINS = 32  # ต้นทางน้อยกว่านี้คำนวณใน process เดียว (ค่าเริ่ม pool แพงกว่าการค้นหา)
+
+_worker_graph = None
+_pool = None
+_pool_key = None
+_pool_lock = threading.Lock()
+
+
+def single_source_times(graph, source, walk_threshold=None, blocked=(), targets=None, max_cost=None, walk_scale=1.0,
+                        edge_deltas=None):
+    """
+    Dijkstra จาก node source (เลข node) ไปทุก node โดยนับจำนวนครั้งที่เดินเป็นส่วนหนึ่งของสถานะ
+    เหมือน k_shortest_feasible_paths (เดินเกิน walk_threshold ครั้งไม่ได้)
+
+    หยุดเร็วเมื่อ settle ครบทุก targets (ถ้าระบุ) หรือ cost เกิน max_cost
+    เส้นทางถูกเลือกด้วย weight ของกราฟ แต่เวลาที่คืนนับ edge WALK เป็น weight × walk_scale
+    (เช่น 0.5 ให้ตรงกับเวลาที่ describe_path รายงาน)
+    edge_deltas (ถ้ามี) คือ dict ตำแหน่ง edge → เวลาที่บวกเพิ่ม (inf = ผ่านไม่ได้) แบบเดียวกับ k_shortest_feasible_paths
+    คืนค่า (times, walks): เวลาของเส้นทางที่ cost น้อยที่สุดไปแต่ละ node (ไปไม่ถึงเป็น inf)
+    และจำนวนครั้งที่เดินของเส้นทางนั้น (-1 ถ้าไปไม่ถึง)
+    """
+    n = graph.number_of_nodes()
+    indptr, indices, weights, route_codes = graph.indptr, graph.indices, graph.weights, graph.route_codes
+    walk_code = graph.walk_code
+    levels = walk_threshold + 1 if walk_threshold is not None else 1
+    counts_walks = walk_threshold is not None
+
+    times = np.full(n, np.inf)
+    walks_used = np.full(n, -1, dtype=np.int32)
+    if source in blocked:
+        return times, walks_used
+
+    dist = [[float('inf')] * n for _ in range(levels)]
+    dist[0][source] = 0
+    heap = [(0, 0, source, 0)]
+    remaining = set(np.asarray(targets).tolist()) if targets is not None else None
+    if remaining is not None and not remaining:
+        return times, walks_used
+    limit = max_cost if max_cost is not None else float('inf')
+    pops = 0
+
+    while heap:
+        pops += 1
+        if pops % DEADLINE_CHECK_INTERVAL == 0:
+            check_cpu_budget()
+        d, walks, u, elapsed = heapq.heappop(heap)
+        if d > limit:
+            break
+        if d > dist[walks][u]:
+            continue
+        if walks_used[u] < 0:
+            # ครั้งแรกที่ pop node นี้ (ระดับใดก็ได้) คือเวลาที่น้อยที่สุด
+            times[u] = elapsed
+            walks_used[u] = walks
+            if remaining is not None:
+                remaining.discard(u)
+                if not remaining:
+                    break
+
+        a, b = int(indptr[u]), int(indptr[u + 1])
+        for e, v, w, route_code in zip(range(a, b), indices[a:b].tolist(), weights[a:b].tolist(), route_codes[a:b].tolist()):
+            if v in blocked:
+                continue
+            delta = edge_deltas.get(e, 0) if edge_deltas else 0
+            if delta == float('inf'):
+                continue
+            is_walk = route_code == walk_code
+            new_walks = walks + is_walk if counts_walks else 0
+            if new_walks >= levels:
+                continue
+            nd = d + w + delta
+            if nd < dist[new_walks][v]:
+                dist[new_walks][v] = nd
+                heapq.heappush(heap, (nd, new_walks, v, elapsed + (w * walk_scale if is_walk else w) + delta))
+
+    return times, walks_used
+
+
+def init_worker(graph_path, file_version):
+    """เปิดไฟล์กราฟด้วย memmap ใน worker ใช้เฉพาะเมื่อเป็นไฟล์รุ่นเดียวกับกราฟของ process หลัก"""
+    global _worker_graph
+    graph = load_compiled_graph(graph_path)
+    _worker_graph = graph if graph.file_version == file_version else None
+
+
+def origin_row(args):
+    """แถวของเมทริกซ์จากต้นทางหนึ่งใน worker (None ถ้า worker ไม่ได้โหลดกราฟรุ่นที่งานนี้อ้างอิง)"""
+    file_version, source, targets, walk_threshold, blocked, walk_scale, edge_deltas = args
+    if _worker_graph is None or _worker_graph.file_version != file_version:
+        return None
+    times, _ = single_source_times(_worker_graph, source, walk_threshold, blocked, targets, walk_scale=walk_scale,
+                                   edge_deltas=edge_deltas)
+    return times[targets]
+
+
+def map_origins(graph, tasks, processes, context):
+    """
+    ส่งงานไปยัง pool ของกราฟรุ่นนี้ (สร้างครั้งเดียวแล้วใช้ซ้ำ จนกว่าจะเปลี่ยนรุ่นของกราฟหรือจำนวน process)
+    pool เดิมถูก close() (งานที่ thread อื่นส่งไว้แล้วทำจนเสร็จ) คืนค่า AsyncResult
+    หรือ None ถ้าไฟล์บนดิสก์ไม่ใช่กราฟรุ่นนี้แล้ว (worker ใหม่จะโหลดกราฟคนละชุด)
+    """
+    global _pool, _pool_key
+    if graph.path is None or file_version(graph.path) != graph.file_version:
+        return None
+    key = (graph.path, graph.file_version, processes)
+    with _pool_lock:
+        if _pool is None or _pool_key != key:
+            if _pool is not None:
+                _pool.close()
+            _pool = context.Pool(processes, initializer=init_worker, initargs=(graph.path, graph.file_version))
+            _pool_key = key
+        return _pool.map_async(origin_row, tasks, chunksize=max(1, len(tasks) // (4 * processes)))
+
+
+def travel_time_matrix(graph, origins, destinations, walk_threshold=None, avoid_nodes=None, processes=None, walk_scale=1.0,
+                       edge_deltas=None, context=multiprocessing):
+    """
+    เมทริกซ์เวลาเดินทาง (วินาที) ขนาด len(origins) × len(destinations) บน CompiledGraph
+    ค้นหาแบบ single-source หนึ่งครั้งต่อต้นทาง และกระจายต้นทางไปยัง process pool (สร้างจาก context) เมื่อมีต้นทางมาก
+    ช่องที่ไปไม่ถึงเป็น inf เวลาของ edge WALK คูณด้วย walk_scale และ edge_deltas บวกเพิ่ม (ดู single_source_times)
+    แถวที่ worker คำนวณไม่ได้ (กราฟคนละรุ่นกับ graph) คำนวณใน process นี้แทน
+    """
+    index = graph.index
+    blocked = frozenset(index[stop_id] for stop_id in (avoid_nodes or ()) if stop_id in index)
+    targets = np.asarray([index[stop_id] for stop_id in destinations], dtype=np.int64)
+    sources = [index[stop_id] for stop_id in origins]
+
+    def row(source):
+        times, _ = single_source_times(graph, source, walk_threshold, blocked, targets, walk_scale=walk_scale,
+                                       edge_deltas=edge_deltas)
+        return times[targets]
+
+    rows = None
+    if processes != 1 and len(sources) >= MIN_POOL_ORIGINS:
+        tasks = [(graph.file_version, source, targets, walk_threshold, blocked, walk_scale, edge_deltas) for source in sources]
+        pending = map_origins(graph, tasks, processes or os.cpu_count() or 1, context)
+        if pending is not None:
+            rows = [times if times is not None else row(source) for source, times in zip(sources, pending.get())]
+    if rows is None:
+        rows = [row(source) for source in sources]
+
+    return np.vstack(rows) if rows else np.empty((0, len(targets)))
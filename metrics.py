@@ -0,0 +1,145 @@
+import os
+import time
+import threading
+from bisect import bisect_left
+
+# ปิดทั้งหมดด้วย METRICS_ENABLED=0 (timer และ counter จะไม่ทำอะไรเลย และ /metrics ตอบ 404)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+# ขอบบนของแต่ละ bucket หน่วยวินาที (ตั้งแต่ 0.1 ms ถึง 10 วินาที)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if value != float('inf') else "+Inf"
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for labels, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(labels)} {format_value(value)}")
+        return lines
+
+
+class Histogram:
+    """
+    histogram แบบ bucket คงที่ (ตามรูปแบบของ Prometheus) เก็บเฉพาะจำนวนต่อ bucket ผลรวม และจำนวนทั้งหมด
+    observe จึงเป็นแค่ bisect หนึ่งครั้งกับการบวกเลขภายใต้ lock
+    """
+
+    def __init__(self, name, help_text, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.series = {}
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                # [จำนวนต่อ bucket (+Inf เป็นช่องสุดท้าย), ผลรวม, จำนวนทั้งหมด]
+                series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            for labels, (counts, total, count) in sorted(self.series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                    cumulative += bucket_count
+                    bucket_labels = labels + (("le", format_value(bound)),)
+                    lines.append(f"{self.name}_bucket{format_labels(bucket_labels)} {cumulative}")
+                lines.append(f"{self.name}_sum{format_labels(labels)} {format_value(total)}")
+                lines.append(f"{self.name}_count{format_labels(labels)} {count}")
+        return lines
+
+
+class PhaseTimer:
+    """context manager จับเวลาหนึ่งช่วงของการค้นหาแล้วบันทึกลง histogram ของ phase"""
+
+    __slots__ = ("histogram", "labels", "started")
+
+    def __init__(self, histogram, labels):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.started, **self.labels)
+        return False
+
+
+class NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+
+class Metrics:
+    """
+    ชุด metric ของ service: เวลาต่อ phase, เวลาต่อคำขอ และจำนวนเส้นทางที่สร้าง/ข้าม/ตอบกลับ
+    ค่าอยู่ในหน่วยความจำของ process เดียว (แต่ละ worker ของ gunicorn และ process ใน pool มีชุดของตัวเอง)
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.phase_seconds = Histogram("route_phase_seconds", "Time spent in each phase of a route search")
+        self.request_seconds = Histogram("route_request_seconds", "End-to-end request latency by endpoint")
+        self.requests = Counter("route_requests_total", "Requests by endpoint and status")
+        self.paths = Counter("route_paths_total", "Paths generated, skipped and returned by route searches")
+
+    def phase(self, name):
+        """ใช้แบบ `with METRICS.phase("search"):` คืน timer ที่ไม่ทำอะไรเมื่อปิด metric"""
+        if not self.enabled:
+            return NULL_TIMER
+        return PhaseTimer(self.phase_seconds, {"phase": name})
+
+    def count_paths(self, outcome, amount=1):
+        if self.enabled and amount:
+            self.paths.inc(amount, outcome=outcome)
+
+    def observe_request(self, endpoint, status, seconds):
+        if self.enabled:
+            self.requests.inc(endpoint=endpoint, status=status)
+            self.request_seconds.observe(seconds, endpoint=endpoint)
+
+    def render(self):
+        """ข้อความตามรูปแบบ Prometheus text exposition (version 0.0.4)"""
+        lines = []
+        for metric in (self.requests, self.request_seconds, self.phase_seconds, self.paths):
+            lines += metric.render()
+        return "\n".join(lines) + "\n"
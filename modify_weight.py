@@ -1,5 +1,7 @@
 import sys
 import networkx as nx
+from route_edges import route_entries, set_route_entries
+from walking_edges import WALKING_WEIGHT_MULTIPLIER
 
 # ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
 sys.stdout.reconfigure(encoding='utf-8')
@@ -7,16 +9,18 @@ sys.stdout.reconfigure(encoding='utf-8')
 # โหลดกราฟจากไฟล์ graph.graphml
 G = nx.read_graphml("graph/graph.graphml")
 
-# อัตราการเพิ่ม weight (เช่น 10 เท่าจากค่าเดิม)
-WALKING_WEIGHT_MULTIPLIER = 10
-
-# แก้ไข weight สำหรับเส้นทางที่เป็นการเดิน
+# แก้ไข weight สำหรับเส้นทางที่เป็นการเดิน (รวมถึง WALK ที่อยู่ร่วมกับสายรถบน edge เดียวกัน)
 for u, v, data in G.edges(data=True):
-    if data.get("route_id") == "WALK":
+    entries = route_entries(data)
+    if any(route_id == "WALK" for route_id, _, _ in entries):
         original_weight = data["weight"]
-        new_weight = int(original_weight * WALKING_WEIGHT_MULTIPLIER)  # ปรับค่า weight
-        data["weight"] = new_weight  # อัปเดตค่า weight
-        
+        set_route_entries(data, [
+            (route_id, int(min_time * WALKING_WEIGHT_MULTIPLIER), int(median_time * WALKING_WEIGHT_MULTIPLIER))
+            if route_id == "WALK" else (route_id, min_time, median_time)
+            for route_id, min_time, median_time in entries
+        ])
+        new_weight = data["weight"]  # สายรถอาจเร็วกว่าการเดินหลังปรับค่า
+
         # แสดงค่าเดิมและค่าใหม่
         print(f"🔄 ปรับเส้นทาง {u} → {v} | weight เดิม: {original_weight} → weight ใหม่: {new_weight}")
 
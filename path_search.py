@@ -0,0 +1,179 @@
+import time
+import heapq
+from serving import check_cpu_budget
+
+DEADLINE_CHECK_INTERVAL = 256  # ตรวจเวลาทุก ๆ กี่ครั้งที่ขยาย label (เรียก perf_counter ทุกครั้งแพงเกินไป)
+
+
+def label_path(label_node, label_parent, label):
+    """ไล่ parent ของ label กลับไปจนถึงต้นทาง คืนค่าเป็น list ของเลข node"""
+    path = []
+    while label != -1:
+        path.append(label_node[label])
+        label = label_parent[label]
+    return path[::-1]
+
+
+def k_shortest_feasible_paths(graph, source, target, k=5, avoid_nodes=None, walk_threshold=None, heuristic=None,
+                              stats=None, max_expansions=None, deadline=None, weights=None, transfer_penalty=0,
+                              edge_deltas=None, source_costs=None, target_costs=None, walk_edges=None):
+    """
+    หา k เส้นทางที่ cost ต่ำสุดที่ "ผ่านเงื่อนไข" ในรอบเดียวด้วย label-setting บน CompiledGraph
+
+    - node ใน avoid_nodes ถูกตัดออกจากกราฟตั้งแต่แรก ไม่ต้องกรองทีหลัง
+    - จำนวนครั้งที่เดิน (edge WALK) เป็นส่วนหนึ่งของสถานะ label เกิน walk_threshold จะไม่ถูกขยายต่อ
+    - แต่ละ node ถูก settle ได้ไม่เกิน k ครั้งต่อจำนวนครั้งที่เดิน และ label ที่ถูก k label
+      ที่เดินน้อยกว่าหรือเท่ากัน (และ cost ไม่มากกว่า) ครอบไว้แล้วจะถูกตัดทิ้ง
+    - ไม่ขยายไปยัง node ที่อยู่บนเส้นทางของ label อยู่แล้ว เส้นทางที่ได้จึงไม่วนซ้ำ
+
+    เนื่องจากตัด label ตามจำนวนครั้งที่ settle ผลลัพธ์เป็นค่าประมาณของ k shortest simple paths
+    (ตรงกันในกรณีทั่วไป) แต่ไม่ต้องไล่ทิ้งเส้นทางที่ไม่ผ่านเงื่อนไขทีละเส้นแบบ Yen's
+
+    heuristic (ถ้ามี) คือ array lower bound ของเวลาไป target ต่อ node (จาก heuristics.py)
+    label จะถูกเรียงด้วย cost + heuristic แบบ A* และ node ที่ bound เป็น inf จะไม่ถูกขยาย
+    ผลลัพธ์เหมือนเดิมเมื่อ bound ไม่เกินเวลาจริงและ consistent (เช่น geographic_bounds, landmark_bounds)
+    stats (ถ้ามี) เป็น dict ที่จะถูกเพิ่มค่า "nodes_expanded" ตามจำนวน label ที่ถูกขยาย
+
+    max_expansions / deadline (ค่าของ time.perf_counter()) คืองบของการค้นหา เมื่อหมดงบจะหยุดและคืนเส้นทาง
+    ที่พบแล้ว (ซึ่งเป็นเส้นทางที่ดีที่สุดเท่าที่มีเพราะ label ออกจาก heap ตามลำดับ cost) และตั้ง stats["truncated"]
+
+    weights (ถ้ามี) คือ array weight ของ edge ที่ใช้แทน graph.weights (เช่นจาก cost_profiles.profile_weights)
+    edge ที่ weight เป็น inf ผ่านไม่ได้
+    walk_edges (ถ้ามี) คือ array bool ว่า edge ใดนับเป็นการเดิน (คู่กับ weights) แทนสายหลักของ edge ที่เป็น WALK
+    transfer_penalty บวกเข้า cost เมื่อไม่มีสายใดบน edge ที่นั่งต่อมาจาก edge ก่อนหน้าได้ label เก็บชุดสายที่ยัง
+    นั่งต่อได้ (สายร่วมของ edge ตั้งแต่ขึ้นรถ แบบเดียวกับ assign_routes) เมื่อชุดนี้ไม่มีสายร่วมกับ edge ถัดไปจึงนับเป็น
+    การเปลี่ยนสาย heuristic ยังใช้ได้เพราะ penalty ทำให้ cost เพิ่มขึ้นเท่านั้น
+    edge_deltas (ถ้ามี) คือ dict ตำแหน่ง edge → เวลาที่บวกเพิ่ม (inf = ผ่านไม่ได้) จาก disruptions.DisruptionOverlay
+
+    source_costs / target_costs (ถ้ามี) คือ dict stop_id → เวลาเดินจากต้นทางจริง / ไปปลายทางจริง ใช้แทน source / target
+    เทียบเท่าการเพิ่ม super-node ต้นทางที่มี edge ไปทุกป้ายใน source_costs และ super-node ปลายทางที่รับ edge
+    จากทุกป้ายใน target_costs แล้วค้นหาครั้งเดียว: ทุกป้ายต้นทางเริ่มเป็น label ด้วย cost เท่ากับเวลาเดิน
+    และเมื่อถึงป้ายปลายทางจะได้ label "ถึงแล้ว" ที่ cost รวมเวลาเดินออก (ป้ายนั้นยังขยายต่อได้ เพราะนั่งต่อไป
+    ลงป้ายอื่นที่ใกล้กว่าอาจดีกว่า) heuristic จึงต้องไม่เกิน cost ที่เหลือรวมเวลาเดินออกด้วย
+    เวลาเดินเข้า/ออกไม่นับใน walk_threshold และรวมอยู่ใน cost ที่คืนค่า (path เริ่ม/จบที่ป้าย)
+
+    คืนค่า list ของ (cost, walk_count, path) โดย path เป็น list ของ stop_id เรียงตาม cost
+    """
+    if stats is not None:
+        stats.setdefault("nodes_expanded", 0)
+
+    index = graph.index
+    blocked = {index[stop_id] for stop_id in (avoid_nodes or ()) if stop_id in index}
+    sources = {index[stop_id]: cost for stop_id, cost in (source_costs or {source: 0}).items()
+               if stop_id in index and index[stop_id] not in blocked}
+    targets = {index[stop_id]: cost for stop_id, cost in (target_costs or {target: 0}).items()
+               if stop_id in index and index[stop_id] not in blocked}
+    if not sources or not targets:
+        return []
+    arrived = graph.number_of_nodes()  # node เสมือนของ super-node ปลายทาง
+
+    indptr, indices, route_codes = graph.indptr, graph.indices, graph.route_codes
+    route_ptr, route_list = graph.route_ptr, graph.route_list
+    if weights is None:
+        weights = graph.weights
+    walk_code = graph.walk_code
+    # ถ้าไม่จำกัดการเดิน ให้ทุก label อยู่ระดับเดียวกัน
+    levels = walk_threshold + 1 if walk_threshold is not None else 1
+
+    def level_of(walks):
+        return walks if walk_threshold is not None else 0
+
+    def is_dominated(counts, walks):
+        return counts is not None and sum(counts[:level_of(walks) + 1]) >= k
+
+    bounds = heuristic.tolist() if heuristic is not None else None
+    label_node, label_parent, label_walks, label_cost, label_route = [], [], [], [], []
+    heap = []
+    for source, cost in sources.items():
+        bound = bounds[source] if bounds is not None else 0
+        if bound == float('inf'):
+            continue
+        label_node.append(source)
+        label_parent.append(-1)
+        label_walks.append(0)
+        label_cost.append(cost)
+        label_route.append(None)
+        heapq.heappush(heap, (cost + bound, len(label_node) - 1))
+    settled = {}
+    results = []
+    expanded = 0
+    pops = 0
+
+    while heap and len(results) < k:
+        pops += 1
+        if pops % DEADLINE_CHECK_INTERVAL == 0:
+            check_cpu_budget()
+        if (max_expansions is not None and expanded >= max_expansions) or (
+            deadline is not None and pops % DEADLINE_CHECK_INTERVAL == 0 and time.perf_counter() > deadline
+        ):
+            if stats is not None:
+                stats["truncated"] = True
+            break
+        _, label = heapq.heappop(heap)
+        cost = label_cost[label]
+        u = label_node[label]
+        walks = label_walks[label]
+        route = label_route[label]
+
+        if u == arrived:
+            path = label_path(label_node, label_parent, label_parent[label])
+            results.append((cost, walks, [graph.stop_ids[node] for node in path]))
+            continue
+
+        counts = settled.setdefault(u, [0] * levels)
+        if is_dominated(counts, walks):
+            continue
+        counts[level_of(walks)] += 1
+        expanded += 1
+
+        path = label_path(label_node, label_parent, label)
+        if u in targets:
+            # ปลายทางที่ไม่ต้องเดินต่อ (เช่น target ปกติ) จบที่นี่เลยเหมือนเดิม
+            if targets[u] == 0:
+                results.append((cost, walks, [graph.stop_ids[node] for node in path]))
+                continue
+            label_node.append(arrived)
+            label_parent.append(label)
+            label_walks.append(walks)
+            label_cost.append(cost + targets[u])
+            label_route.append(route)
+            heapq.heappush(heap, (cost + targets[u], len(label_node) - 1))
+
+        on_path = set(path)
+        a, b = int(indptr[u]), int(indptr[u + 1])
+        codes = route_codes[a:b].tolist()
+        walking = walk_edges[a:b].tolist() if walk_edges is not None else [code == walk_code for code in codes]
+        for e, v, w, route_code, is_walk in zip(range(a, b), indices[a:b].tolist(), weights[a:b].tolist(), codes, walking):
+            if v in on_path or v in blocked:
+                continue
+            if edge_deltas and e in edge_deltas:
+                w += edge_deltas[e]
+            if w == float('inf'):
+                continue
+            new_walks = walks + is_walk
+            if walk_threshold is not None and new_walks > walk_threshold:
+                continue
+            if is_dominated(settled.get(v), new_walks):
+                continue
+            bound = bounds[v] if bounds is not None else 0
+            if bound == float('inf'):
+                continue
+
+            label_node.append(v)
+            label_parent.append(label)
+            label_walks.append(new_walks)
+            riding = None
+            if transfer_penalty:
+                riding = frozenset(route_list[int(route_ptr[e]):int(route_ptr[e + 1])].tolist()) or frozenset((route_code,))
+                if route is not None:
+                    if route & riding:
+                        riding = route & riding
+                    else:
+                        w += transfer_penalty
+            label_route.append(riding)
+            label_cost.append(cost + w)
+            heapq.heappush(heap, (cost + w + bound, len(label_node) - 1))
+
+    if stats is not None:
+        stats["nodes_expanded"] += expanded
+    return results
@@ -0,0 +1,163 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 1024   # จำนวนผลลัพธ์สูงสุดที่เก็บในหน่วยความจำ (และในไฟล์ถ้าเปิดใช้)
+CACHE_TTL = 600     # อายุของผลลัพธ์ (วินาที)
+
+
+def file_version(path):
+    """รุ่นของไฟล์กราฟ (mtime, ขนาด) ใช้ตรวจว่ากราฟถูกเขียนใหม่หรือไม่"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return f"{stat.st_mtime_ns}:{stat.st_size}"
+
+
+def request_key(**params):
+    """แปลงพารามิเตอร์ของคำขอเป็น key เดียวกันเสมอ (set ถูกเรียงก่อน, list คงลำดับไว้)"""
+    normalized = {
+        name: sorted(value) if isinstance(value, (set, frozenset)) else value
+        for name, value in params.items()
+    }
+    return json.dumps(normalized, sort_keys=True, ensure_ascii=False, default=str)
+
+
+class DiskStore:
+    """
+    ที่เก็บผลลัพธ์ร่วมกันหลาย worker บนไฟล์ SQLite (โหมด WAL อ่านพร้อมกันได้)
+    แต่ละรายการผูกกับ version ของตัวเอง worker ที่ยังใช้รุ่นเก่าระหว่างสลับรุ่นจึงไม่ลบหรือทับรายการของรุ่นใหม่
+    ลบรายการที่อายุเกิน ttl และรายการที่ใช้ล่าสุดนานที่สุดเมื่อเกิน max_entries
+    """
+
+    def __init__(self, path, max_entries, ttl=CACHE_TTL):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.local = threading.local()
+        with self.connection() as db:
+            db.execute("CREATE TABLE IF NOT EXISTS results "
+                       "(key TEXT, version TEXT, created REAL, accessed REAL, value TEXT, PRIMARY KEY (key, version))")
+            db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+
+    def connection(self):
+        # sqlite3 connection ใช้ข้าม thread ไม่ได้ จึงเปิดแยกต่อ thread
+        db = getattr(self.local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5)
+            db.execute("PRAGMA journal_mode=WAL")
+            self.local.db = db
+        return db
+
+    def get(self, key, version, min_created):
+        with self.connection() as db:
+            row = db.execute("SELECT value FROM results WHERE key = ? AND version = ? AND created >= ?",
+                             (key, version, min_created)).fetchone()
+            if row is None:
+                return None
+            db.execute("UPDATE results SET accessed = ? WHERE key = ? AND version = ?", (time.time(), key, version))
+        return json.loads(row[0])
+
+    def put(self, key, version, value):
+        now = time.time()
+        with self.connection() as db:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?)",
+                       (key, version, now, now, json.dumps(value, ensure_ascii=False)))
+            db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl,))
+            db.execute("DELETE FROM results WHERE rowid IN "
+                       "(SELECT rowid FROM results ORDER BY accessed DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def clear(self):
+        with self.connection() as db:
+            db.execute("DELETE FROM results")
+
+
+class ResultCache:
+    """
+    cache ผลลัพธ์แบบ LRU ในหน่วยความจำ จำกัดทั้งจำนวนรายการและอายุ (TTL)
+    ทุก get/put ต้องระบุ version ของกราฟ ถ้า version เปลี่ยน cache จะถูกล้างทั้งหมด
+    disk_path (ถ้ามี) เปิดใช้ DiskStore เป็นชั้นที่สองที่ worker หลาย process ใช้ร่วมกัน
+    """
+
+    def __init__(self, max_entries=CACHE_SIZE, ttl=CACHE_TTL, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.version = None
+        self.lock = threading.Lock()
+        self.disk = DiskStore(disk_path, max_entries, ttl) if disk_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def check_version(self, version):
+        if version != self.version:
+            if self.version is not None:
+                self.invalidations += 1
+            self.entries.clear()
+            self.version = version
+
+    def get(self, key, version):
+        with self.lock:
+            self.check_version(version)
+            entry = self.entries.get(key)
+            if entry is not None:
+                created, value = entry
+                if time.time() - created <= self.ttl:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+
+        if self.disk is not None:
+            value = self.disk.get(key, version, time.time() - self.ttl)
+            if value is not None:
+                with self.lock:
+                    self.disk_hits += 1
+                    self.store(key, value)
+                return value
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, version, value):
+        with self.lock:
+            self.check_version(version)
+            self.store(key, value)
+        if self.disk is not None:
+            self.disk.put(key, version, value)
+
+    def store(self, key, value):
+        self.entries[key] = (time.time(), value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "size": len(self.entries),
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "shared": self.disk is not None,
+        }
@@ -0,0 +1,119 @@
+import numpy as np
+
+# ตัวคั่นรายการสายใน attribute ของ edge (GraphML เก็บได้เฉพาะค่าเดี่ยว จึงเก็บเป็น string)
+ROUTE_SEPARATOR = "|"
+
+
+def aggregate_route_edges(trip_edges):
+    """
+    รวม edge จาก build_trip_edges ให้เหลือ edge เดียวต่อคู่ป้าย โดยเก็บทุกสายที่วิ่งผ่าน
+
+    คืนค่า DataFrame คอลัมน์ from_stop, to_stop, weight, route_id, route_ids,
+    route_min_times, route_median_times
+    - weight / route_id คือสายที่เร็วที่สุด (ใช้เป็นค่าหลักในการค้นหา)
+    - route_ids, route_min_times, route_median_times เรียงจากสายที่เร็วที่สุด คั่นด้วย ROUTE_SEPARATOR
+    """
+    per_route = (
+        trip_edges
+        .groupby(['from_stop', 'to_stop', 'route_id'], sort=False)['travel_time']
+        .agg(['min', 'median'])
+        .reset_index()
+        .sort_values(['from_stop', 'to_stop', 'min'], kind='mergesort')
+    )
+    per_route['min'] = per_route['min'].astype(np.int64)
+    per_route['median'] = np.round(per_route['median']).astype(np.int64)
+
+    def join(values):
+        return ROUTE_SEPARATOR.join(map(str, values))
+
+    edges = per_route.groupby(['from_stop', 'to_stop'], sort=False).agg(
+        weight=('min', 'first'),
+        route_id=('route_id', 'first'),
+        route_ids=('route_id', join),
+        route_min_times=('min', join),
+        route_median_times=('median', join)
+    )
+    return edges.reset_index()
+
+
+def edge_routes(edge_data):
+    """
+    คืนค่า list ของ (route_id, travel_time) ของทุกสายบน edge เรียงจากสายที่เร็วที่สุด
+    รองรับกราฟเก่าที่มีแค่ route_id เดียว และ edge จาก CompiledGraph (มี routes อยู่แล้ว) ด้วย
+    """
+    if 'routes' in edge_data:
+        return edge_data['routes']
+    route_ids = edge_data.get('route_ids')
+    if not route_ids:
+        return [(str(edge_data.get('route_id', 'N/A')), edge_data.get('weight', 0))]
+    times = str(edge_data.get('route_min_times', '')).split(ROUTE_SEPARATOR)
+    return [(route_id, int(time)) for route_id, time in zip(str(route_ids).split(ROUTE_SEPARATOR), times)]
+
+
+def route_entries(edge_data):
+    """คืนค่า list ของ (route_id, เวลาต่ำสุด, เวลามัธยฐาน) ของทุกสายบน edge ของ networkx"""
+    medians = str(edge_data['route_median_times']).split(ROUTE_SEPARATOR) if edge_data.get('route_median_times') else []
+    return [(route_id, int(travel_time), int(medians[position]) if position < len(medians) else int(travel_time))
+            for position, (route_id, travel_time) in enumerate(edge_routes(edge_data))]
+
+
+def set_route_entries(edge_data, entries):
+    """
+    เขียน attribute ของ edge ใหม่จาก list ของ (route_id, เวลาต่ำสุด, เวลามัธยฐาน)
+    เรียงจากสายที่เร็วที่สุด แล้วให้ weight / route_id เป็นของสายแรก (รูปแบบเดียวกับ aggregate_route_edges)
+    """
+    entries = sorted(entries, key=lambda entry: entry[1])
+
+    def join(position):
+        return ROUTE_SEPARATOR.join(str(entry[position]) for entry in entries)
+
+    edge_data.update({
+        "weight": int(entries[0][1]),
+        "route_id": entries[0][0],
+        "route_ids": join(0),
+        "route_min_times": join(1),
+        "route_median_times": join(2)
+    })
+
+
+def assign_routes(G, path, disruptions=None):
+    """
+    เลือกสายให้แต่ละ edge บน path โดยให้เปลี่ยนสายน้อยที่สุด
+
+    ต่อสายเดิมให้ยาวที่สุดเท่าที่ยังมีสายร่วมกัน (greedy ซึ่งให้จำนวนช่วงน้อยที่สุด)
+    ถ้าในช่วงเดียวกันมีหลายสายให้เลือก จะเลือกสายที่ใช้เวลารวมน้อยที่สุด
+
+    disruptions (DisruptionOverlay ถ้ามี) ตัดสายที่ปิดออก และบวกเวลาที่ล่าช้าของสาย/edge เข้าในเวลาเดินทาง
+
+    คืนค่า (list ของ (route_id, travel_time) ต่อ edge, จำนวนครั้งที่เปลี่ยนสาย)
+    """
+    assigned = []
+    num_route_changes = -1
+    run_edges = []
+    run_candidates = None
+
+    def close_run():
+        best_route = min(run_candidates, key=lambda route_id: (sum(times[route_id] for times in run_edges), route_id))
+        assigned.extend((best_route, times[best_route]) for times in run_edges)
+
+    for i in range(len(path) - 1):
+        times = dict(edge_routes(G[path[i]][path[i + 1]]))
+        if disruptions is not None and not disruptions.is_empty:
+            delay = disruptions.edge_delays.get((path[i], path[i + 1]), 0)
+            times = {route_id: time + disruptions.route_delays.get(route_id, 0) + delay
+                     for route_id, time in times.items() if route_id not in disruptions.closed_routes} or times
+        if run_candidates is not None:
+            shared = run_candidates & times.keys()
+            if shared:
+                run_candidates = shared
+                run_edges.append(times)
+                continue
+            close_run()
+        num_route_changes += 1
+        run_candidates = set(times)
+        run_edges = [times]
+
+    if run_candidates is not None:
+        close_run()
+
+    return assigned, num_route_changes
@@ -0,0 +1,141 @@
+import os
+import sys
+import json
+import time
+import random
+import logging
+import contextvars
+from contextlib import contextmanager
+
+# ระดับ TRACE สำหรับข้อความต่อเส้นทาง/ต่อ edge (ต่ำกว่า DEBUG) ปิดไว้โดยค่าเริ่มต้น
+TRACE = 5
+logging.addLevelName(TRACE, "TRACE")
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# สัดส่วนของคำขอที่จะบันทึก TRACE เมื่อ LOG_LEVEL=TRACE (เช่น 0.01 = สุ่ม 1% ของคำขอ)
+TRACE_SAMPLE_RATE = float(os.environ.get("LOG_TRACE_SAMPLE", 1.0))
+
+_current = contextvars.ContextVar("search_log_request", default=None)
+
+
+class JsonFormatter(logging.Formatter):
+    """หนึ่งบรรทัดต่อ record เป็น JSON: เวลา, ระดับ, logger, event, ข้อความ และ field เพิ่มเติม"""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": getattr(record, "event", None),
+            "msg": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def get_logger(name, stream=None):
+    """logger ที่เขียน JSON lines ไปยัง stdout ตั้งค่าครั้งเดียวต่อชื่อ"""
+    logger = logging.getLogger(name)
+    if not logger.handlers:
+        handler = logging.StreamHandler(stream or sys.stdout)
+        handler.setFormatter(JsonFormatter())
+        logger.addHandler(handler)
+        logger.setLevel(LOG_LEVEL if isinstance(logging.getLevelName(LOG_LEVEL), int) else "INFO")
+        logger.propagate = False
+    return logger
+
+
+def log_event(logger, level, event, message, **fields):
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"event": event, "fields": fields})
+
+
+class RequestLog:
+    """
+    บันทึกของคำขอหนึ่งคำขอ: นับตัวเลข (เส้นทางที่พิจารณา, ข้าม ฯลฯ) ระหว่างค้นหา
+    แล้วส่ง record สรุป "request_summary" ครั้งเดียวเมื่อจบคำขอ
+
+    โค้ดใน loop ควรเช็ก `if req.tracing:` ก่อนเรียก trace เพื่อไม่ต้องสร้างข้อความเลยเมื่อปิดอยู่
+    """
+
+    def __init__(self, logger, endpoint, **fields):
+        self.logger = logger
+        self.endpoint = endpoint
+        self.fields = fields
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.tracing = logger.isEnabledFor(TRACE) and (TRACE_SAMPLE_RATE >= 1 or random.random() < TRACE_SAMPLE_RATE)
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, **fields):
+        self.fields.update(fields)
+
+    def trace(self, event, message, **fields):
+        if self.tracing:
+            self.logger.log(TRACE, message, extra={"event": event, "fields": fields})
+
+    def debug(self, event, message, **fields):
+        log_event(self.logger, logging.DEBUG, event, message, **fields)
+
+    def info(self, event, message, **fields):
+        log_event(self.logger, logging.INFO, event, message, **fields)
+
+    def warning(self, event, message, **fields):
+        log_event(self.logger, logging.WARNING, event, message, **fields)
+
+    def summary(self):
+        duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+        log_event(self.logger, logging.INFO, "request_summary", f"{self.endpoint} {duration_ms} ms",
+                  endpoint=self.endpoint, duration_ms=duration_ms, **self.counters, **self.fields)
+
+
+class NullRequestLog(RequestLog):
+    """ใช้เมื่อเรียกฟังก์ชันค้นหานอกคำขอ (เช่นจากสคริปต์) ไม่บันทึกอะไร"""
+
+    def __init__(self):
+        self.tracing = False
+        self.counters = {}
+        self.fields = {}
+
+    def count(self, name, amount=1):
+        pass
+
+    def set(self, **fields):
+        pass
+
+    def trace(self, event, message, **fields):
+        pass
+
+    def debug(self, event, message, **fields):
+        pass
+
+    def info(self, event, message, **fields):
+        pass
+
+    def warning(self, event, message, **fields):
+        pass
+
+    def summary(self):
+        pass
+
+
+NULL_REQUEST_LOG = NullRequestLog()
+
+
+def current_request():
+    """RequestLog ของคำขอที่กำลังทำงานอยู่ (NULL_REQUEST_LOG ถ้าไม่มี)"""
+    return _current.get() or NULL_REQUEST_LOG
+
+
+@contextmanager
+def request_log(logger, endpoint, **fields):
+    """เปิด RequestLog ให้โค้ดที่เรียกต่อ ๆ ไปใช้ผ่าน current_request() แล้วส่งสรุปเมื่อจบ"""
+    req = RequestLog(logger, endpoint, **fields)
+    token = _current.set(req)
+    try:
+        yield req
+    finally:
+        _current.reset(token)
+        req.summary()
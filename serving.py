@@ -0,0 +1,49 @@
+import signal
+import threading
+from contextlib import contextmanager
+
+CPU_BUDGET_SECONDS = 5.0  # เวลา CPU สูงสุดต่อคำขอ
+
+
+class CpuBudgetExceeded(Exception):
+    pass
+
+
+_budget_exceeded = False
+
+
+def _flag_budget_exceeded(signum, frame):
+    global _budget_exceeded
+    _budget_exceeded = True
+
+
+def check_cpu_budget():
+    """จุดตรวจของลูปค้นหา: เกิด CpuBudgetExceeded ถ้า cpu_budget ที่ครอบอยู่หมดงบแล้ว"""
+    if _budget_exceeded:
+        raise CpuBudgetExceeded()
+
+
+@contextmanager
+def cpu_budget(seconds=CPU_BUDGET_SECONDS):
+    """
+    จำกัดเวลา CPU ของโค้ดใน block ด้วย ITIMER_PROF (นับเฉพาะเวลาที่ process ใช้ CPU จริง)
+    เกินงบแล้ว signal handler แค่ตั้ง flag และ CpuBudgetExceeded เกิดที่ check_cpu_budget ในลูปค้นหา
+    (ไม่ขัดจังหวะโค้ดกลางคันเช่นระหว่างอัปเดต cache)
+
+    signal ทำงานได้เฉพาะ main thread จึงใช้ได้กับ worker แบบ sync ของ gunicorn และ process pool
+    ถ้าเรียกจาก thread อื่น (เช่น dev server ของ Flask) หรือ seconds เป็น None จะไม่จำกัด
+    """
+    if not seconds or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    global _budget_exceeded
+    _budget_exceeded = False
+    previous = signal.signal(signal.SIGPROF, _flag_budget_exceeded)
+    signal.setitimer(signal.ITIMER_PROF, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, previous)
+        _budget_exceeded = False
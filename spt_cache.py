@@ -0,0 +1,152 @@
+import heapq
+import threading
+from time import perf_counter
+from collections import OrderedDict
+import numpy as np
+from path_search import DEADLINE_CHECK_INTERVAL
+from serving import check_cpu_budget
+
+SPT_CACHE_BYTES = 64 * 1024 * 1024  # หน่วยความจำสูงสุดของต้นไม้ทั้งหมด
+SPT_MIN_REQUESTS = 2                 # สร้างต้นไม้เมื่อต้นทางถูกขอครบจำนวนนี้ (ต้นทางที่ขอครั้งเดียวไม่คุ้มค่าค้นหาเต็มกราฟ)
+SPT_TRACKED_ORIGINS = 4096           # จำนวนต้นทางที่นับคำขอไว้
+
+
+def shortest_path_tree(graph, source, blocked=(), deadline=None):
+    """
+    Dijkstra เต็มกราฟจาก node source (ไม่จำกัดจำนวนครั้งที่เดิน)
+    คืนค่า (dist, pred): ระยะทางไปทุก node (ไปไม่ถึงเป็น inf) และ node ก่อนหน้าบนต้นไม้ (-1 ถ้าไม่มี)
+    หรือ None ถ้าเลย deadline (ค่าของ time.perf_counter()) ก่อนค้นหาเสร็จ
+    """
+    indptr, indices, weights = graph.indptr.tolist(), graph.indices.tolist(), graph.weights.tolist()
+    n = len(indptr) - 1
+    dist = [float('inf')] * n
+    pred = [-1] * n
+    dist[source] = 0
+    heap = [(0, source)]
+    pops = 0
+    while heap:
+        pops += 1
+        if pops % DEADLINE_CHECK_INTERVAL == 0:
+            check_cpu_budget()
+            if deadline is not None and perf_counter() > deadline:
+                return None
+        d, u = heapq.heappop(heap)
+        if d > dist[u]:
+            continue
+        for k in range(indptr[u], indptr[u + 1]):
+            v = indices[k]
+            if v in blocked:
+                continue
+            nd = d + weights[k]
+            if nd < dist[v]:
+                dist[v] = nd
+                pred[v] = u
+                heapq.heappush(heap, (nd, v))
+    return np.asarray(dist, dtype=np.float64), np.asarray(pred, dtype=np.int32)
+
+
+class ShortestPathTree:
+    """ต้นไม้เส้นทางที่สั้นที่สุดจากต้นทางหนึ่ง ตอบเส้นทางที่ดีที่สุดไปปลายทางใดก็ได้ด้วยการไล่ pred"""
+
+    def __init__(self, source, dist, pred):
+        self.source = source
+        self.dist = dist
+        self.pred = pred
+
+    @property
+    def nbytes(self):
+        return self.dist.nbytes + self.pred.nbytes
+
+    def path_to(self, target):
+        """path (เลข node) จากต้นทางไป target หรือ None ถ้าไปไม่ถึง"""
+        if not np.isfinite(self.dist[target]):
+            return None
+        path = [target]
+        while path[-1] != self.source:
+            path.append(int(self.pred[path[-1]]))
+        return path[::-1]
+
+    def bounds_to(self, target):
+        """
+        lower bound ของเวลาจากทุก node ไป target: d(s, t) - d(s, v) (อสมการสามเหลี่ยมโดยใช้ต้นทางเป็น landmark)
+        ต้นไม้ไม่จำกัดการเดิน จึงไม่เกินเวลาจริงของเส้นทางที่จำกัดการเดินด้วย
+        """
+        with np.errstate(invalid='ignore'):
+            bounds = self.dist[target] - self.dist
+        return np.where(np.isfinite(bounds), np.maximum(bounds, 0.0), 0.0)
+
+
+class ShortestPathTreeCache:
+    """
+    เก็บ ShortestPathTree ต่อ (ต้นทาง, avoid_nodes) จำกัดหน่วยความจำรวม max_bytes
+    ลบต้นไม้ที่ใช้ล่าสุดนานที่สุดก่อน และล้างทั้งหมดเมื่อ version ของกราฟเปลี่ยน
+    """
+
+    def __init__(self, max_bytes=SPT_CACHE_BYTES, min_requests=SPT_MIN_REQUESTS):
+        self.max_bytes = max_bytes
+        self.min_requests = min_requests
+        self.trees = OrderedDict()
+        self.requests = OrderedDict()
+        self.bytes = 0
+        self.version = None
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.builds = 0
+        self.evictions = 0
+
+    def tree(self, graph, source, avoid_nodes=(), version=None, deadline=None):
+        """
+        ต้นไม้จาก stop source (None ถ้าต้นทางนี้ยังไม่ถูกขอบ่อยพอ)
+        ต้นไม้ที่ยังไม่มีจะถูกสร้างเมื่อถูกขอครบ min_requests ครั้ง
+        ถ้าสร้างไม่เสร็จก่อน deadline คืน None (ไม่เก็บต้นไม้ คำขอถัดไปของต้นทางนี้จะลองสร้างใหม่)
+        """
+        key = (source, frozenset(avoid_nodes or ()))
+        with self.lock:
+            if version != self.version:
+                self.trees.clear()
+                self.requests.clear()
+                self.bytes = 0
+                self.version = version
+
+            tree = self.trees.get(key)
+            if tree is not None:
+                self.trees.move_to_end(key)
+                self.hits += 1
+                return tree
+            self.misses += 1
+
+            count = self.requests.pop(key, 0) + 1
+            self.requests[key] = count
+            while len(self.requests) > SPT_TRACKED_ORIGINS:
+                self.requests.popitem(last=False)
+            if count < self.min_requests:
+                return None
+
+        index = graph.index
+        blocked = {index[stop_id] for stop_id in key[1] if stop_id in index}
+        built = shortest_path_tree(graph, index[source], blocked, deadline)
+        if built is None:
+            return None
+        tree = ShortestPathTree(index[source], *built)
+        with self.lock:
+            if version == self.version and key not in self.trees and tree.nbytes <= self.max_bytes:
+                self.trees[key] = tree
+                self.bytes += tree.nbytes
+                self.builds += 1
+                while self.bytes > self.max_bytes:
+                    _, evicted = self.trees.popitem(last=False)
+                    self.bytes -= evicted.nbytes
+                    self.evictions += 1
+        return tree
+
+    def stats(self):
+        return {
+            "trees": len(self.trees),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "builds": self.builds,
+            "evictions": self.evictions,
+        }
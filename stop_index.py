@@ -0,0 +1,236 @@
+import os
+import math
+import unicodedata
+from bisect import bisect_left
+import numpy as np
+import pandas as pd
+from geopy.distance import geodesic
+from walking_edges import EARTH_RADIUS_M, HAVERSINE_MARGIN, WALKING_SPEED, haversine_m
+
+STOP_CELL_SIZE = 250          # ขนาดช่อง grid ของดัชนีพิกัด (เมตร)
+MAX_RING_SEARCH = 16          # ไล่ช่องรอบจุดที่ค้นไม่เกินกี่วง (4 กม.) ถ้ายังไม่ครบให้เทียบกับทุกป้ายแทน
+MIN_TRIGRAM_SIMILARITY = 0.5  # สัดส่วน trigram ของคำค้นที่ต้องพบในชื่อป้าย จึงนับว่าใกล้เคียง
+MATCH_EXACT, MATCH_PREFIX, MATCH_WORD_PREFIX, MATCH_TRIGRAM = range(4)
+MATCH_NAMES = ("exact", "prefix", "word_prefix", "trigram")
+
+
+def normalize_name(text):
+    """รูปแบบเดียวกันของชื่อป้ายและคำค้น: NFKC, ตัวพิมพ์เล็ก, ช่องว่างเหลือช่องเดียว"""
+    return " ".join(unicodedata.normalize("NFKC", str(text)).casefold().split())
+
+
+def split_stop_name(stop_name):
+    """stop_name ใน namtang-gtfs เป็น "ชื่อไทย;English name" คืนค่า (ชื่อไทย, ชื่ออังกฤษหรือ None)"""
+    parts = [part.strip() for part in str(stop_name).split(";") if part.strip()]
+    if not parts:
+        return "", None
+    return parts[0], (";".join(parts[1:]) or None)
+
+
+def trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class StopIndex:
+    """
+    ดัชนีป้ายจาก stops.txt สำหรับแปลงพิกัดหรือชื่อเป็น stop_id
+    - nearest / within: grid ขนาด STOP_CELL_SIZE เมตร (แบบเดียวกับ walking_edges) ไล่ช่องเป็นวงรอบจุดที่ค้น
+    - search: prefix ของชื่อและของแต่ละคำ (bisect บน list ที่เรียงไว้) แล้วเสริมด้วย trigram
+      เมื่อได้ผลไม่ครบ ใช้ได้ทั้งชื่อไทยและชื่ออังกฤษ
+    """
+
+    def __init__(self, stop_ids, names, lats, lons, cell_size=STOP_CELL_SIZE):
+        self.stop_ids = [str(stop_id) for stop_id in stop_ids]
+        self.lats = np.asarray(lats, dtype=np.float64)
+        self.lons = np.asarray(lons, dtype=np.float64)
+        self.names = [split_stop_name(name) for name in names]
+        self.build_grid(cell_size)
+        self.build_text_index()
+
+    @classmethod
+    def from_gtfs(cls, gtfs_dir):
+        stops = pd.read_csv(os.path.join(gtfs_dir, "stops.txt"), dtype={'stop_id': str, 'stop_name': str})
+        stops = stops.drop_duplicates('stop_id')
+        return cls(stops['stop_id'], stops['stop_name'].fillna(""), stops['stop_lat'], stops['stop_lon'])
+
+    def __len__(self):
+        return len(self.stop_ids)
+
+    def build_grid(self, cell_size):
+        # ใช้ละติจูดที่ห่างเส้นศูนย์สูตรที่สุดย่อแกน x (เหมือน walking_edges.grid_cells) ระยะบนระนาบจึงไม่เกินระยะจริง
+        # ป้ายที่อยู่นอกวงที่ r ช่องจึงห่างจากจุดที่ค้นเกิน r × cell_size เมตรเสมอ
+        located = np.flatnonzero(np.isfinite(self.lats) & np.isfinite(self.lons))
+        self.cell_size = cell_size
+        self.x_scale = np.cos(np.radians(np.max(np.abs(self.lats[located])))) if len(located) else 1.0
+        cx, cy = self.cell_of(self.lats[located], self.lons[located])
+        self.cells = {}
+        for idx, cell in zip(located.tolist(), zip(cx.tolist(), cy.tolist())):
+            self.cells.setdefault(cell, []).append(idx)
+        self.cells = {cell: np.array(members, dtype=np.int64) for cell, members in self.cells.items()}
+        self.cell_bounds = (cx.min(), cx.max(), cy.min(), cy.max()) if len(located) else (0, 0, 0, 0)
+
+    def cell_of(self, lats, lons):
+        x = np.radians(lons) * self.x_scale * EARTH_RADIUS_M
+        y = np.radians(lats) * EARTH_RADIUS_M
+        return np.floor(x / self.cell_size).astype(np.int64), np.floor(y / self.cell_size).astype(np.int64)
+
+    def point_cell(self, lat, lon):
+        x = math.radians(lon) * self.x_scale * EARTH_RADIUS_M
+        y = math.radians(lat) * EARTH_RADIUS_M
+        return math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def ring(self, x, y, r):
+        """ป้ายในช่องที่ห่างจากช่อง (x, y) r ช่องพอดี (ขอบของสี่เหลี่ยมขนาด 2r + 1)"""
+        if r == 0:
+            cells = [(x, y)]
+        else:
+            cells = [(x + dx, y + dy) for dx in (-r, r) for dy in range(-r, r + 1)]
+            cells += [(x + dx, y + dy) for dy in (-r, r) for dx in range(-r + 1, r)]
+        members = [self.cells[cell] for cell in cells if cell in self.cells]
+        return np.concatenate(members) if members else np.empty(0, dtype=np.int64)
+
+    def max_ring(self, x, y):
+        min_x, max_x, min_y, max_y = self.cell_bounds
+        return max(abs(x - min_x), abs(x - max_x), abs(y - min_y), abs(y - max_y))
+
+    def nearest(self, lat, lon, k=5, max_distance=None):
+        """
+        k ป้ายที่ใกล้ (lat, lon) ที่สุดภายใน max_distance เมตร (None = ไม่จำกัด)
+        คืนค่า list ของ (index ของป้าย, ระยะ haversine เมตร) เรียงจากใกล้ไปไกล
+        """
+        if k <= 0 or not self.cells:
+            return []
+        x, y = self.point_cell(lat, lon)
+        last_ring = self.max_ring(x, y)
+        if max_distance is not None:
+            last_ring = min(last_ring, int(max_distance // self.cell_size) + 1)
+
+        candidates = np.empty(0, dtype=np.int64)
+        distances = np.empty(0)
+        for r in range(min(last_ring, MAX_RING_SEARCH) + 1):
+            members = self.ring(x, y, r)
+            if len(members):
+                candidates = np.concatenate((candidates, members))
+                distances = np.concatenate((distances, haversine_m(lat, lon, self.lats[members], self.lons[members])))
+            # ป้ายในวงถัดไปห่างเกิน r × cell_size เมตร ถ้า k ป้ายที่ใกล้สุดอยู่ในระยะนั้นแล้วก็หยุดได้
+            if len(distances) >= k and np.partition(distances, k - 1)[k - 1] <= r * self.cell_size:
+                break
+        else:
+            if last_ring > MAX_RING_SEARCH:
+                # จุดที่ห่างจากป้ายมาก (หรือ k มาก) ไล่วงต่อไปจะช้ากว่าเทียบทุกป้ายตรง ๆ
+                candidates = np.concatenate(list(self.cells.values()))
+                distances = haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])
+
+        if max_distance is not None:
+            keep = distances <= max_distance
+            candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')[:k]
+        return list(zip(candidates[order].tolist(), distances[order].tolist()))
+
+    def within(self, lat, lon, radius):
+        """ทุกป้ายที่อยู่ห่าง (lat, lon) ไม่เกิน radius เมตร คืนค่า (array index, array ระยะเมตร) เรียงจากใกล้ไปไกล"""
+        x, y = self.point_cell(lat, lon)
+        last_ring = min(self.max_ring(x, y), int(radius // self.cell_size) + 1)
+        members = [self.ring(x, y, r) for r in range(last_ring + 1)]
+        candidates = np.concatenate(members) if members else np.empty(0, dtype=np.int64)
+        distances = haversine_m(lat, lon, self.lats[candidates], self.lons[candidates])
+        keep = distances <= radius
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind='stable')
+        return candidates[order], distances[order]
+
+    def walking_legs(self, lat, lon, radius, limit=None, speed=WALKING_SPEED, stops=None):
+        """
+        ทางเดินจาก (lat, lon) ไปป้ายที่อยู่ในระยะ radius เมตร (ไม่เกิน limit ป้ายที่ใกล้ที่สุด)
+        ถ้าระบุ stops (เช่น index ของกราฟ) ใช้เฉพาะป้ายที่อยู่ใน stops ก่อนนับ limit
+        คิดเวลาแบบเดียวกับ walking_edges.build_walking_edges: คัดด้วย haversine (เผื่อ HAVERSINE_MARGIN)
+        แล้วตัดสินด้วย geodesic และเวลา = int(ระยะ geodesic / speed)
+        คืนค่า dict stop_id → (เวลาเดินวินาที, ระยะเมตร) เรียงจากใกล้ไปไกล
+        """
+        candidates, _ = self.within(lat, lon, radius * HAVERSINE_MARGIN)
+        legs = {}
+        for idx in candidates.tolist():
+            if stops is not None and self.stop_ids[idx] not in stops:
+                continue
+            distance = geodesic((lat, lon), (self.lats[idx], self.lons[idx])).meters
+            if distance <= radius:
+                legs[self.stop_ids[idx]] = (int(distance / speed), distance)
+        if limit is not None and len(legs) > limit:
+            legs = dict(sorted(legs.items(), key=lambda item: item[1][1])[:limit])
+        return legs
+
+    def build_text_index(self):
+        # prefix: ส่วนท้ายของชื่อที่เริ่มต้นคำ (รวมทั้งชื่อ) เรียงตามตัวอักษร พร้อมป้าย, ระดับการจับคู่ และความยาวชื่อ
+        entries = []
+        grams = {}
+        for idx, names in enumerate(self.names):
+            for name in names:
+                if not name:
+                    continue
+                text = normalize_name(name)
+                words = text.split(" ")
+                start = 0
+                for i, word in enumerate(words):
+                    entries.append((text[start:], idx, MATCH_PREFIX if i == 0 else MATCH_WORD_PREFIX, len(text)))
+                    start += len(word) + 1
+                for gram in trigrams(text):
+                    grams.setdefault(gram, set()).add(idx)
+
+        entries.sort()
+        self.prefix_keys = [key for key, _, _, _ in entries]
+        self.prefix_stops = np.array([idx for _, idx, _, _ in entries], dtype=np.int64)
+        self.prefix_kinds = np.array([kind for _, _, kind, _ in entries], dtype=np.int64)
+        self.prefix_lengths = np.array([length for _, _, _, length in entries], dtype=np.int64)
+        self.trigrams = {gram: np.fromiter(sorted(stops), dtype=np.int64, count=len(stops)) for gram, stops in grams.items()}
+
+    def search(self, query, limit=10):
+        """
+        ป้ายที่ชื่อตรงกับ query คืนค่า list ของ (index ของป้าย, ชนิดการจับคู่ใน MATCH_NAMES, คะแนน 0-1)
+        เรียงตาม ตรงทั้งชื่อ → ขึ้นต้นชื่อ → ขึ้นต้นคำ (ชื่อสั้นก่อน) → trigram (คะแนนมากก่อน)
+        """
+        query = normalize_name(query)
+        if not query or limit <= 0:
+            return []
+
+        lo = bisect_left(self.prefix_keys, query)
+        hi = bisect_left(self.prefix_keys, query + "\U0010ffff", lo)
+        stops = self.prefix_stops[lo:hi]
+        kinds = self.prefix_kinds[lo:hi]
+        lengths = self.prefix_lengths[lo:hi]
+        kinds = np.where((kinds == MATCH_PREFIX) & (lengths == len(query)), MATCH_EXACT, kinds)
+
+        results = []
+        seen = set()
+        for i in np.lexsort((stops, lengths, kinds)).tolist():
+            idx = int(stops[i])
+            if idx in seen:
+                continue
+            seen.add(idx)
+            results.append((idx, MATCH_NAMES[kinds[i]], round(len(query) / int(lengths[i]), 3)))
+            if len(results) == limit:
+                return results
+
+        query_grams = trigrams(query)
+        postings = [self.trigrams[gram] for gram in query_grams if gram in self.trigrams]
+        if not postings:
+            return results
+        scores = np.bincount(np.concatenate(postings), minlength=len(self.stop_ids)) / len(query_grams)
+        candidates = np.flatnonzero(scores >= MIN_TRIGRAM_SIMILARITY)
+        for idx in candidates[np.lexsort((candidates, -scores[candidates]))].tolist():
+            if idx in seen:
+                continue
+            results.append((idx, MATCH_NAMES[MATCH_TRIGRAM], round(float(scores[idx]), 3)))
+            if len(results) == limit:
+                break
+        return results
+
+    def describe(self, idx):
+        name_th, name_en = self.names[idx]
+        lat, lon = float(self.lats[idx]), float(self.lons[idx])
+        return {
+            "stop_id": self.stop_ids[idx],
+            "name_th": name_th,
+            "name_en": name_en,
+            "lat": None if np.isnan(lat) else lat,
+            "lon": None if np.isnan(lon) else lon,
+        }
@@ -4,12 +4,14 @@ import csv
 import json
 from datetime import timedelta
 from flask import Flask, request, jsonify
+from graph_store import load_graph, shortest_simple_paths
+from search_log import current_request
 
 # ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
 sys.stdout.reconfigure(encoding='utf-8')
 
 # โหลดกราฟจากไฟล์ graph.graphml
-G = nx.read_graphml('graph/graph_updated.graphml')
+G = load_graph('graph/graph_updated.graphml')
 
 # สร้าง Flask App
 app = Flask(__name__)
@@ -27,17 +29,20 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, must_pass_
     if must_pass_nodes is None:
         must_pass_nodes = set()
 
-    print(f"🔍 Searching paths from {start} to {end} (Avoid: {avoid_nodes}, Must Pass: {must_pass_nodes}) Max {max_paths} paths...")
+    req = current_request()
+    req.debug("search_start", f"🔍 Searching paths from {start} to {end} Max {max_paths} paths...",
+              start=start, end=end, avoid_nodes=sorted(avoid_nodes), must_pass_nodes=sorted(must_pass_nodes))
 
     all_paths = []
     skipped_paths = 0  
 
     try:
-        paths_generator = nx.shortest_simple_paths(G, source=start, target=end, weight='weight')
+        paths_generator = shortest_simple_paths(G, source=start, target=end, weight='weight')
         
         for path in paths_generator:
             if len(all_paths) >= max_paths:
                 break
+            req.count("paths_examined")
             if must_pass_nodes.issubset(set(path)):
                 cost = sum(G[path[i]][path[i+1]]['weight'] for i in range(len(path)-1))
                 
@@ -45,10 +50,13 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, must_pass_
 
                 if walk_count > walk_threshold:
                     skipped_paths += 1
-                    print(f"🚫 Skipping path (WALK = {walk_count} > {walk_threshold}) (Skipped {skipped_paths} times)")
+                    req.count("paths_skipped")
+                    if req.tracing:
+                        req.trace("path_skipped", f"🚫 Skipping path (WALK = {walk_count} > {walk_threshold})",
+                                  path=path, reason="walk", walk_count=walk_count)
 
                     if skipped_paths >= max_skipped:
-                        print("⛔ Stopping search due to excessive skips")
+                        req.debug("search_stopped", "⛔ Stopping search due to excessive skips", skipped=skipped_paths)
                         break
                     continue
                 
@@ -90,16 +98,18 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, must_pass_
                     "total_travel_time_seconds": total_travel_time,
                     "num_route_changes": num_route_changes  # ✅ เก็บจำนวนครั้งที่เปลี่ยนสาย
                 })
-                print(f"🔹 Found path: {path} | Cost: {cost} | WALK: {walk_count} | Changes: {num_route_changes} | Total Travel Time: {total_travel_time} sec")
+                if req.tracing:
+                    req.trace("path", f"🔹 Found path: {path}", path=path, cost=cost, walk_count=walk_count,
+                              num_route_changes=num_route_changes, total_travel_time_seconds=total_travel_time)
 
     except nx.NetworkXNoPath:
-        print("⚠️ No path found")
+        req.debug("no_path", "⚠️ No path found", start=start, end=end)
         return []
 
     # ✅ เรียงเส้นทางโดยให้เส้นทางที่เปลี่ยนสายน้อยที่สุดมาก่อน
     all_paths = sorted(all_paths, key=lambda x: (x["num_route_changes"], x["cost"]))
 
-    print(f"✨ Total valid paths: {len(all_paths)}")
+    req.debug("search_done", f"✨ Total valid paths: {len(all_paths)}", start=start, end=end, paths=len(all_paths))
     return all_paths
 
 
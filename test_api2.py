@@ -4,12 +4,15 @@ import csv
 import json
 from datetime import timedelta
 from flask import Flask, request, jsonify
+from graph_store import load_graph, shortest_simple_paths
+from search_log import get_logger, request_log, current_request
 
 # ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
 sys.stdout.reconfigure(encoding='utf-8')
+LOG = get_logger("graph_route")
 
 # โหลดกราฟจากไฟล์ graph.graphml
-G = nx.read_graphml('graph/graph_updated.graphml')
+G = load_graph('graph/graph_updated.graphml')
 
 # สร้าง Flask App
 app = Flask(__name__)
@@ -40,21 +43,27 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, must_pass_
     if must_pass_nodes is None:
         must_pass_nodes = set()
 
-    print(f"🔍 Searching paths from {start} to {end} (Avoid: {avoid_nodes}, Must Pass: {must_pass_nodes}) Max {max_paths} paths...")
+    req = current_request()
+    req.debug("search_start", f"🔍 Searching paths from {start} to {end} Max {max_paths} paths...",
+              start=start, end=end, avoid_nodes=sorted(avoid_nodes), must_pass_nodes=sorted(must_pass_nodes))
 
     all_paths = []
     skipped_paths = 0  
 
     try:
-        paths_generator = nx.shortest_simple_paths(G, source=start, target=end, weight='weight')
+        paths_generator = shortest_simple_paths(G, source=start, target=end, weight='weight')
         
         for path in paths_generator:
             if len(all_paths) >= max_paths:
                 break
+            req.count("paths_examined")
 
             # ✅ ตรวจสอบว่าเส้นทางมี must_pass_nodes ครบถ้วนก่อนถึง end
             if not is_valid_path(path, must_pass_nodes):
-                print(f"🚫 Skipping path: {path} (does not include must_pass_nodes in order)")
+                req.count("paths_skipped")
+                if req.tracing:
+                    req.trace("path_skipped", f"🚫 Skipping path: {path} (does not include must_pass_nodes in order)",
+                              path=path, reason="must_pass")
                 continue
 
             cost = sum(G[path[i]][path[i+1]]['weight'] for i in range(len(path)-1))
@@ -63,10 +72,13 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, must_pass_
 
             if walk_count > walk_threshold:
                 skipped_paths += 1
-                print(f"🚫 Skipping path (WALK = {walk_count} > {walk_threshold}) (Skipped {skipped_paths} times)")
+                req.count("paths_skipped")
+                if req.tracing:
+                    req.trace("path_skipped", f"🚫 Skipping path (WALK = {walk_count} > {walk_threshold})",
+                              path=path, reason="walk", walk_count=walk_count)
 
                 if skipped_paths >= max_skipped:
-                    print("⛔ Stopping search due to excessive skips")
+                    req.debug("search_stopped", "⛔ Stopping search due to excessive skips", skipped=skipped_paths)
                     break
                 continue
 
@@ -106,15 +118,17 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, must_pass_
                 "total_travel_time_seconds": total_travel_time,
                 "num_route_changes": num_route_changes  
             })
-            print(f"🔹 Found path: {path} | Cost: {cost} | WALK: {walk_count} | Changes: {num_route_changes} | Total Travel Time: {total_travel_time} sec")
+            if req.tracing:
+                req.trace("path", f"🔹 Found path: {path}", path=path, cost=cost, walk_count=walk_count,
+                          num_route_changes=num_route_changes, total_travel_time_seconds=total_travel_time)
 
     except nx.NetworkXNoPath:
-        print("⚠️ No path found")
+        req.debug("no_path", "⚠️ No path found", start=start, end=end)
         return []
 
     all_paths = sorted(all_paths, key=lambda x: (x["num_route_changes"], x["cost"]))
 
-    print(f"✨ Total valid paths: {len(all_paths)}")
+    req.debug("search_done", f"✨ Total valid paths: {len(all_paths)}", start=start, end=end, paths=len(all_paths))
     return all_paths
 
 
@@ -131,25 +145,30 @@ def find_paths():
     walk_threshold = data.get("walk_threshold", 2)
     max_skipped_paths = data.get("max_skipped_paths", 10)
 
-    # ตรวจสอบว่าโหนดมีอยู่ในกราฟ
-    is_valid, error_message = validate_nodes(G, start_station, end_station)
-    if not is_valid:
-        return jsonify({"error": error_message}), 400
-
-    # ค้นหาเส้นทาง
-    paths = find_multiple_paths(
-        G, start_station, end_station,
-        max_paths=max_paths_to_show,
-        avoid_nodes=avoid_nodes,
-        must_pass_nodes=must_pass_nodes,
-        walk_threshold=walk_threshold,
-        max_skipped=max_skipped_paths
-    )
-
-    # ถ้าไม่มีเส้นทาง
-    if not paths:
-        return jsonify({"message": "⚠️ ไม่มีเส้นทางที่สามารถเดินทางได้"}), 404
-
+    with request_log(LOG, "/find_paths", start=start_station, end=end_station) as req:
+        # ตรวจสอบว่าโหนดมีอยู่ในกราฟ
+        is_valid, error_message = validate_nodes(G, start_station, end_station)
+        if not is_valid:
+            req.set(status=400)
+            return jsonify({"error": error_message}), 400
+
+        # ค้นหาเส้นทาง
+        paths = find_multiple_paths(
+            G, start_station, end_station,
+            max_paths=max_paths_to_show,
+            avoid_nodes=avoid_nodes,
+            must_pass_nodes=must_pass_nodes,
+            walk_threshold=walk_threshold,
+            max_skipped=max_skipped_paths
+        )
+        req.set(paths=len(paths))
+
+        # ถ้าไม่มีเส้นทาง
+        if not paths:
+            req.set(status=404)
+            return jsonify({"message": "⚠️ ไม่มีเส้นทางที่สามารถเดินทางได้"}), 404
+
+        req.set(status=200)
     return jsonify({"paths": paths}), 200
 
 # API Endpoint สำหรับสุขภาพเซิร์ฟเวอร์ (Health Check)
@@ -1,23 +1,26 @@
 import sys
+import logging
 import networkx as nx
 from flask import Flask, request, jsonify
+from graph_store import load_graph, shortest_simple_paths
+from search_log import get_logger, log_event, request_log, current_request
 
 sys.stdout.reconfigure(encoding='utf-8')
+LOG = get_logger("graph_route")
 
-G = nx.read_graphml('graph/graph_updated.graphml')
+G = load_graph('graph/graph_updated.graphml')
 
 app = Flask(__name__)
 
 def validate_nodes(G, start, end):
-    print("🔍 กำลังตรวจสอบจุดเริ่มต้นและปลายทาง...")
     if start not in G or end not in G:
-        print("⚠️ ไม่พบจุดเริ่มต้นหรือปลายทางในกราฟ")
+        current_request().debug("invalid_nodes", "⚠️ ไม่พบจุดเริ่มต้นหรือปลายทางในกราฟ", start=start, end=end)
         return False, "⚠️ ไม่พบจุดเริ่มต้นหรือปลายทางในกราฟ"
-    print("✅ ตรวจสอบจุดเริ่มต้นและปลายทางสำเร็จ")
     return True, None
 
 def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, walk_threshold=2, max_skipped=10):
-    print(f"🔍 กำลังค้นหาเส้นทางจาก {start} ไปยัง {end}...")
+    req = current_request()
+    req.debug("search_start", f"🔍 กำลังค้นหาเส้นทางจาก {start} ไปยัง {end}...", start=start, end=end)
     if avoid_nodes is None:
         avoid_nodes = set()
 
@@ -25,26 +28,33 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, walk_thres
     skipped_paths = 0
 
     try:
-        paths_generator = nx.shortest_simple_paths(G, source=start, target=end, weight='weight')
+        paths_generator = shortest_simple_paths(G, source=start, target=end, weight='weight')
         for path in paths_generator:
-            print(f"📜 พิจารณาเส้นทาง: {path}")
+            req.count("paths_examined")
+            if req.tracing:
+                req.trace("path", f"📜 พิจารณาเส้นทาง: {path}", path=path)
             
             # กรองเส้นทางที่มี node อยู่ใน avoid_nodes
             if any(node in avoid_nodes for node in path):
-                print(f"❌ เส้นทางนี้ถูกกรองออกเนื่องจากมี node ใน avoid_nodes: {avoid_nodes}")
+                req.count("paths_skipped")
+                if req.tracing:
+                    req.trace("path_skipped", "❌ เส้นทางนี้ถูกกรองออกเนื่องจากมี node ใน avoid_nodes", path=path, reason="avoid")
                 continue
 
             if len(all_paths) >= max_paths:
-                print(f"🔴 พบเส้นทางครบ {max_paths} เส้นทางแล้ว")
                 break
             
             walk_count = sum(1 for i in range(len(path)-1) if G[path[i]][path[i+1]].get('route_id') == "WALK")
             if walk_count > walk_threshold:
                 skipped_paths += 1
+                req.count("paths_skipped")
                 if skipped_paths >= max_skipped:
-                    print(f"❌ หยุดค้นหาเส้นทางเนื่องจากมีการข้ามเส้นทางที่เดินหลายเกิน {max_skipped} ครั้ง")
+                    req.debug("search_stopped", f"❌ หยุดค้นหาเส้นทางเนื่องจากมีการข้ามเส้นทางที่เดินหลายเกิน {max_skipped} ครั้ง",
+                              skipped=skipped_paths)
                     break
-                print(f"🚶‍♀️ ข้ามเส้นทางนี้เนื่องจากเดินมากเกิน {walk_threshold} ครั้ง")
+                if req.tracing:
+                    req.trace("path_skipped", f"🚶‍♀️ ข้ามเส้นทางนี้เนื่องจากเดินมากเกิน {walk_threshold} ครั้ง",
+                              path=path, reason="walk", walk_count=walk_count)
                 continue
             
             cost = sum(G[path[i]][path[i+1]]['weight'] for i in range(len(path)-1))
@@ -85,14 +95,14 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, walk_thres
             })
     
     except nx.NetworkXNoPath:
-        print("⚠️ ไม่มีเส้นทางที่สามารถเชื่อมต่อได้")
+        req.debug("no_path", "⚠️ ไม่มีเส้นทางที่สามารถเชื่อมต่อได้", start=start, end=end)
         return []
     
-    print(f"✅ ค้นพบเส้นทางทั้งหมด: {len(all_paths)} เส้นทาง")
+    req.debug("search_done", f"✅ ค้นพบเส้นทางทั้งหมด: {len(all_paths)} เส้นทาง", start=start, end=end, paths=len(all_paths))
     return sorted(all_paths, key=lambda x: (x["num_route_changes"], x["cost"]))
 
 def find_paths_with_must_pass(G, start, end, must_pass_nodes, max_paths=5, avoid_nodes=None, walk_threshold=2, max_skipped=10):
-    print(f"🔍 กำลังค้นหาเส้นทางจาก {start} ไปยัง {end} ที่ต้องผ่าน {must_pass_nodes}...")
+    req = current_request()
     if avoid_nodes is None:
         avoid_nodes = set()
     
@@ -105,17 +115,17 @@ def find_paths_with_must_pass(G, start, end, must_pass_nodes, max_paths=5, avoid
     current_start = start
     
     for must_pass in must_pass_nodes:
-        print(f"🔀 กำลังหาส่วนเส้นทางที่ต้องผ่าน {must_pass}...")
+        req.count("segments")
         segment_paths = find_multiple_paths(G, current_start, must_pass, max_paths, avoid_nodes, walk_threshold, max_skipped)
         if not segment_paths:
-            print(f"⚠️ ไม่พบเส้นทางที่ผ่าน {must_pass}")
+            req.debug("no_path", f"⚠️ ไม่พบเส้นทางที่ผ่าน {must_pass}", start=current_start, end=must_pass)
             return []
         all_segments.append(segment_paths)
         current_start = must_pass
     
     final_segment = find_multiple_paths(G, current_start, end, max_paths, avoid_nodes, walk_threshold, max_skipped)
     if not final_segment:
-        print("⚠️ ไม่พบเส้นทางไปยังปลายทางสุดท้าย")
+        req.debug("no_path", "⚠️ ไม่พบเส้นทางไปยังปลายทางสุดท้าย", start=current_start, end=end)
         return []
     all_segments.append(final_segment)
     
@@ -141,8 +151,7 @@ def find_paths_with_must_pass(G, start, end, must_pass_nodes, max_paths=5, avoid
             combine_segments(segments[1:], new_path, new_cost, new_walk_count, new_path_details, new_num_route_changes)
     
     combine_segments(all_segments)
-    
-    print(f"✅ ค้นพบเส้นทางที่ต้องผ่าน {len(combined_paths)} เส้นทาง")
+    req.count("combined_paths", len(combined_paths))
     return sorted(combined_paths, key=lambda x: (x["num_route_changes"], x["cost"]))
 
 
@@ -158,30 +167,31 @@ def find_paths():
     walk_threshold = data.get("walk_threshold", 2)
     max_skipped_paths = data.get("max_skipped_paths", 10)
 
-    print("🔍 รับข้อมูลการค้นหาจากผู้ใช้...")
-    is_valid, error_message = validate_nodes(G, start_station, end_station)
-    if not is_valid:
-        print(f"⚠️ ข้อผิดพลาดในการตรวจสอบจุดเริ่มต้นหรือปลายทาง: {error_message}")
-        return jsonify({"error": error_message}), 400
-
-    paths = find_paths_with_must_pass(
-        G, start_station, end_station, must_pass_nodes,
-        max_paths=max_paths_to_show,
-        avoid_nodes=avoid_nodes,
-        walk_threshold=walk_threshold,
-        max_skipped=max_skipped_paths
-    )
-
-    if not paths:
-        print("⚠️ ไม่พบเส้นทางที่สามารถเดินทางได้")
-        return jsonify({"message": "⚠️ ไม่มีเส้นทางที่สามารถเดินทางได้"}), 404
-
-    print(f"✅ พบเส้นทางที่สามารถเดินทางได้จำนวน {len(paths)} เส้นทาง")
+    with request_log(LOG, "/find_paths", start=start_station, end=end_station) as req:
+        is_valid, error_message = validate_nodes(G, start_station, end_station)
+        if not is_valid:
+            req.set(status=400)
+            return jsonify({"error": error_message}), 400
+
+        paths = find_paths_with_must_pass(
+            G, start_station, end_station, must_pass_nodes,
+            max_paths=max_paths_to_show,
+            avoid_nodes=avoid_nodes,
+            walk_threshold=walk_threshold,
+            max_skipped=max_skipped_paths
+        )
+        req.set(paths=len(paths))
+
+        if not paths:
+            req.set(status=404)
+            return jsonify({"message": "⚠️ ไม่มีเส้นทางที่สามารถเดินทางได้"}), 404
+
+        req.set(status=200)
     return jsonify({"paths": paths}), 200
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    print("🩺 ตรวจสอบสถานะระบบ...")
+    log_event(LOG, logging.DEBUG, "health_check", "🩺 ตรวจสอบสถานะระบบ...")
     return jsonify({"status": "OK"}), 200
 
 if __name__ == '__main__':
@@ -1,197 +1,1134 @@
+import os
+import io
 import sys
-import networkx as nx
-from flask import Flask, request, jsonify
+import json
+import time
+import logging
+import heapq
+import contextvars
+import multiprocessing
+from contextlib import contextmanager
+import numpy as np
+from datetime import datetime, timedelta
+from flask import Flask, request, jsonify, Response, stream_with_context, g
+from route_edges import assign_routes
+from graph_store import load_graph, compiled_path, dijkstra_distances
+from path_search import k_shortest_feasible_paths
+from transfer_search import pareto_transfer_paths
+from matrix import travel_time_matrix, single_source_times
+from timetable import build_timetable, load_timetable
+from contraction import ch_shortest_path, hierarchy_path, load_contraction_hierarchy
+from result_cache import ResultCache, file_version, request_key, CACHE_SIZE, CACHE_TTL
+from spt_cache import ShortestPathTreeCache, SPT_CACHE_BYTES
+from serving import cpu_budget, CpuBudgetExceeded, CPU_BUDGET_SECONDS
+from heuristics import load_stop_coords, fastest_speed, geographic_bounds, landmark_bounds, landmark_path, load_landmarks, point_bounds
+from search_log import get_logger, log_event, request_log, current_request
+from metrics import Metrics
+from cost_profiles import PROFILES, ProfileWeightCache, load_route_types, parse_profile
+from disruptions import DisruptionManager, EMPTY_OVERLAY, watch_file
+from graph_reload import GraphReloader, validate_graph, GRAPH_RELOAD_SECONDS
+from stop_index import StopIndex
+from walking_edges import WALKING_SPEED, WALKING_DISTANCE_THRESHOLD, WALKING_WEIGHT_MULTIPLIER
 
 sys.stdout.reconfigure(encoding='utf-8')
+# log แบบ JSON lines ระดับตาม LOG_LEVEL (TRACE = ข้อความต่อเส้นทาง/ต่อ edge, ปิดไว้โดยค่าเริ่มต้น)
+LOG = get_logger("graph_route")
 
-G = nx.read_graphml('graph/graph_updated.graphml')
+GRAPHML_PATH = 'graph/graph_updated.graphml'
+# ใช้ตารางเวลาที่ compile_graph.py บันทึกไว้ ถ้ายังไม่มีจึงสร้างจาก GTFS
+TIMETABLE_PATH = 'graph/timetable.npz'
+TIMETABLE = load_timetable(TIMETABLE_PATH) if os.path.exists(TIMETABLE_PATH) else build_timetable('namtang-gtfs')
+# Contraction Hierarchies ที่ compile_graph.py สร้างไว้ ใช้ตอบคำขอที่ต้องการเส้นทางเดียว (ถ้าไม่มีไฟล์จะใช้การค้นหาปกติ)
+CH_PATH = hierarchy_path(GRAPHML_PATH)
+# landmark สำหรับค้นหาแบบ ALT
+LANDMARK_PATH = landmark_path(GRAPHML_PATH)
+SEARCH_MODES = ("dijkstra", "astar", "alt")
+# ป้าย/edge/สายที่ปิดหรือล่าช้า วางทับกราฟโดยไม่แก้กราฟ อัปเดตผ่าน /admin/disruptions หรือไฟล์ DISRUPTIONS_PATH
+# (ทุก worker ตรวจไฟล์นี้ และ /admin/disruptions เขียนลงไฟล์นี้ การอัปเดตจึงถึงทุก worker)
+DISRUPTIONS_PATH = os.environ.get("DISRUPTIONS_PATH")
+# ตรวจไฟล์กราฟใหม่ทุกกี่วินาที (0 = ไม่ตรวจ โหลดใหม่ได้ผ่าน /admin/reload เท่านั้น)
+GRAPH_RELOAD_INTERVAL = float(os.environ.get("GRAPH_RELOAD_SECONDS", GRAPH_RELOAD_SECONDS))
+
+
+class RouteData:
+    """
+    กราฟและข้อมูลที่คำนวณจากกราฟนั้น (CH, พิกัดป้าย, landmark, weight ของ cost profile, disruption)
+    ถูกโหลดและสลับพร้อมกันทั้งชุด คำขอหนึ่งจึงใช้ข้อมูลชุดเดียวตั้งแต่ต้นจนจบแม้กราฟจะถูกโหลดใหม่ระหว่างนั้น
+    """
+
+    def __init__(self, G, version, previous=None):
+        self.G = G
+        self.version = version
+        n = G.number_of_nodes()
+        # ไฟล์ CH / landmark ที่เก่ากว่าไฟล์กราฟหรือจำนวน node ไม่ตรงเป็นของกราฟรุ่นก่อน จึงไม่ใช้
+        ch = load_contraction_hierarchy(CH_PATH) if is_artifact_current(CH_PATH) else None
+        self.ch = ch if ch is not None and len(ch["rank"]) == n else None
+        # พิกัดป้ายและ landmark สำหรับค้นหาแบบ A* / ALT
+        self.stop_lats, self.stop_lons = load_stop_coords('namtang-gtfs', G)
+        self.fastest_speed = fastest_speed(G, self.stop_lats, self.stop_lons)
+        landmarks = load_landmarks(LANDMARK_PATH) if is_artifact_current(LANDMARK_PATH) else None
+        self.landmarks = landmarks if landmarks is not None and landmarks["from_landmark"].shape[1] == n else None
+        # weight ตาม cost profile คำนวณจาก route_type ใน routes.txt แล้ว cache ไว้ต่อ profile
+        self.profile_weights = ProfileWeightCache(load_route_types('namtang-gtfs', G))
+        self.disruptions = DisruptionManager(G)
+        if previous is not None:
+            self.carry_disruptions(previous.disruptions)
+
+    def carry_disruptions(self, previous):
+        """
+        ย้าย disruption ที่ใช้อยู่ไปยังกราฟใหม่ (อ้างอิงด้วย stop_id / route_id จึงใช้ได้ข้ามรุ่นของกราฟ)
+        รุ่นของ overlay เป็น hash ของเนื้อหา กราฟใหม่จึงได้รุ่นเดิม และ cache key ที่มีรุ่นนี้ยังตรงกัน
+        """
+        if previous.current.is_empty:
+            return
+        try:
+            self.disruptions.apply(previous.current.as_update())
+        except ValueError as error:
+            log_event(LOG, logging.WARNING, "disruptions_dropped",
+                      f"⚠️ ใช้ disruption เดิมกับกราฟใหม่ไม่ได้: {error}", version=previous.current.version)
+
+
+def is_artifact_current(path):
+    """ไฟล์ที่ compile_graph.py สร้างจากกราฟ (CH, landmark) ต้องไม่เก่ากว่าไฟล์ GraphML"""
+    if not os.path.exists(path):
+        return False
+    return not os.path.exists(GRAPHML_PATH) or os.path.getmtime(path) >= os.path.getmtime(GRAPHML_PATH)
+
+def artifact_version():
+    """
+    รุ่นของไฟล์กราฟบนดิสก์ (GraphML, .bin, CH และ landmark) เปลี่ยนเมื่อไฟล์ใดถูกเขียนใหม่
+    compile_graph.py เขียนไฟล์ทีละไฟล์ จึงอาจโหลดหลายรอบจนกว่าจะได้ครบทุกไฟล์
+    """
+    paths = (GRAPHML_PATH, compiled_path(GRAPHML_PATH), CH_PATH, LANDMARK_PATH)
+    return "|".join(str(file_version(path)) for path in paths)
+
+def log_graph_reload(loaded, error):
+    if error is not None:
+        log_event(LOG, logging.WARNING, "graph_reload_failed", f"⚠️ โหลดกราฟใหม่ไม่สำเร็จ ใช้กราฟเดิมต่อ: {error}",
+                  error=str(error))
+    else:
+        log_event(LOG, logging.INFO, "graph_reloaded", f"🔄 โหลดกราฟใหม่เสร็จใน {loaded.load_seconds:.2f} วินาที",
+                  version=loaded.version, load_seconds=round(loaded.load_seconds, 3), nodes=loaded.data.G.number_of_nodes())
+
+def load_route_data(previous=None):
+    version = artifact_version()
+    return RouteData(load_graph(GRAPHML_PATH, compiled=True), version, previous)
+
+# กราฟที่ใช้อยู่ (GRAPHS.current.data) ถูกแทนทั้งชุดเมื่อโหลดกราฟใหม่เสร็จและผ่านการตรวจ
+GRAPHS = GraphReloader(load_route_data, artifact_version,
+                       validate=lambda new, old: validate_graph(new.G, old.G if old is not None else None),
+                       on_reload=log_graph_reload)
+_ROUTE_DATA = contextvars.ContextVar("route_data", default=None)
+
+def route_data():
+    """ข้อมูลกราฟของคำขอปัจจุบัน (ที่ผูกไว้ด้วย using_route_data) หรือชุดล่าสุดถ้าไม่ได้ผูก"""
+    return _ROUTE_DATA.get() or GRAPHS.current.data
+
+@contextmanager
+def using_route_data(data=None):
+    """ผูกข้อมูลกราฟชุดเดียวไว้ตลอดคำขอ โค้ดภายในเรียก route_data() แล้วได้ชุดเดิมเสมอ"""
+    token = _ROUTE_DATA.set(data or route_data())
+    try:
+        yield _ROUTE_DATA.get()
+    finally:
+        _ROUTE_DATA.reset(token)
+
+# cache ผลลัพธ์ของ /find_paths (ROUTE_CACHE_PATH = ไฟล์ SQLite ที่ใช้ร่วมกันหลาย worker, ไม่ระบุคือเก็บในหน่วยความจำอย่างเดียว)
+RESULT_CACHE = ResultCache(
+    max_entries=int(os.environ.get("ROUTE_CACHE_SIZE", CACHE_SIZE)),
+    ttl=float(os.environ.get("ROUTE_CACHE_TTL", CACHE_TTL)),
+    disk_path=os.environ.get("ROUTE_CACHE_PATH")
+)
+# ต้นไม้เส้นทางที่สั้นที่สุดของต้นทางที่ถูกขอบ่อย ใช้ตอบเส้นทางที่ดีที่สุดและนำทาง k_shortest_feasible_paths
+SPT_CACHE = ShortestPathTreeCache(max_bytes=int(os.environ.get("SPT_CACHE_BYTES", SPT_CACHE_BYTES)))
+# จำนวน process ที่ใช้กับ /find_paths/batch (สร้าง pool ครั้งแรกที่มี batch เข้ามา)
+BATCH_PROCESSES = int(os.environ.get("BATCH_PROCESSES", os.cpu_count() or 1))
+BATCH_POOL = None
+BATCH_POOL_VERSION = None
+# งบการค้นหาเริ่มต้นต่อคำขอ (ปรับได้ใน JSON ด้วย max_time_ms / max_expansions) หมดงบแล้วตอบเส้นทางที่พบแล้ว
+SEARCH_TIME_BUDGET_MS = int(os.environ.get("SEARCH_TIME_BUDGET_MS", 2000))
+SEARCH_EXPANSION_BUDGET = int(os.environ.get("SEARCH_EXPANSION_BUDGET", 500000))
+# เวลา CPU สูงสุดต่อการค้นหาหนึ่งคำขอ (0 = ไม่จำกัด) กันคำขอที่ค้นหานานผิดปกติแย่ง CPU ของคำขออื่น
+REQUEST_CPU_BUDGET = float(os.environ.get("REQUEST_CPU_BUDGET", CPU_BUDGET_SECONDS))
+# เวลาต่อ phase, เวลาต่อคำขอ และจำนวนเส้นทาง แสดงที่ /metrics (ปิดได้ด้วย METRICS_ENABLED=0)
+METRICS = Metrics()
+# endpoint admin ต้องส่ง header X-Admin-Token ให้ตรงกับ ADMIN_TOKEN ถ้าไม่ได้ตั้งค่านี้ endpoint admin ถูกปิด
+# (ไม่เชื่อ remote_addr เพราะหลัง reverse proxy ทุกคำขอมาจาก 127.0.0.1)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+DISRUPTION_WATCHER = None
+# เวลาที่รายงานของ edge WALK เทียบกับ weight ในกราฟ (ใช้ทั้ง describe_path, /matrix และ /isochrone)
+WALK_TIME_SCALE = 0.5
+# /matrix คำนวณได้ไม่เกินจำนวนช่องนี้ (ต้นทาง × ปลายทาง) ต่อคำขอ
+MAX_MATRIX_CELLS = int(os.environ.get("MAX_MATRIX_CELLS", 250000))
+MAX_ORDER_WAYPOINTS = 8  # optimize_order ใช้ Held-Karp (2^n × n²) จึงจำกัดจำนวนจุดที่ต้องผ่าน
+# ดัชนีพิกัดและชื่อป้ายจาก stops.txt สำหรับ /stops/nearest และ /stops/search (ขึ้นกับ GTFS ไม่ใช่กราฟ จึงไม่ถูกโหลดใหม่พร้อมกราฟ)
+STOP_INDEX = StopIndex.from_gtfs('namtang-gtfs')
+MAX_STOP_RESULTS = 50
+# คำขอที่ระบุพิกัด (origin / destination) เดินเข้า/ออกจากป้ายในรัศมีนี้ (เมตร) ค่าเริ่มต้นเท่าระยะเดินระหว่างป้ายในกราฟ
+ACCESS_RADIUS = WALKING_DISTANCE_THRESHOLD
+MAX_ACCESS_RADIUS = 2000
+MAX_ACCESS_STOPS = 30  # ใช้เฉพาะป้ายที่ใกล้ที่สุดเท่านี้ต่อฝั่ง จำนวน label เริ่มต้นจึงไม่โตตามรัศมี
 
 app = Flask(__name__)
 
 def validate_nodes(G, start, end):
-    print("🔍 กำลังตรวจสอบจุดเริ่มต้นและปลายทาง...")
-    if start not in G or end not in G:
-        print("⚠️ ไม่พบจุดเริ่มต้นหรือปลายทางในกราฟ")
+    """ตรวจป้ายต้นทาง/ปลายทาง (None คือฝั่งที่ระบุเป็นพิกัดแทนป้าย)"""
+    if (start is not None and start not in G) or (end is not None and end not in G):
+        current_request().debug("invalid_nodes", "⚠️ ไม่พบจุดเริ่มต้นหรือปลายทางในกราฟ", start=start, end=end)
         return False, "⚠️ ไม่พบจุดเริ่มต้นหรือปลายทางในกราฟ"
-    print("✅ ตรวจสอบจุดเริ่มต้นและปลายทางสำเร็จ")
     return True, None
 
-def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, walk_threshold=2, max_skipped=10):
-    print(f"🔍 กำลังค้นหาเส้นทางจาก {start} ไปยัง {end}...")
+def graph_version():
+    """รุ่นของกราฟที่คำขอนี้ใช้ ใช้ล้าง cache เมื่อกราฟถูกโหลดใหม่"""
+    return route_data().version
+
+def count_walks(G, path):
+    return sum(1 for i in range(len(path) - 1) if G[path[i]][path[i + 1]]['route_id'] == "WALK")
+
+def search_heuristic(search, end, destination=None):
+    """
+    lower bound ของเวลาไปยัง end ตามโหมดค้นหา (None สำหรับ dijkstra)
+    ถ้าปลายทางเป็นพิกัด (destination) ใช้ระยะเส้นตรงไปยังพิกัดนั้นทั้ง astar และ alt (landmark ผูกกับป้าย)
+    """
+    data = route_data()
+    if destination is not None:
+        if search in ("astar", "alt"):
+            return point_bounds(data.stop_lats, data.stop_lons, max(data.fastest_speed, WALKING_SPEED), *destination)
+        return None
+    target = data.G.index[end]
+    if search == "alt" and data.landmarks is not None:
+        return landmark_bounds(data.landmarks, target)
+    if search in ("astar", "alt"):
+        return geographic_bounds(data.stop_lats, data.stop_lons, data.fastest_speed, target)
+    return None
+
+def describe_path(path, assigned_routes, walk_count, num_route_changes, waits=None):
+    """
+    สร้างผลลัพธ์ของเส้นทางหนึ่งเส้น (path_details จัดกลุ่มตามสาย) จากสายที่เลือกให้แต่ละ edge
+    waits (ถ้ามี) คือเวลารอรถก่อนขึ้นแต่ละกลุ่ม จะถูกบวกเข้าใน cost และเวลาเดินทางรวม
+    """
+    req = current_request()
+    cost = 0
+    total_travel_time = 0
+    path_details = []
+    current_group = None
+    line_counter = 1
+
+    for i, (route_id, travel_time) in enumerate(assigned_routes):
+        # Adjust travel time if the route is a "WALK"
+        if route_id == "WALK":
+            travel_time = travel_time * WALK_TIME_SCALE  # Dividing the travel time by 2 for walking routes
+            if req.tracing:
+                req.trace("walk_edge", f"🚶‍♀️ เส้นทางเดิน: ลดเวลาเดินทางเหลือ {travel_time} วินาที",
+                          start=path[i], end=path[i + 1], travel_time_seconds=travel_time)
+
+        cost += travel_time
+        total_travel_time += travel_time
+
+        if current_group is None or current_group["route_id"] != route_id:
+            current_group = {
+                "route_id": route_id,
+                "lines": {}
+            }
+            if waits is not None:
+                wait = waits[len(path_details)]
+                current_group["wait_time_seconds"] = wait
+                cost += wait
+                total_travel_time += wait
+            path_details.append(current_group)
+            line_counter = 1
+
+        current_group["lines"][f"line{line_counter}"] = {
+            "start": path[i],
+            "end": path[i + 1],
+            "travel_time_seconds": travel_time
+        }
+        line_counter += 1
+
+    return {
+        "path": path,
+        "cost": cost,
+        "walk_count": walk_count,
+        "path_details": path_details,
+        "total_travel_time_seconds": total_travel_time,
+        "num_route_changes": num_route_changes
+    }
+
+def add_walking_legs(result, access_weight=None, egress_weight=None):
+    """
+    เพิ่มช่วงเดินจากพิกัดต้นทางไปป้ายแรก และจากป้ายสุดท้ายไปพิกัดปลายทาง ลงในผลจาก describe_path
+    ช่วงเดินใช้ "origin" / "destination" แทน stop_id และรวมกับกลุ่ม WALK ที่ติดกัน (ถ้ามี)
+    access_weight / egress_weight เป็นหน่วยเดียวกับ weight ของ edge WALK (จาก walking_legs)
+    และรายงานเวลาแบบเดียวกับ edge WALK ใน describe_path (× WALK_TIME_SCALE)
+    """
+    access_seconds = access_weight * WALK_TIME_SCALE if access_weight is not None else None
+    egress_seconds = egress_weight * WALK_TIME_SCALE if egress_weight is not None else None
+    path, details = result["path"], result["path_details"]
+    if access_seconds is not None:
+        line = {"start": "origin", "end": path[0], "travel_time_seconds": access_seconds}
+        if details and details[0]["route_id"] == "WALK":
+            details[0]["lines"] = {f"line{i}": leg for i, leg in enumerate([line, *details[0]["lines"].values()], 1)}
+        else:
+            details.insert(0, {"route_id": "WALK", "lines": {"line1": line}})
+        result["access_walk_seconds"] = access_seconds
+    if egress_seconds is not None:
+        line = {"start": path[-1], "end": "destination", "travel_time_seconds": egress_seconds}
+        if details and details[-1]["route_id"] == "WALK":
+            details[-1]["lines"][f"line{len(details[-1]['lines']) + 1}"] = line
+        else:
+            details.append({"route_id": "WALK", "lines": {"line1": line}})
+        result["egress_walk_seconds"] = egress_seconds
+    walked = (access_seconds or 0) + (egress_seconds or 0)
+    # เส้นทางที่ขึ้นและลงป้ายเดียวกัน (เดินอย่างเดียว) ไม่มีช่วงใดให้นับการเปลี่ยนสาย
+    result["num_route_changes"] = max(result["num_route_changes"], 0)
+    result["cost"] += walked
+    result["total_travel_time_seconds"] += walked
+    return result
+
+def find_transfer_paths(G, start, end, avoid_nodes=None, walk_threshold=2, departure_time=None, stats=None,
+                        max_expansions=None, deadline=None, disruptions=None):
+    """
+    หาเส้นทางที่เปลี่ยนสายน้อยที่สุดในแต่ละระดับเวลาเดินทาง (ชุด Pareto ของ เปลี่ยนสาย × เวลา)
+    จัดอันดับระหว่างค้นหาเลย แทนการเรียงเส้นทางที่ Yen's หาได้ทีหลัง
+    ถ้าระบุ departure_time (datetime) จะนับเวลารอรถตาม frequencies.txt และใช้เฉพาะ service ที่วิ่งในวันนั้น
+    disruptions: ป้ายที่ปิดถูกหลีกเลี่ยง สายที่ปิดขึ้นไม่ได้ ความล่าช้าของสายบวกเข้าในเวลารอรถ
+    และ edge ที่ปิด/ล่าช้าใช้กับทุกสายที่วิ่งผ่าน edge นั้น (ride_deltas)
+    """
+    req = current_request()
+    req.debug("search_start", f"🔍 กำลังค้นหาเส้นทางที่เปลี่ยนสายน้อยที่สุดจาก {start} ไปยัง {end}...",
+              start=start, end=end, algorithm="pareto")
+    boarding_wait = TIMETABLE.wait_function(departure_time) if departure_time is not None else None
+    edge_deltas = None
+    if disruptions is not None and not disruptions.is_empty:
+        avoid_nodes = set(avoid_nodes or ()) | disruptions.closed_stops
+        boarding_wait = disrupted_wait(boarding_wait, disruptions)
+        edge_deltas = disruptions.ride_deltas(G)
+    with METRICS.phase("search"):
+        pareto_paths = pareto_transfer_paths(
+            G, start, end,
+            avoid_nodes=avoid_nodes,
+            walk_threshold=walk_threshold,
+            boarding_wait=boarding_wait,
+            stats=stats,
+            max_expansions=max_expansions,
+            deadline=deadline,
+            edge_deltas=edge_deltas,
+            walk_scale=WALK_TIME_SCALE
+        )
+    METRICS.count_paths("generated", len(pareto_paths))
+    if not pareto_paths:
+        req.debug("no_path", "⚠️ ไม่มีเส้นทางที่สามารถเชื่อมต่อได้", start=start, end=end)
+        return []
+
+    all_paths = []
+    with METRICS.phase("path_details"):
+        for num_route_changes, _, walk_count, path, assigned_routes, waits in pareto_paths:
+            req.count("paths_examined")
+            if req.tracing:
+                req.trace("path", f"📜 พิจารณาเส้นทาง: {path}", path=path, num_route_changes=num_route_changes)
+            if departure_time is None:
+                all_paths.append(describe_path(path, assigned_routes, walk_count, num_route_changes))
+                continue
+            result = describe_path(path, assigned_routes, walk_count, num_route_changes, waits)
+            result["departure_time"] = departure_time.isoformat()
+            result["arrival_time"] = (departure_time + timedelta(seconds=result["total_travel_time_seconds"])).isoformat()
+            all_paths.append(result)
+    req.debug("search_done", f"✅ ค้นพบเส้นทางทั้งหมด: {len(all_paths)} เส้นทาง", start=start, end=end, paths=len(all_paths))
+    return all_paths
+
+def disrupted_wait(boarding_wait, disruptions):
+    """ครอบฟังก์ชันเวลารอรถ: สายที่ปิดคืนค่า None (ขึ้นไม่ได้) และสายที่ล่าช้ารอนานขึ้นตามเวลาที่ล่าช้า"""
+    def wait(route_id, elapsed, stop_id):
+        if route_id in disruptions.closed_routes:
+            return None
+        base = boarding_wait(route_id, elapsed, stop_id) if boarding_wait is not None else 0
+        if base is None:
+            return None
+        return base + disruptions.route_delays.get(route_id, 0)
+    return wait
+
+def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, walk_threshold=2, max_skipped=10, algorithm="k_shortest",
+                        departure_time=None, search="dijkstra", stats=None, max_expansions=None, deadline=None,
+                        cost_profile=None, disruptions=None, access=None, egress=None, destination=None):
+    """
+    หาเส้นทางที่ดีที่สุด max_paths เส้นทางที่ไม่ผ่าน avoid_nodes และเดินไม่เกิน walk_threshold ครั้ง
+    เงื่อนไขถูกบังคับระหว่างค้นหา (k_shortest_feasible_paths) จึงไม่ต้องข้ามเส้นทางทีละเส้นอีก
+    max_skipped คงไว้เพื่อให้เรียกแบบเดิมได้
+    algorithm="pareto" หรือการระบุ departure_time จะใช้ find_transfer_paths แทน
+    ถ้าต้องการเส้นทางเดียวและไม่มี avoid_nodes จะลองใช้ Contraction Hierarchies ก่อน
+    search="astar" / "alt" ใช้ lower bound จากพิกัดป้าย / landmark นำทาง และนับ node ที่ขยายลงใน stats
+    ต้นทางที่ถูกขอบ่อยจะมีต้นไม้เส้นทางใน SPT_CACHE: เส้นทางที่ดีที่สุดได้จากการไล่ต้นไม้
+    และระยะทางในต้นไม้ใช้เป็น lower bound เพิ่มให้การหา k เส้นทาง
+    max_expansions (รวมทั้งคำขอ นับจาก stats) และ deadline (time.perf_counter()) คืองบการค้นหา
+    หมดงบแล้วจะได้เส้นทางที่พบแล้วและ stats["truncated"] = True
+    cost_profile (CostProfile) เปลี่ยนวิธีคิด cost ของการค้นหาด้วย weight ชุดที่ cache ไว้ใน RouteData.profile_weights
+    profile ที่ไม่ใช่ค่าเริ่มต้นจะไม่ใช้ต้นไม้และ Contraction Hierarchies (สร้างจาก weight ฐาน)
+    disruptions (DisruptionOverlay) ปิดป้าย/edge/สายและเพิ่มเวลาที่ล่าช้า ถ้ามี edge ที่เปลี่ยนก็ไม่ใช้ต้นไม้และ CH เช่นกัน
+    access / egress (dict stop_id → weight ของทางเดินจาก walking_legs) คือทางเดินจากพิกัดต้นทางไปป้าย / จากป้ายไปพิกัดปลายทาง (destination)
+    ใช้แทน start / end โดยค้นหาครั้งเดียวจากทุกป้ายต้นทางไปทุกป้ายปลายทาง (super-node ใน k_shortest_feasible_paths)
+    ไม่ใช้ต้นไม้และ CH เพราะทั้งสองผูกกับป้ายต้นทาง/ปลายทางป้ายเดียว
+    """
+    if disruptions is None:
+        disruptions = EMPTY_OVERLAY
+    if stats is not None and max_expansions is not None:
+        max_expansions = max(0, max_expansions - stats.get("nodes_expanded", 0))
+
+    if algorithm == "pareto" or departure_time is not None:
+        return find_transfer_paths(G, start, end, avoid_nodes, walk_threshold, departure_time, stats,
+                                   max_expansions, deadline, disruptions)[:max_paths]
+
     if avoid_nodes is None:
         avoid_nodes = set()
+    if disruptions.closed_stops:
+        avoid_nodes = set(avoid_nodes) | disruptions.closed_stops
 
-    all_paths = []
-    skipped_paths = 0
+    req = current_request()
+    data = route_data()
+    custom_profile = cost_profile is not None and not cost_profile.is_default
+    walking_legs = access is not None or egress is not None
+    tree = None
+    if not custom_profile and not disruptions.edge_deltas and not walking_legs:
+        with METRICS.phase("spt_cache"):
+            tree = SPT_CACHE.tree(G, start, avoid_nodes, graph_version(), deadline)
+    if tree is not None:
+        tree_path = tree.path_to(G.index[end])
+        if tree_path is None:
+            req.debug("no_path", "⚠️ ไม่มีเส้นทางที่สามารถเชื่อมต่อได้", start=start, end=end)
+            return []
+        path = [G.stop_ids[node] for node in tree_path]
+        walk_count = count_walks(G, path)
+        if max_paths == 1:
+            METRICS.count_paths("generated")
+            if walk_threshold is None or walk_count <= walk_threshold:
+                req.count("spt_answers")
+                if req.tracing:
+                    req.trace("path", f"🌳 ใช้เส้นทางจากต้นไม้ของต้นทาง {start}: {path}", path=path, source="spt")
+                with METRICS.phase("path_details"):
+                    assigned_routes, num_route_changes = assign_routes(G, path)
+                    return [describe_path(path, assigned_routes, walk_count, num_route_changes)]
+            METRICS.count_paths("skipped")
+    elif data.ch is not None and max_paths == 1 and not avoid_nodes and search == "dijkstra" and not custom_profile \
+            and not disruptions.edge_deltas and not walking_legs:
+        with METRICS.phase("contraction"):
+            best = ch_shortest_path(data.ch, G, start, end)
+        if best is not None:
+            _, path = best
+            walk_count = count_walks(G, path)
+            METRICS.count_paths("generated")
+            if walk_threshold is None or walk_count <= walk_threshold:
+                req.count("ch_answers")
+                if req.tracing:
+                    req.trace("path", f"🏔️ ใช้เส้นทางจาก Contraction Hierarchies: {path}", path=path, source="ch")
+                with METRICS.phase("path_details"):
+                    assigned_routes, num_route_changes = assign_routes(G, path)
+                    return [describe_path(path, assigned_routes, walk_count, num_route_changes)]
+            METRICS.count_paths("skipped")
 
-    try:
-        paths_generator = nx.shortest_simple_paths(G, source=start, target=end, weight='weight')
-        for path in paths_generator:
-            print(f"📜 พิจารณาเส้นทาง: {path}")
-            
-            # กรองเส้นทางที่มี node อยู่ใน avoid_nodes
-            if any(node in avoid_nodes for node in path):
-                print(f"❌ เส้นทางนี้ถูกกรองออกเนื่องจากมี node ใน avoid_nodes: {avoid_nodes}")
-                continue
+    req.debug("search_start", f"🔍 กำลังค้นหาเส้นทางจาก {start} ไปยัง {end}...", start=start, end=end, search=search)
+    all_paths = []
 
-            if len(all_paths) >= max_paths:
-                print(f"🔴 พบเส้นทางครบ {max_paths} เส้นทางแล้ว")
-                break
-            
-            walk_count = sum(1 for i in range(len(path)-1) if G[path[i]][path[i+1]].get('route_id') == "WALK")
-            if walk_count > walk_threshold:
-                skipped_paths += 1
-                if skipped_paths >= max_skipped:
-                    print(f"❌ หยุดค้นหาเส้นทางเนื่องจากมีการข้ามเส้นทางที่เดินหลายเกิน {max_skipped} ครั้ง")
-                    break
-                print(f"🚶‍♀️ ข้ามเส้นทางนี้เนื่องจากเดินมากเกิน {walk_threshold} ครั้ง")
-                continue
-            
-            cost = 0
-            total_travel_time = 0
-            num_route_changes = -1
-            path_details = []
-            current_group = None
-            line_counter = 1
+    with METRICS.phase("heuristic"):
+        heuristic = search_heuristic(search, end, destination)
+        if tree is not None:
+            tree_bounds = tree.bounds_to(G.index[end])
+            heuristic = tree_bounds if heuristic is None else np.maximum(heuristic, tree_bounds)
+        weights, walk_edges, transfer_penalty = None, None, 0
+        edge_deltas = disruptions.edge_deltas
+        if custom_profile:
+            profile = data.profile_weights.get(G, cost_profile, graph_version(), disruptions)
+            if profile is not None:
+                # weight ของ profile คิดเฉพาะสายที่เปิดและรวมความล่าช้าไว้แล้ว (edge_deltas เทียบกับ weight ของกราฟ)
+                weights, walk_edges = profile
+                edge_deltas = None
+            transfer_penalty = cost_profile.transfer_penalty
+            # ตัวคูณที่น้อยกว่า 1 ทำให้ cost ต่ำกว่าเวลาจริง lower bound จึงต้องย่อตาม
+            if heuristic is not None and cost_profile.min_factor() < 1:
+                heuristic = heuristic * cost_profile.min_factor()
+        # ทางเดินเข้า/ออกคิด cost ตามตัวคูณการเดินของ profile เช่นเดียวกับ edge WALK
+        walk_multiplier = cost_profile.walk_multiplier if custom_profile else 1
+        source_costs = {stop_id: seconds * walk_multiplier for stop_id, seconds in access.items()} if access else None
+        target_costs = {stop_id: seconds * walk_multiplier for stop_id, seconds in egress.items()} if egress else None
 
-            for i in range(len(path) - 1):
-                edge_data = G[path[i]][path[i + 1]]
-                route_id = str(edge_data.get('route_id', 'N/A'))
-                travel_time = edge_data.get('weight', 0)
-
-                # Adjust travel time if the route is a "WALK"
-                if route_id == "WALK":
-                    print(f"🚶‍♀️ เวลาเดิม {travel_time} วินาที")
-                    travel_time = travel_time / 2  # Dividing the travel time by 2 for walking routes
-                    print(f"🚶‍♀️ เส้นทางเดิน: ลดเวลาเดินทางเหลือ {travel_time} วินาที")
-
-                cost += travel_time
-                total_travel_time += travel_time
-
-                if current_group is None or current_group["route_id"] != route_id:
-                    num_route_changes += 1
-                    current_group = {
-                        "route_id": route_id,
-                        "lines": {}
-                    }
-                    path_details.append(current_group)
-                    line_counter = 1
-
-                current_group["lines"][f"line{line_counter}"] = {
-                    "start": path[i],
-                    "end": path[i + 1],
-                    "travel_time_seconds": travel_time
-                }
-                line_counter += 1
-
-            all_paths.append({
-                "path": path,
-                "cost": cost,
-                "walk_count": walk_count,
-                "path_details": path_details,
-                "total_travel_time_seconds": total_travel_time,
-                "num_route_changes": num_route_changes
-            })
-    
-    except nx.NetworkXNoPath:
-        print("⚠️ ไม่มีเส้นทางที่สามารถเชื่อมต่อได้")
+    with METRICS.phase("search"):
+        feasible_paths = k_shortest_feasible_paths(
+            G, start, end,
+            k=max_paths,
+            avoid_nodes=avoid_nodes,
+            walk_threshold=walk_threshold,
+            heuristic=heuristic,
+            stats=stats,
+            max_expansions=max_expansions,
+            deadline=deadline,
+            weights=weights,
+            walk_edges=walk_edges,
+            transfer_penalty=transfer_penalty,
+            edge_deltas=edge_deltas,
+            source_costs=source_costs,
+            target_costs=target_costs
+        )
+    METRICS.count_paths("generated", len(feasible_paths))
+    if not feasible_paths:
+        req.debug("no_path", "⚠️ ไม่มีเส้นทางที่สามารถเชื่อมต่อได้", start=start, end=end)
         return []
-    
-    print(f"✅ ค้นพบเส้นทางทั้งหมด: {len(all_paths)} เส้นทาง")
+
+    with METRICS.phase("path_details"):
+        for _, walk_count, path in feasible_paths:
+            req.count("paths_examined")
+            if req.tracing:
+                req.trace("path", f"📜 พิจารณาเส้นทาง: {path}", path=path, walk_count=walk_count)
+
+            # เลือกสายของแต่ละช่วงจากทุกสายที่วิ่งผ่าน edge ให้เปลี่ยนสายน้อยที่สุด
+            assigned_routes, num_route_changes = assign_routes(G, path, disruptions)
+            result = describe_path(path, assigned_routes, walk_count, num_route_changes)
+            if walking_legs:
+                add_walking_legs(result, access.get(path[0]) if access else None, egress.get(path[-1]) if egress else None)
+            all_paths.append(result)
+
+    req.debug("search_done", f"✅ ค้นพบเส้นทางทั้งหมด: {len(all_paths)} เส้นทาง", start=start, end=end, paths=len(all_paths))
     return sorted(all_paths, key=lambda x: (x["num_route_changes"], x["cost"]))
 
-def find_paths_with_must_pass(G, start, end, must_pass_nodes, max_paths=5, avoid_nodes=None, walk_threshold=2, max_skipped=10):
-    print(f"🔍 กำลังค้นหาเส้นทางจาก {start} ไปยัง {end} ที่ต้องผ่าน {must_pass_nodes}...")
+def find_travel_time_matrix(G, origins, destinations, walk_threshold=2, avoid_nodes=None, processes=None, disruptions=None):
+    """
+    เมทริกซ์เวลาเดินทางจากทุก origins ไปทุก destinations (NumPy array หน่วยวินาที ไปไม่ถึงเป็น inf)
+    ค้นหาหนึ่งครั้งต่อต้นทางด้วยเงื่อนไข walk_threshold / avoid_nodes เดียวกับ find_multiple_paths
+    และรายงานเวลาเดินแบบเดียวกับ describe_path (weight ของ WALK × WALK_TIME_SCALE)
+    disruptions (DisruptionOverlay) ปิดป้าย/edge/สายและเพิ่มเวลาที่ล่าช้าแบบเดียวกับ find_multiple_paths
+    """
+    if disruptions is None:
+        disruptions = EMPTY_OVERLAY
+    times = travel_time_matrix(G, origins, destinations, walk_threshold, set(avoid_nodes or ()) | disruptions.closed_stops,
+                               processes, walk_scale=WALK_TIME_SCALE, edge_deltas=disruptions.edge_deltas,
+                               context=POOL_CONTEXT)
+    current_request().set(origins=len(origins), destinations=len(destinations), reachable_pairs=int(np.isfinite(times).sum()))
+    return times
+
+def find_isochrone(G, start, max_time, walk_threshold=2, avoid_nodes=None, disruptions=None):
+    """
+    ป้ายทั้งหมดที่ไปถึงจาก start ภายใน max_time วินาที (หยุดค้นหาทันทีเมื่อเกินงบเวลา)
+    เวลาเดินนับแบบเดียวกับ describe_path (weight ของ WALK × WALK_TIME_SCALE) ส่วน cost ของกราฟยาวกว่าเวลานี้
+    ได้ไม่เกิน 1 / WALK_TIME_SCALE เท่า จึงค้นหาถึง cost นั้นแล้วกรองด้วยเวลาจริง
+    disruptions (DisruptionOverlay) ปิดป้าย/edge/สายและเพิ่มเวลาที่ล่าช้าแบบเดียวกับ find_multiple_paths
+    คืนค่า list ของ dict (stop_id, เวลาที่ไปถึง, จำนวนครั้งที่เดิน, พิกัด) เรียงตามเวลา
+    """
+    if disruptions is None:
+        disruptions = EMPTY_OVERLAY
+    index = G.index
+    data = route_data()
+    blocked = frozenset(index[stop_id] for stop_id in set(avoid_nodes or ()) | disruptions.closed_stops if stop_id in index)
+    times, walks = single_source_times(G, index[start], walk_threshold, blocked,
+                                       max_cost=max_time / min(WALK_TIME_SCALE, 1), walk_scale=WALK_TIME_SCALE,
+                                       edge_deltas=disruptions.edge_deltas)
+
+    reached = np.flatnonzero(times <= max_time)
+    reached = reached[np.argsort(times[reached], kind='stable')]
+    stops = []
+    for node, time, walk_count, lat, lon in zip(reached.tolist(), times[reached].tolist(), walks[reached].tolist(),
+                                                data.stop_lats[reached].tolist(), data.stop_lons[reached].tolist()):
+        stops.append({
+            "stop_id": G.stop_ids[node],
+            "arrival_time_seconds": int(round(time)),
+            "walk_count": walk_count,
+            "lat": None if np.isnan(lat) else lat,
+            "lon": None if np.isnan(lon) else lon
+        })
+    current_request().set(start=start, max_time_seconds=max_time, stops=len(stops))
+    return stops
+
+def order_waypoints(G, start, end, must_pass_nodes, avoid_nodes, deadline=None, disruptions=None):
+    """
+    เรียงจุดที่ต้องผ่านใหม่ให้เวลาเดินทางรวม start → ... → end น้อยที่สุด
+    ใช้ Dijkstra แบบหลายปลายทางครั้งเดียวต่อจุด แล้วหาลำดับด้วย Held-Karp (DP บนเซตของจุดที่ผ่านแล้ว)
+    ถ้าเลย deadline ก่อนคำนวณระยะครบ ใช้ลำดับเดิม
+    disruptions (DisruptionOverlay) ปิดป้าย/edge/สายและเพิ่มเวลาที่ล่าช้าแบบเดียวกับ find_multiple_paths
+    """
+    if disruptions is None:
+        disruptions = EMPTY_OVERLAY
+    index = G.index
+    blocked = {index[node] for node in set(avoid_nodes) | disruptions.closed_stops if node in index}
+    targets = [index[node] for node in must_pass_nodes + [end]]
+    dist = []
+    for node in [start] + must_pass_nodes:
+        distances = dijkstra_distances(G, index[node], targets, blocked, deadline, disruptions.edge_deltas)
+        if distances is None:
+            return must_pass_nodes
+        dist.append(distances)
+
+    n = len(must_pass_nodes)
+    # best[(เซตที่ผ่านแล้ว, จุดล่าสุด)] = (เวลารวม, จุดก่อนหน้า)
+    best = {(1 << j, j): (dist[0][j], -1) for j in range(n)}
+    for mask in range(1, 1 << n):
+        for last in range(n):
+            if (mask, last) not in best:
+                continue
+            cost = best[(mask, last)][0]
+            for following in range(n):
+                if mask & (1 << following):
+                    continue
+                key = (mask | (1 << following), following)
+                if cost + dist[last + 1][following] < best.get(key, (float('inf'),))[0]:
+                    best[key] = (cost + dist[last + 1][following], last)
+
+    full = (1 << n) - 1
+    last = min(range(n), key=lambda j: best.get((full, j), (float('inf'),))[0] + dist[j + 1][n])
+    if best.get((full, last), (float('inf'),))[0] + dist[last + 1][n] == float('inf'):
+        return must_pass_nodes
+
+    order = []
+    mask = full
+    while last != -1:
+        order.append(must_pass_nodes[last])
+        mask, last = mask & ~(1 << last), best[(mask, last)][1]
+    return order[::-1]
+
+def merge_segments(segments):
+    """ต่อเส้นทางของแต่ละช่วง (ผลจาก find_multiple_paths) เป็นเส้นทางเดียว"""
+    path = segments[0]["path"][:]
+    for segment in segments[1:]:
+        path += segment["path"][1:]
+    return {
+        "path": path,
+        "cost": sum(segment["cost"] for segment in segments),
+        "walk_count": sum(segment["walk_count"] for segment in segments),
+        "path_details": [group for segment in segments for group in segment["path_details"]],
+        "total_travel_time_seconds": sum(segment["total_travel_time_seconds"] for segment in segments),
+        "num_route_changes": sum(segment["num_route_changes"] for segment in segments)
+    }
+
+def combine_k_best(all_segments, k):
+    """
+    เลือก k เส้นทางรวมที่ดีที่สุดตาม (จำนวนเปลี่ยนสายรวม, cost รวม) โดยไม่สร้างทุกการจับคู่
+    แต่ละช่วงเรียงตามเกณฑ์เดียวกันอยู่แล้ว จึงไล่จากการจับคู่อันดับแรกและขยับทีละช่วงด้วย heap
+    """
+    def rank_key(choice):
+        segments = [all_segments[i][j] for i, j in enumerate(choice)]
+        return (sum(segment["num_route_changes"] for segment in segments), sum(segment["cost"] for segment in segments))
+
+    first = (0,) * len(all_segments)
+    heap = [(rank_key(first), first)]
+    seen = {first}
+    combined_paths = []
+    while heap and len(combined_paths) < k:
+        _, choice = heapq.heappop(heap)
+        combined_paths.append(merge_segments([all_segments[i][j] for i, j in enumerate(choice)]))
+        for i in range(len(choice)):
+            if choice[i] + 1 < len(all_segments[i]):
+                following = choice[:i] + (choice[i] + 1,) + choice[i + 1:]
+                if following not in seen:
+                    seen.add(following)
+                    heapq.heappush(heap, (rank_key(following), following))
+    return combined_paths
+
+def find_paths_with_must_pass(G, start, end, must_pass_nodes, max_paths=5, avoid_nodes=None, walk_threshold=2, max_skipped=10, algorithm="k_shortest",
+                              departure_time=None, search="dijkstra", stats=None, optimize_order=False,
+                              max_expansions=None, deadline=None, cost_profile=None, disruptions=None,
+                              access=None, egress=None, destination=None):
+    """
+    หาเส้นทางที่ผ่าน must_pass_nodes ตามลำดับที่ผู้ใช้ให้มา (หรือจัดลำดับใหม่เมื่อ optimize_order)
+    แต่ละช่วงค้นหาแยกกัน แล้วรวมเป็น max_paths เส้นทางที่ดีที่สุดด้วย combine_k_best
+    """
+    req = current_request()
     if avoid_nodes is None:
         avoid_nodes = set()
     
     must_pass_nodes = list(must_pass_nodes) if must_pass_nodes else []
     
     if not must_pass_nodes:
-        return find_multiple_paths(G, start, end, max_paths, avoid_nodes, walk_threshold, max_skipped)
+        return find_multiple_paths(G, start, end, max_paths, avoid_nodes, walk_threshold, max_skipped, algorithm, departure_time, search, stats,
+                                   max_expansions=max_expansions, deadline=deadline, cost_profile=cost_profile,
+                                   disruptions=disruptions, access=access, egress=egress, destination=destination)
+
+    if any(node not in G for node in must_pass_nodes):
+        req.debug("invalid_nodes", "⚠️ ไม่พบจุดที่ต้องผ่านในกราฟ", must_pass_nodes=must_pass_nodes)
+        return []
+
+    if optimize_order and len(must_pass_nodes) > 1:
+        with METRICS.phase("waypoint_order"):
+            must_pass_nodes = order_waypoints(G, start, end, must_pass_nodes, avoid_nodes, deadline, disruptions)
+        req.debug("waypoint_order", f"🔀 ลำดับจุดที่ต้องผ่านที่ใช้เวลาน้อยที่สุด: {must_pass_nodes}", must_pass_nodes=must_pass_nodes)
     
     all_segments = []
-    current_start = start
-    
-    for must_pass in must_pass_nodes:
-        print(f"🔀 กำลังหาส่วนเส้นทางที่ต้องผ่าน {must_pass}...")
-        segment_paths = find_multiple_paths(G, current_start, must_pass, max_paths, avoid_nodes, walk_threshold, max_skipped)
+    for segment_start, segment_end in zip([start] + must_pass_nodes, must_pass_nodes + [end]):
+        req.count("segments")
+        segment_paths = find_multiple_paths(G, segment_start, segment_end, max_paths, avoid_nodes, walk_threshold, max_skipped, algorithm, departure_time, search, stats,
+                                   max_expansions=max_expansions, deadline=deadline, cost_profile=cost_profile,
+                                   disruptions=disruptions)
         if not segment_paths:
-            print(f"⚠️ ไม่พบเส้นทางที่ผ่าน {must_pass}")
+            req.debug("no_path", f"⚠️ ไม่พบเส้นทางจาก {segment_start} ไปยัง {segment_end}", start=segment_start, end=segment_end)
             return []
         all_segments.append(segment_paths)
-        current_start = must_pass
-    
-    final_segment = find_multiple_paths(G, current_start, end, max_paths, avoid_nodes, walk_threshold, max_skipped)
-    if not final_segment:
-        print("⚠️ ไม่พบเส้นทางไปยังปลายทางสุดท้าย")
-        return []
-    all_segments.append(final_segment)
-    
-    combined_paths = []
-    def combine_segments(segments, path_so_far=[], cost_so_far=0, walk_count_so_far=0, path_details_so_far=[], num_route_changes_so_far=0):
-        if not segments:
-            combined_paths.append({
-                "path": path_so_far,
-                "cost": cost_so_far,
-                "walk_count": walk_count_so_far,
-                "path_details": path_details_so_far,
-                "total_travel_time_seconds": cost_so_far,
-                "num_route_changes": num_route_changes_so_far
-            })
-            return
-        
-        for segment in segments[0]:
-            new_path = path_so_far[:-1] + segment["path"] if path_so_far else segment["path"]
-            new_cost = cost_so_far + segment["cost"]
-            new_walk_count = walk_count_so_far + segment["walk_count"]
-            new_path_details = path_details_so_far + segment["path_details"]
-            new_num_route_changes = num_route_changes_so_far + segment["num_route_changes"]
-            combine_segments(segments[1:], new_path, new_cost, new_walk_count, new_path_details, new_num_route_changes)
-    
-    combine_segments(all_segments)
-    
-    print(f"✅ ค้นพบเส้นทางที่ต้องผ่าน {len(combined_paths)} เส้นทาง")
-    return sorted(combined_paths, key=lambda x: (x["num_route_changes"], x["cost"]))
 
+    with METRICS.phase("combine"):
+        return combine_k_best(all_segments, max_paths)
+
+
+def parse_point(value, name):
+    """พิกัด {"lat": ..., "lon": ...} ของคำขอเป็น (lat, lon) ข้อมูลไม่ถูกต้องจะเกิด ValueError"""
+    try:
+        lat, lon = float(value["lat"]), float(value["lon"])
+    except (KeyError, TypeError, ValueError):
+        raise ValueError(f"{name} ต้องเป็น object ที่มี lat และ lon เป็นตัวเลข") from None
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError(f"{name} อยู่นอกช่วงของพิกัด")
+    return lat, lon
+
+def parse_path_request(data):
+    """
+    แปลง JSON ของ /find_paths เป็นพารามิเตอร์ค้นหา
+    คืนค่า (params, None) หรือ (None, (body, status)) ถ้าข้อมูลไม่ถูกต้อง
+    ต้นทาง/ปลายทางเป็นป้าย (start_station / end_station) หรือพิกัด (origin / destination) ก็ได้
+    ฝั่งที่เป็นพิกัดจะมี start / end เป็น None
+    """
+    params = {
+        "start": str(data.get("start_station")) if data.get("origin") is None else None,
+        "end": str(data.get("end_station")) if data.get("destination") is None else None,
+        "origin": data.get("origin"),
+        "destination": data.get("destination"),
+        "access_radius": data.get("access_radius", ACCESS_RADIUS),
+        "avoid": set(map(str, data.get("avoid_nodes", []))),
+        # คงลำดับที่ผู้ใช้ให้มา (ตัดจุดที่ซ้ำออก)
+        "must_pass": list(dict.fromkeys(map(str, data.get("must_pass_nodes", [])))),
+        "optimize_order": bool(data.get("optimize_order", False)),
+        "max_paths": data.get("max_paths", 20),
+        "walk_threshold": data.get("walk_threshold", 2),
+        "max_skipped": data.get("max_skipped_paths", 10),
+        "algorithm": data.get("algorithm", "k_shortest"),
+        "departure_time": data.get("departure_time"),
+        "search": data.get("search", "dijkstra"),
+        "max_time_ms": data.get("max_time_ms", SEARCH_TIME_BUDGET_MS),
+        "max_expansions": data.get("max_expansions", SEARCH_EXPANSION_BUDGET),
+    }
+
+    try:
+        params["cost_profile"] = parse_profile(data.get("cost_profile"))
+    except ValueError as error:
+        return None, ({"error": f"⚠️ {error}"}, 400)
+    if not params["cost_profile"].is_default and (params["algorithm"] == "pareto" or params["departure_time"] is not None):
+        return None, ({"error": "⚠️ cost_profile ใช้ได้กับ algorithm k_shortest ที่ไม่ระบุ departure_time เท่านั้น"}, 400)
+
+    if params["optimize_order"] and len(params["must_pass"]) > MAX_ORDER_WAYPOINTS:
+        return None, ({"error": f"⚠️ optimize_order รองรับจุดที่ต้องผ่านไม่เกิน {MAX_ORDER_WAYPOINTS} จุด"}, 400)
+    if params["search"] not in SEARCH_MODES:
+        return None, ({"error": f"⚠️ search ต้องเป็นหนึ่งใน {', '.join(SEARCH_MODES)}"}, 400)
+    for name in ("max_time_ms", "max_expansions"):
+        value = params[name]
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+            return None, ({"error": f"⚠️ {name} ต้องเป็นตัวเลขที่มากกว่า 0"}, 400)
+
+    if params["departure_time"] is not None:
+        try:
+            params["departure_time"] = datetime.fromisoformat(str(params["departure_time"]))
+        except ValueError:
+            return None, ({"error": "⚠️ departure_time ต้องอยู่ในรูปแบบ YYYY-MM-DDTHH:MM:SS"}, 400)
+        # แต่ละช่วงของ must_pass_nodes ค้นหาแยกกันจากเวลาออกเดินทางเดียวกัน เวลารอรถของช่วงหลังจึงผิด
+        if params["must_pass"]:
+            return None, ({"error": "⚠️ departure_time ใช้ร่วมกับ must_pass_nodes ไม่ได้"}, 400)
+
+    if params["origin"] is not None or params["destination"] is not None:
+        try:
+            for name in ("origin", "destination"):
+                if params[name] is not None:
+                    params[name] = parse_point(params[name], name)
+        except ValueError as error:
+            return None, ({"error": f"⚠️ {error}"}, 400)
+        radius = params["access_radius"]
+        if isinstance(radius, bool) or not isinstance(radius, (int, float)) or not 0 < radius <= MAX_ACCESS_RADIUS:
+            return None, ({"error": f"⚠️ access_radius ต้องเป็นตัวเลขที่มากกว่า 0 และไม่เกิน {MAX_ACCESS_RADIUS} เมตร"}, 400)
+        if params["must_pass"] or params["algorithm"] == "pareto" or params["departure_time"] is not None:
+            return None, ({"error": "⚠️ origin / destination ใช้ได้กับ algorithm k_shortest ที่ไม่มี must_pass_nodes และ departure_time เท่านั้น"}, 400)
+
+    with METRICS.phase("validate"):
+        is_valid, error_message = validate_nodes(route_data().G, params["start"], params["end"])
+    if not is_valid:
+        return None, ({"error": error_message}, 400)
+    return params, None
+
+def walking_legs(point, radius):
+    """
+    ทางเดินจากพิกัดไปป้ายในกราฟที่อยู่ในระยะ radius เมตร (ไม่เกิน MAX_ACCESS_STOPS ป้ายที่ใกล้ที่สุด)
+    dict stop_id → weight ในหน่วยเดียวกับ edge WALK ของกราฟ (วินาที × WALKING_WEIGHT_MULTIPLIER)
+    การค้นหาจึงคิดทางเดินเข้า/ออกแบบเดียวกับการเดินระหว่างป้าย
+    """
+    legs = STOP_INDEX.walking_legs(*point, radius, limit=MAX_ACCESS_STOPS, stops=route_data().G.index)
+    return {stop_id: seconds * WALKING_WEIGHT_MULTIPLIER for stop_id, (seconds, _) in legs.items()}
+
+def solve_path_request(params, disruptions=None):
+    """
+    ค้นหาเส้นทางตาม params จาก parse_path_request คืนค่า (body, status)
+    disruptions คือรุ่นของ overlay ที่ใช้ตลอดคำขอ (ค่าเริ่มต้นคือรุ่นปัจจุบันขณะเริ่มคำขอ)
+    กราฟคือ route_data() ผู้เรียกที่อาจทำงานระหว่างโหลดกราฟใหม่ต้องผูกไว้ด้วย using_route_data
+    """
+    if disruptions is None:
+        disruptions = route_data().disruptions.current
+    req = current_request()
+    req.set(start=params["start"], end=params["end"], search=params["search"], algorithm=params["algorithm"])
+    # ผลลัพธ์ขึ้นกับพารามิเตอร์ กราฟ และ disruption เท่านั้น จึงใช้ซ้ำได้จนกว่าอย่างใดอย่างหนึ่งจะเปลี่ยน
+    version = f"{graph_version()}:{disruptions.version}"
+    cache_key = request_key(**params)
+    with METRICS.phase("cache_lookup"):
+        cached = RESULT_CACHE.get(cache_key, version)
+    if cached is not None:
+        body, status = cached
+        req.set(status=status, cache_hit=True)
+        METRICS.count_paths("returned", len(body.get("paths", ())))
+        return body, status
+
+    access = egress = None
+    if params["origin"] is not None or params["destination"] is not None:
+        with METRICS.phase("walking_legs"):
+            access = walking_legs(params["origin"], params["access_radius"]) if params["origin"] is not None else None
+            egress = walking_legs(params["destination"], params["access_radius"]) if params["destination"] is not None else None
+        req.set(access_stops=len(access) if access is not None else None, egress_stops=len(egress) if egress is not None else None)
+        for legs, name in ((access, "จุดเริ่มต้น"), (egress, "ปลายทาง")):
+            if legs is not None and not legs:
+                body = {"message": f"⚠️ ไม่พบป้ายในระยะเดิน {params['access_radius']} เมตรจาก{name}", "truncated": False}
+                req.set(status=404, cache_hit=False)
+                RESULT_CACHE.put(cache_key, version, (body, 404))
+                return body, 404
+
+    stats = {"truncated": False}
+    deadline = time.perf_counter() + params["max_time_ms"] / 1000
+    try:
+        with cpu_budget(REQUEST_CPU_BUDGET):
+            paths = find_paths_with_must_pass(
+                route_data().G, params["start"], params["end"], params["must_pass"],
+                max_paths=params["max_paths"],
+                avoid_nodes=params["avoid"],
+                walk_threshold=params["walk_threshold"],
+                max_skipped=params["max_skipped"],
+                algorithm=params["algorithm"],
+                departure_time=params["departure_time"],
+                search=params["search"],
+                stats=stats,
+                optimize_order=params["optimize_order"],
+                max_expansions=params["max_expansions"],
+                deadline=deadline,
+                cost_profile=params["cost_profile"],
+                disruptions=disruptions,
+                access=access,
+                egress=egress,
+                destination=params["destination"]
+            )
+    except CpuBudgetExceeded:
+        req.warning("cpu_budget_exceeded", f"⏱️ การค้นหาใช้เวลา CPU เกิน {REQUEST_CPU_BUDGET} วินาที",
+                    start=params["start"], end=params["end"], cpu_budget_seconds=REQUEST_CPU_BUDGET)
+        req.set(status=503, cache_hit=False)
+        return {"error": f"⚠️ การค้นหาใช้เวลาเกิน {REQUEST_CPU_BUDGET} วินาที"}, 503
+
+    if not paths:
+        body, status = {"message": "⚠️ ไม่มีเส้นทางที่สามารถเดินทางได้", "truncated": stats["truncated"]}, 404
+    else:
+        body, status = {"paths": paths, "search": params["search"], "cost_profile": params["cost_profile"].to_dict(), **stats}, 200
+    req.set(status=status, cache_hit=False, paths=len(paths), **stats)
+    METRICS.count_paths("returned", len(paths))
+
+    # ผลลัพธ์ที่หมดงบก่อนขึ้นกับความเร็วเครื่องขณะนั้น จึงไม่เก็บใน cache
+    if not stats["truncated"]:
+        RESULT_CACHE.put(cache_key, version, (body, status))
+    return body, status
+
+def solve_batch_item(item):
+    key, params, disruptions = item
+    with request_log(LOG, "/find_paths/batch item"):
+        return key, solve_path_request(params, disruptions)
+
+def pool_overlay(overlay):
+    """
+    overlay เนื้อหาเดียวกับ overlay ที่ส่งมา บนกราฟที่ process ใน pool โหลดเอง (edge_deltas อ้างอิงตำแหน่ง edge
+    ของกราฟ จึงคำนวณใหม่บนกราฟของ process นี้) รุ่นเป็น hash ของเนื้อหา จึงคำนวณครั้งเดียวต่อรุ่น
+    ใช้เฉพาะใน process ของ pool ที่ไม่มี watcher เพราะแทนที่ disruption ของ process ทั้งหมด
+    """
+    manager = route_data().disruptions
+    if manager.current.version != overlay.version:
+        manager.apply(overlay.as_update())
+    return manager.current
+
+def solve_pooled_batch_item(item):
+    key, params, disruptions = item
+    return solve_batch_item((key, params, pool_overlay(disruptions)))
+
+def solve_pooled_request(params, disruptions):
+    """solve_path_request ใน process ของ pool (async_app) โดยใช้ overlay ที่คำนวณบนกราฟของ process นั้น"""
+    return solve_path_request(params, pool_overlay(disruptions))
+
+# process ใน pool เริ่มจาก forkserver (process สะอาดที่ไม่มี thread) แทนการ fork process นี้ตรง ๆ
+# เพราะ fork ขณะที่ thread ตรวจไฟล์หรือ event loop ทำงานอยู่อาจติด lock ที่ thread อื่นถือไว้ค้างใน process ลูก
+# แต่ละ process ใน pool import โมดูลนี้และโหลดกราฟเอง (ไฟล์ .bin เปิดด้วย memmap จึงใช้ page cache ร่วมกัน)
+POOL_CONTEXT = multiprocessing.get_context("forkserver")
+
+def get_batch_pool(processes):
+    """
+    pool สำหรับ batch (ใช้ POOL_CONTEXT) process ใน pool โหลดกราฟจากไฟล์ตอนเริ่ม
+    เมื่อกราฟถูกโหลดใหม่ pool เดิมถูกปิด (งานที่ค้างอยู่ทำจนเสร็จ) แล้วสร้าง pool ใหม่ที่โหลดกราฟชุดใหม่
+    """
+    global BATCH_POOL, BATCH_POOL_VERSION
+    version = route_data().version
+    if BATCH_POOL is not None and BATCH_POOL_VERSION != version:
+        BATCH_POOL.close()
+        BATCH_POOL = None
+    if BATCH_POOL is None:
+        BATCH_POOL = POOL_CONTEXT.Pool(processes)
+        BATCH_POOL_VERSION = version
+    return BATCH_POOL
+
+def run_batch(items, processes=None):
+    """
+    ค้นหาเส้นทางของหลายคำขอ (รูปแบบเดียวกับ /find_paths) คำขอที่เหมือนกันค้นหาครั้งเดียว
+    ให้ผลเป็น dict ต่อคำขอ (index ในรายการ, request_id ถ้ามี, status, body) ทันทีที่แต่ละคำขอเสร็จ
+    """
+    pending = {}
+    for i, data in enumerate(items):
+        request_id = data.get("request_id") if isinstance(data, dict) else None
+        params, error = parse_path_request(data) if isinstance(data, dict) else (None, ({"error": "⚠️ คำขอต้องเป็น JSON object"}, 400))
+        if error is not None:
+            body, status = error
+            yield {"index": i, "request_id": request_id, "status": status, "body": body}
+            continue
+        key = request_key(**params)
+        if key not in pending:
+            pending[key] = (params, [])
+        pending[key][1].append((i, request_id))
+
+    current_request().set(requests=len(items), unique_requests=len(pending))
+    # ส่ง overlay รุ่นปัจจุบันไปด้วย process ใน pool ไม่ได้ตรวจไฟล์ disruption และไม่เห็นการอัปเดตผ่าน endpoint
+    disruptions = route_data().disruptions.current
+    work = [(key, params, disruptions) for key, (params, _) in pending.items()]
+    processes = processes or BATCH_PROCESSES
+    if processes > 1 and len(work) > 1:
+        results = get_batch_pool(processes).imap_unordered(solve_pooled_batch_item, work)
+    else:
+        results = map(solve_batch_item, work)
+
+    for key, (body, status) in results:
+        for i, request_id in pending[key][1]:
+            yield {"index": i, "request_id": request_id, "status": status, "body": body}
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request(response):
+    # ใช้ rule ของ route (ไม่ใช่ path ที่ผู้ใช้ส่งมา) เพื่อให้จำนวน label คงที่
+    endpoint = request.url_rule.rule if request.url_rule is not None else "unmatched"
+    METRICS.observe_request(endpoint, response.status_code, time.perf_counter() - g.request_started)
+    return response
 
 @app.route('/find_paths', methods=['POST'])
 def find_paths():
     data = request.get_json()
 
+    with request_log(LOG, "/find_paths") as req, using_route_data():
+        params, error = parse_path_request(data)
+        if error is not None:
+            body, status = error
+            req.set(status=status)
+            return jsonify(body), status
+
+        body, status = solve_path_request(params)
+    with METRICS.phase("serialize"):
+        return jsonify(body), status
+
+@app.route('/find_paths/batch', methods=['POST'])
+def find_paths_batch():
+    data = request.get_json()
+    items = data.get("requests") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({"error": "⚠️ ต้องส่งรายการคำขอ (list หรือ {\"requests\": [...]})"}), 400
+
+    # ส่งผลกลับเป็น NDJSON (หนึ่งบรรทัดต่อคำขอ) ตามลำดับที่แต่ละคำขอเสร็จ
+    def generate():
+        with request_log(LOG, "/find_paths/batch") as req, using_route_data():
+            for result in run_batch(items):
+                req.count(f"status_{result['status']}")
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+@app.route('/matrix', methods=['POST'])
+def matrix():
+    data = request.get_json()
+
+    origins = [str(stop_id) for stop_id in data.get("origins", [])]
+    destinations = [str(stop_id) for stop_id in data.get("destinations", origins)]
+    avoid_nodes = set(map(str, data.get("avoid_nodes", [])))
+    walk_threshold = data.get("walk_threshold", 2)
+    output_format = data.get("format", "json")
+
+    if not origins or not destinations:
+        return jsonify({"error": "⚠️ ต้องระบุ origins และ destinations"}), 400
+    if len(origins) * len(destinations) > MAX_MATRIX_CELLS:
+        return jsonify({"error": f"⚠️ เมทริกซ์ใหญ่เกินไป (ต้นทาง × ปลายทางต้องไม่เกิน {MAX_MATRIX_CELLS})"}), 400
+    graph_data = route_data()
+    missing = sorted({stop_id for stop_id in origins + destinations if stop_id not in graph_data.G})
+    if missing:
+        return jsonify({"error": "⚠️ ไม่พบป้ายในกราฟ", "missing": missing}), 400
+
+    # งบ CPU นับเฉพาะ process นี้ เมทริกซ์ที่กระจายไปยัง pool จึงถูกจำกัดด้วย MAX_MATRIX_CELLS
+    with request_log(LOG, "/matrix", status=200) as req, using_route_data(graph_data):
+        try:
+            with cpu_budget(REQUEST_CPU_BUDGET):
+                times = find_travel_time_matrix(graph_data.G, origins, destinations, walk_threshold, avoid_nodes,
+                                                disruptions=graph_data.disruptions.current)
+        except CpuBudgetExceeded:
+            req.set(status=503)
+            return jsonify({"error": f"⚠️ การคำนวณใช้เวลาเกิน {REQUEST_CPU_BUDGET} วินาที"}), 503
+
+    if output_format == "npy":
+        # ไฟล์ .npy (float64, ไปไม่ถึงเป็น inf) โหลดด้วย np.load ได้โดยตรง
+        buffer = io.BytesIO()
+        np.save(buffer, times)
+        return Response(buffer.getvalue(), mimetype="application/octet-stream"), 200
+
+    # JSON แบบกระชับ: แถวละต้นทาง เป็นวินาทีจำนวนเต็ม และ null สำหรับคู่ที่ไปไม่ถึง
+    rows = [[int(round(time)) if np.isfinite(time) else None for time in row] for row in times.tolist()]
+    return jsonify({"origins": origins, "destinations": destinations, "times": rows}), 200
+
+@app.route('/isochrone', methods=['POST'])
+def isochrone():
+    data = request.get_json()
+
     start_station = str(data.get("start_station"))
-    end_station = str(data.get("end_station"))
     avoid_nodes = set(map(str, data.get("avoid_nodes", [])))
-    must_pass_nodes = set(map(str, data.get("must_pass_nodes", [])))
-    max_paths_to_show = data.get("max_paths", 20)
     walk_threshold = data.get("walk_threshold", 2)
-    max_skipped_paths = data.get("max_skipped_paths", 10)
+    max_time = data.get("max_time_seconds", 1800)
 
-    print("🔍 รับข้อมูลการค้นหาจากผู้ใช้...")
-    is_valid, error_message = validate_nodes(G, start_station, end_station)
-    if not is_valid:
-        print(f"⚠️ ข้อผิดพลาดในการตรวจสอบจุดเริ่มต้นหรือปลายทาง: {error_message}")
-        return jsonify({"error": error_message}), 400
+    graph_data = route_data()
+    if start_station not in graph_data.G:
+        return jsonify({"error": "⚠️ ไม่พบจุดเริ่มต้นในกราฟ"}), 400
+    if not isinstance(max_time, (int, float)) or max_time < 0:
+        return jsonify({"error": "⚠️ max_time_seconds ต้องเป็นตัวเลขที่ไม่ติดลบ"}), 400
 
-    paths = find_paths_with_must_pass(
-        G, start_station, end_station, must_pass_nodes,
-        max_paths=max_paths_to_show,
-        avoid_nodes=avoid_nodes,
-        walk_threshold=walk_threshold,
-        max_skipped=max_skipped_paths
-    )
+    with request_log(LOG, "/isochrone", status=200) as req, using_route_data(graph_data):
+        try:
+            with cpu_budget(REQUEST_CPU_BUDGET):
+                stops = find_isochrone(graph_data.G, start_station, max_time, walk_threshold, avoid_nodes,
+                                       disruptions=graph_data.disruptions.current)
+        except CpuBudgetExceeded:
+            req.set(status=503)
+            return jsonify({"error": f"⚠️ การคำนวณใช้เวลาเกิน {REQUEST_CPU_BUDGET} วินาที"}), 503
+    return jsonify({"start_station": start_station, "max_time_seconds": max_time, "stops": stops}), 200
 
-    if not paths:
-        print("⚠️ ไม่พบเส้นทางที่สามารถเดินทางได้")
-        return jsonify({"message": "⚠️ ไม่มีเส้นทางที่สามารถเดินทางได้"}), 404
+def is_admin_request():
+    return bool(ADMIN_TOKEN) and request.headers.get("X-Admin-Token") == ADMIN_TOKEN
+
+def parse_limit(name, default):
+    """อ่านจำนวนผลลัพธ์จาก query string คืนค่า (จำนวน, None) หรือ (None, ข้อความ error)"""
+    try:
+        value = int(request.args.get(name, default))
+    except ValueError:
+        value = 0
+    if not 1 <= value <= MAX_STOP_RESULTS:
+        return None, f"⚠️ {name} ต้องเป็นจำนวนเต็มตั้งแต่ 1 ถึง {MAX_STOP_RESULTS}"
+    return value, None
+
+@app.route('/stops/nearest', methods=['GET'])
+def stops_nearest():
+    """ป้ายที่ใกล้พิกัดที่สุด: /stops/nearest?lat=13.72&lon=100.45&k=5 (max_distance เป็นเมตร ไม่ระบุคือไม่จำกัด)"""
+    try:
+        lat, lon = float(request.args["lat"]), float(request.args["lon"])
+        max_distance = float(request.args["max_distance"]) if "max_distance" in request.args else None
+    except (KeyError, ValueError):
+        return jsonify({"error": "⚠️ ต้องระบุ lat และ lon เป็นตัวเลข (และ max_distance ถ้ามี)"}), 400
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return jsonify({"error": "⚠️ lat / lon อยู่นอกช่วงของพิกัด"}), 400
+    k, error = parse_limit("k", 5)
+    if error is not None:
+        return jsonify({"error": error}), 400
+
+    data = route_data()
+    stops = [{**STOP_INDEX.describe(idx), "distance_m": round(distance, 1), "in_graph": STOP_INDEX.stop_ids[idx] in data.G}
+             for idx, distance in STOP_INDEX.nearest(lat, lon, k, max_distance)]
+    return jsonify({"lat": lat, "lon": lon, "stops": stops}), 200
+
+@app.route('/stops/search', methods=['GET'])
+def stops_search():
+    """ค้นหาป้ายจากชื่อไทยหรืออังกฤษ: /stops/search?q=bang wa&limit=10 (ขึ้นต้นชื่อ/คำก่อน แล้วจึงชื่อที่ใกล้เคียง)"""
+    query = request.args.get("q", "").strip()
+    if not query:
+        return jsonify({"error": "⚠️ ต้องระบุคำค้น q"}), 400
+    limit, error = parse_limit("limit", 10)
+    if error is not None:
+        return jsonify({"error": error}), 400
 
-    print(f"✅ พบเส้นทางที่สามารถเดินทางได้จำนวน {len(paths)} เส้นทาง")
-    return jsonify({"paths": paths}), 200
+    data = route_data()
+    stops = [{**STOP_INDEX.describe(idx), "match": match, "score": score, "in_graph": STOP_INDEX.stop_ids[idx] in data.G}
+             for idx, match, score in STOP_INDEX.search(query, limit)]
+    return jsonify({"query": query, "stops": stops}), 200
+
+@app.route('/admin/disruptions', methods=['GET', 'POST'])
+def admin_disruptions():
+    if not is_admin_request():
+        return jsonify({"error": "⚠️ ไม่มีสิทธิ์เข้าถึง"}), 403
+    disruptions = route_data().disruptions
+    if request.method == 'GET':
+        return jsonify(disruptions.current.to_dict()), 200
+
+    # ถ้าไม่ได้ตั้ง DISRUPTIONS_PATH การอัปเดตมีผลเฉพาะ process ที่รับคำขอ
+    try:
+        if DISRUPTIONS_PATH:
+            overlay = disruptions.publish(DISRUPTIONS_PATH, request.get_json())
+        else:
+            overlay = disruptions.apply(request.get_json())
+    except ValueError as error:
+        return jsonify({"error": f"⚠️ {error}"}), 400
+    log_event(LOG, logging.INFO, "disruptions_updated", f"🚧 อัปเดต disruption เป็นรุ่น {overlay.version}",
+              version=overlay.version, affected_edges=len(overlay.edge_deltas), closed_stops=len(overlay.closed_stops))
+    return jsonify(overlay.to_dict()), 200
+
+@app.route('/admin/reload', methods=['POST'])
+def admin_reload():
+    """ตรวจไฟล์กราฟทันทีโดยไม่ต้องรอรอบของ watcher ถ้าไฟล์เปลี่ยนจะโหลดใหม่เบื้องหลัง ({"wait": true} เพื่อรอจนเสร็จ)"""
+    if not is_admin_request():
+        return jsonify({"error": "⚠️ ไม่มีสิทธิ์เข้าถึง"}), 403
+    data = request.get_json(silent=True) or {}
+    started = GRAPHS.check(wait=bool(data.get("wait", False)))
+    return jsonify({"reload_started": started, "graph": GRAPHS.stats()}), 200
+
+@app.route('/cost_profiles', methods=['GET'])
+def cost_profiles():
+    return jsonify({name: profile.to_dict() for name, profile in PROFILES.items()}), 200
 
 @app.route('/health', methods=['GET'])
 def health_check():
-    print("🩺 ตรวจสอบสถานะระบบ...")
-    return jsonify({"status": "OK"}), 200
+    log_event(LOG, logging.DEBUG, "health_check", "🩺 ตรวจสอบสถานะระบบ...")
+    data = route_data()
+    overlay = data.disruptions.current
+    return jsonify({"status": "OK", "graph": GRAPHS.stats(), "cache": RESULT_CACHE.stats(), "spt_cache": SPT_CACHE.stats(),
+                    "profile_cache": data.profile_weights.stats(),
+                    "disruptions": {"version": overlay.version,
+                                    "closed_stops": len(overlay.closed_stops),
+                                    "affected_edges": len(overlay.edge_deltas)}}), 200
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    if not METRICS.enabled:
+        return jsonify({"error": "⚠️ metrics ถูกปิดอยู่ (METRICS_ENABLED=0)"}), 404
+    return Response(METRICS.render(), mimetype="text/plain; version=0.0.4"), 200
+
+def start_watchers():
+    """
+    เริ่ม thread ตรวจไฟล์กราฟ (ทุก GRAPH_RELOAD_SECONDS) และไฟล์ DISRUPTIONS_PATH
+    เรียกหลัง fork ในแต่ละ worker เพราะ thread ไม่ถูกคัดลอกไปกับ fork
+    """
+    global DISRUPTION_WATCHER
+    if GRAPH_RELOAD_INTERVAL > 0 and (GRAPHS.watcher is None or not GRAPHS.watcher.is_alive()):
+        GRAPHS.watch(GRAPH_RELOAD_INTERVAL)
+    if DISRUPTIONS_PATH and (DISRUPTION_WATCHER is None or not DISRUPTION_WATCHER.is_alive()):
+        # อัปเดตกราฟชุดที่ใช้อยู่ขณะไฟล์เปลี่ยน (ชุดที่โหลดใหม่รับ disruption ต่อจากชุดเดิมเอง)
+        _, DISRUPTION_WATCHER = watch_file(
+            DISRUPTIONS_PATH, lambda: GRAPHS.current.data.disruptions.load_file(DISRUPTIONS_PATH),
+            on_error=lambda error: log_event(LOG, logging.WARNING, "disruptions_file_error",
+                                             f"⚠️ โหลดไฟล์ disruption ไม่สำเร็จ: {error}", path=DISRUPTIONS_PATH))
+
+def create_app():
+    """
+    app สำหรับ WSGI server หลาย worker (เช่น gunicorn ตาม gunicorn.conf.py)
+    กราฟและข้อมูลทั้งหมดถูกโหลดตอน import โมดูลนี้ เมื่อ server โหลด app ก่อน fork (preload)
+    ทุก worker จึงใช้หน่วยความจำชุดเดียวกันแบบ copy-on-write
+    """
+    return app
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    start_watchers()
+    # ปิด reloader เพื่อไม่ให้โหลดกราฟซ้ำใน process ลูก
+    app.run(host='0.0.0.0', port=5000, debug=True, use_reloader=False)
@@ -2,12 +2,13 @@ import sys
 import networkx as nx
 import csv
 from datetime import timedelta
+from graph_store import load_graph, shortest_simple_paths
 
 # ตั้งค่าการพิมพ์ให้อ่านภาษาไทยได้
 sys.stdout.reconfigure(encoding='utf-8')
 
 # โหลดกราฟจากไฟล์ graph.graphml
-G = nx.read_graphml('graph/graph_updated.graphml')
+G = load_graph('graph/graph_updated.graphml')
 
 # ตรวจสอบว่า node มีอยู่ในกราฟหรือไม่
 def validate_nodes(G, start, end):
@@ -29,7 +30,7 @@ def find_multiple_paths(G, start, end, max_paths=5, avoid_nodes=None, must_pass_
 
     try:
         # ใช้ NetworkX หาเส้นทางที่ดีที่สุด
-        paths_generator = nx.shortest_simple_paths(G, source=start, target=end, weight='weight')
+        paths_generator = shortest_simple_paths(G, source=start, target=end, weight='weight')
         
         for path in paths_generator:
             if len(all_paths) >= max_paths:
@@ -0,0 +1,289 @@
+import os
+import json
+import bisect
+from datetime import timedelta
+import numpy as np
+import pandas as pd
+from trip_edges import SECONDS_PER_DAY, parse_gtfs_time
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+
+ARRAY_DTYPES = {
+    "window_ptr": np.int64,      # จุดเริ่มของช่วงเวลาของแต่ละกลุ่ม (ยาว จำนวนกลุ่ม + 1)
+    "window_start": np.int32,    # เวลาเริ่มของช่วง (วินาที นับจากเที่ยงคืนของวันให้บริการ)
+    "window_end": np.int32,      # เวลาสิ้นสุดของช่วง (ไม่รวม)
+    "window_headway": np.int32,  # headway ของช่วง (วินาที)
+    "offset_ptr": np.int64,      # จุดเริ่มของรายการป้ายของแต่ละกลุ่ม (ยาว จำนวนกลุ่ม + 1)
+    "offset_stop": np.int32,     # รหัสป้าย (ตำแหน่งใน stop_ids) เรียงจากน้อยไปมากภายในกลุ่ม
+    "offset_seconds": np.int32,  # เวลาที่รถใช้จากป้ายแรกของ trip ถึงป้ายนี้ (วินาที)
+}
+
+
+def merge_headway_windows(starts, ends, headways):
+    """
+    รวมช่วงเวลา headway ของหลาย trip ที่อยู่ในกลุ่มเดียวกันให้เป็นช่วงที่ไม่ซ้อนกัน
+    ช่วงที่ซ้อนกันจะรวมความถี่ (1 / headway) เข้าด้วยกัน แล้วรวมช่วงติดกันที่ headway เท่ากัน
+    """
+    breakpoints = np.unique(np.concatenate([starts, ends]))
+    segment_starts, segment_ends = breakpoints[:-1], breakpoints[1:]
+    rate = np.zeros(len(segment_starts))
+    for start, end, headway in zip(starts, ends, headways):
+        covered = (segment_starts >= start) & (segment_ends <= end)
+        rate[covered] += 1.0 / headway
+
+    merged = []
+    for start, end, segment_rate in zip(segment_starts.tolist(), segment_ends.tolist(), rate.tolist()):
+        if segment_rate <= 0:
+            continue
+        headway = int(round(1.0 / segment_rate))
+        if merged and merged[-1][1] == start and merged[-1][2] == headway:
+            merged[-1][1] = end
+        else:
+            merged.append([start, end, headway])
+    return merged
+
+
+class Timetable:
+    """
+    ตารางเวลาแบบ array ของ route ที่วิ่งตามความถี่ (frequencies.txt)
+
+    แต่ละกลุ่ม (route_id, direction_id, service_id) มี
+    - ช่วงเวลาที่ไม่ซ้อนกัน window_ptr[i]:window_ptr[i + 1] ใน window_start / window_end / window_headway
+    - เวลาจากป้ายแรกถึงแต่ละป้าย offset_ptr[i]:offset_ptr[i + 1] ใน offset_stop / offset_seconds
+      (จาก stop_times.txt ถ้ามี ไม่งั้นถือว่าทุกป้ายออกพร้อมป้ายแรก)
+    """
+
+    def __init__(self, arrays, keys, stop_ids, calendar, calendar_dates):
+        for name in ARRAY_DTYPES:
+            setattr(self, name, arrays[name])
+        self.keys = [tuple(key) for key in keys]
+        self.key_index = {key: i for i, key in enumerate(self.keys)}
+        self.stop_ids = list(stop_ids)
+        self.stop_index = {stop_id: i for i, stop_id in enumerate(self.stop_ids)}
+        # calendar: service_id → (วันในสัปดาห์ที่วิ่ง 7 ตัว, start_date, end_date) / calendar_dates: (service_id, date) → exception_type
+        self.calendar = calendar
+        self.calendar_dates = calendar_dates
+
+        self.route_keys = {}
+        for i, (route_id, _, _) in enumerate(self.keys):
+            self.route_keys.setdefault(route_id, []).append(i)
+        # แปลงเป็น list ครั้งเดียว ให้ bisect ได้เร็วโดยไม่ต้องแตะ NumPy ต่อครั้ง
+        window_ptr = self.window_ptr.tolist()
+        self.starts = [self.window_start[window_ptr[i]:window_ptr[i + 1]].tolist() for i in range(len(self.keys))]
+        self.ends = [self.window_end[window_ptr[i]:window_ptr[i + 1]].tolist() for i in range(len(self.keys))]
+        self.headways = [self.window_headway[window_ptr[i]:window_ptr[i + 1]].tolist() for i in range(len(self.keys))]
+        offset_ptr = self.offset_ptr.tolist()
+        self.offset_stops = [self.offset_stop[offset_ptr[i]:offset_ptr[i + 1]].tolist() for i in range(len(self.keys))]
+        self.offsets = [self.offset_seconds[offset_ptr[i]:offset_ptr[i + 1]].tolist() for i in range(len(self.keys))]
+
+    def stop_offset(self, i, stop_id):
+        """เวลาจากป้ายแรกถึง stop_id ของกลุ่ม i (binary search) คืนค่า None ถ้ากลุ่มนี้ไม่ผ่านป้ายนั้น"""
+        if not self.offset_stops[i]:
+            return 0
+        code = self.stop_index.get(stop_id)
+        if code is None:
+            return None
+        stops = self.offset_stops[i]
+        position = bisect.bisect_left(stops, code)
+        if position < len(stops) and stops[position] == code:
+            return self.offsets[i][position]
+        return None
+
+    def services_on(self, date):
+        """service_id ที่ให้บริการในวันที่ date (datetime.date) ตาม calendar.txt และ calendar_dates.txt"""
+        day = date.strftime('%Y%m%d')
+        services = set()
+        for service_id, (weekdays, start_date, end_date) in self.calendar.items():
+            if start_date <= day <= end_date and weekdays[date.weekday()]:
+                services.add(service_id)
+        for (service_id, exception_date), exception_type in self.calendar_dates.items():
+            if exception_date != day:
+                continue
+            if exception_type == 1:
+                services.add(service_id)
+            elif exception_type == 2:
+                services.discard(service_id)
+        return services
+
+    def expected_wait(self, route_id, services, seconds, stop_id=None):
+        """
+        เวลารอเฉลี่ย (วินาที) ของสาย route_id ถ้ามาถึงป้ายตอน seconds (นับจากเที่ยงคืนของวันให้บริการ)
+        - อยู่ในช่วงที่มีรถ: headway / 2 (เลือกทิศทางที่ถี่ที่สุด)
+        - ก่อนช่วงถัดไป: รอจนรถคันแรกของช่วงนั้น
+        ถ้าระบุ stop_id จะเลื่อนช่วงเวลาตามเวลาที่รถใช้จากป้ายแรกถึงป้ายนั้น และข้ามทิศทางที่ไม่ผ่านป้ายนี้
+        คืนค่า None ถ้าวันนั้นไม่มีรถสายนี้แล้ว
+        """
+        best = None
+        for i in self.route_keys.get(route_id, ()):
+            if self.keys[i][2] not in services:
+                continue
+            offset = self.stop_offset(i, stop_id) if stop_id is not None else 0
+            if offset is None:
+                continue
+            seconds_at_first_stop = seconds - offset
+            starts = self.starts[i]
+            position = bisect.bisect_right(starts, seconds_at_first_stop) - 1
+            if position >= 0 and seconds_at_first_stop < self.ends[i][position]:
+                wait = self.headways[i][position] / 2
+            elif position + 1 < len(starts):
+                wait = starts[position + 1] - seconds_at_first_stop
+            else:
+                continue
+            if best is None or wait < best:
+                best = wait
+        return best
+
+    def next_departure(self, route_id, direction_id, service_id, stop_id, seconds):
+        """
+        เวลาออกของรถคันถัดไป (วินาที นับจากเที่ยงคืนของวันให้บริการ) ที่ป้าย stop_id ตั้งแต่ seconds เป็นต้นไป
+        โดยถือว่ารถออกจากป้ายแรกที่ start, start + headway, ... ของแต่ละช่วง (O(log จำนวนช่วง))
+        คืนค่า None ถ้าไม่มีรถแล้วหรือกลุ่มนี้ไม่ผ่านป้ายนั้น
+        """
+        i = self.key_index.get((route_id, direction_id, service_id))
+        if i is None:
+            return None
+        offset = self.stop_offset(i, stop_id)
+        if offset is None:
+            return None
+
+        seconds_at_first_stop = seconds - offset
+        starts, ends, headways = self.starts[i], self.ends[i], self.headways[i]
+        position = bisect.bisect_right(starts, seconds_at_first_stop) - 1
+        if position >= 0 and seconds_at_first_stop < ends[position]:
+            start, headway = starts[position], headways[position]
+            departure = start + -(-(seconds_at_first_stop - start) // headway) * headway
+            if departure < ends[position]:
+                return departure + offset
+        if position + 1 < len(starts):
+            return starts[position + 1] + offset
+        return None
+
+    def wait_function(self, departure):
+        """
+        สร้างฟังก์ชัน wait(route_id, elapsed, stop_id=None) สำหรับคำค้นหาที่ออกเดินทางตอน departure (datetime)
+        คืนค่าเวลารอเมื่อมาถึงป้ายหลังออกเดินทางไป elapsed วินาที หรือ None ถ้าสายนั้นไม่มีรถแล้ว
+
+        คำนวณ service ที่วิ่งในวันนั้น (และเที่ยวหลังเที่ยงคืนของวันก่อนหน้า ที่เวลาเกิน 24:00:00)
+        ครั้งเดียวต่อคำค้นหา สายที่ไม่มีข้อมูลความถี่เลยถือว่าไม่ต้องรอ (เหมือนกราฟแบบคงที่)
+        """
+        start_seconds = departure.hour * 3600 + departure.minute * 60 + departure.second
+        today = self.services_on(departure.date())
+        yesterday = self.services_on(departure.date() - timedelta(days=1))
+
+        def wait(route_id, elapsed, stop_id=None):
+            if route_id not in self.route_keys:
+                return 0
+            seconds = start_seconds + elapsed
+            waits = [
+                self.expected_wait(route_id, today, seconds, stop_id),
+                self.expected_wait(route_id, yesterday, seconds + SECONDS_PER_DAY, stop_id),
+            ]
+            waits = [value for value in waits if value is not None]
+            return min(waits) if waits else None
+
+        return wait
+
+
+def build_stop_offsets(gtfs_dir, data):
+    """
+    เวลาจากป้ายแรกของ trip ถึงแต่ละป้าย ต่อกลุ่ม (route_id, direction_id, service_id) จาก stop_times.txt
+    ถ้าหลาย trip ในกลุ่มผ่านป้ายเดียวกันจะใช้ค่าที่น้อยที่สุด คืนค่า DataFrame ว่างถ้าไม่มี stop_times.txt
+    """
+    columns = ['route_id', 'direction_id', 'service_id', 'stop_id', 'offset']
+    stop_times_path = os.path.join(gtfs_dir, 'stop_times.txt')
+    if not os.path.exists(stop_times_path):
+        return pd.DataFrame(columns=columns)
+
+    stop_times = pd.read_csv(stop_times_path, dtype=str, usecols=['trip_id', 'stop_id', 'departure_time'])
+    trip_keys = data[['trip_id', 'route_id', 'direction_id', 'service_id']].drop_duplicates('trip_id')
+    stop_times = pd.merge(stop_times, trip_keys, on='trip_id')
+    stop_times['departure'] = parse_gtfs_time(stop_times['departure_time'])
+    stop_times = stop_times.dropna(subset=['departure'])
+    stop_times['offset'] = stop_times['departure'] - stop_times.groupby('trip_id')['departure'].transform('min')
+    return stop_times.groupby(columns[:-1], as_index=False)['offset'].min()
+
+
+def build_timetable(gtfs_dir='namtang-gtfs'):
+    """สร้าง Timetable จาก trips.txt, frequencies.txt, stop_times.txt, calendar.txt และ calendar_dates.txt"""
+    trips = pd.read_csv(os.path.join(gtfs_dir, 'trips.txt'), dtype=str)
+    frequencies = pd.read_csv(os.path.join(gtfs_dir, 'frequencies.txt'), dtype=str)
+    calendar = pd.read_csv(os.path.join(gtfs_dir, 'calendar.txt'), dtype=str)
+    calendar_dates = pd.read_csv(os.path.join(gtfs_dir, 'calendar_dates.txt'), dtype=str)
+
+    data = pd.merge(frequencies, trips[['trip_id', 'route_id', 'direction_id', 'service_id']], on='trip_id')
+    data['direction_id'] = data['direction_id'].fillna('0')
+    data['start'] = parse_gtfs_time(data['start_time'])
+    data['end'] = parse_gtfs_time(data['end_time'])
+    data['headway'] = pd.to_numeric(data['headway_secs'], errors='coerce')
+    data = data.dropna(subset=['start', 'end', 'headway'])
+    data = data[data['headway'] > 0]
+
+    offsets = build_stop_offsets(gtfs_dir, data)
+    stop_ids = sorted(offsets['stop_id'].unique().tolist())
+    stop_code = {stop_id: i for i, stop_id in enumerate(stop_ids)}
+    offset_groups = {key: group for key, group in offsets.groupby(['route_id', 'direction_id', 'service_id'])}
+
+    keys = []
+    window_ptr, offset_ptr = [0], [0]
+    windows, stop_offsets = [], []
+    for key, group in data.groupby(['route_id', 'direction_id', 'service_id'], sort=True):
+        merged = merge_headway_windows(group['start'].to_numpy(), group['end'].to_numpy(), group['headway'].to_numpy())
+        if not merged:
+            continue
+        keys.append(key)
+        windows.extend(merged)
+        window_ptr.append(len(windows))
+
+        if key in offset_groups:
+            stop_offsets.extend(sorted(
+                (stop_code[stop_id], int(offset))
+                for stop_id, offset in zip(offset_groups[key]['stop_id'], offset_groups[key]['offset'])
+            ))
+        offset_ptr.append(len(stop_offsets))
+
+    windows = np.asarray(windows, dtype=np.int32).reshape(-1, 3)
+    stop_offsets = np.asarray(stop_offsets, dtype=np.int32).reshape(-1, 2)
+    arrays = {
+        "window_ptr": window_ptr,
+        "window_start": windows[:, 0],
+        "window_end": windows[:, 1],
+        "window_headway": windows[:, 2],
+        "offset_ptr": offset_ptr,
+        "offset_stop": stop_offsets[:, 0],
+        "offset_seconds": stop_offsets[:, 1],
+    }
+    arrays = {name: np.asarray(values, dtype=ARRAY_DTYPES[name]) for name, values in arrays.items()}
+
+    calendar_table = {
+        row['service_id']: ([row[day] == '1' for day in WEEKDAYS], row['start_date'], row['end_date'])
+        for _, row in calendar.iterrows()
+    }
+    calendar_dates_table = {
+        (row['service_id'], row['date']): int(row['exception_type'])
+        for _, row in calendar_dates.iterrows()
+    }
+    return Timetable(arrays, keys, stop_ids, calendar_table, calendar_dates_table)
+
+
+def save_timetable(timetable, path):
+    """บันทึก Timetable เป็นไฟล์ .npz (array ตามชื่อใน ARRAY_DTYPES และข้อมูลอื่นเป็น JSON)"""
+    metadata = json.dumps({
+        "keys": timetable.keys,
+        "stop_ids": timetable.stop_ids,
+        "calendar": timetable.calendar,
+        "calendar_dates": [[service_id, date, exception_type]
+                           for (service_id, date), exception_type in timetable.calendar_dates.items()],
+    }, ensure_ascii=False).encode('utf-8')
+    arrays = {name: getattr(timetable, name) for name in ARRAY_DTYPES}
+    with open(path, 'wb') as file:
+        np.savez(file, metadata=np.frombuffer(metadata, dtype=np.uint8), **arrays)
+
+
+def load_timetable(path):
+    """โหลด Timetable ที่ save_timetable บันทึกไว้"""
+    with np.load(path) as data:
+        metadata = json.loads(data['metadata'].tobytes().decode('utf-8'))
+        arrays = {name: data[name] for name in ARRAY_DTYPES}
+    calendar = {service_id: tuple(value) for service_id, value in metadata['calendar'].items()}
+    calendar_dates = {(service_id, date): exception_type for service_id, date, exception_type in metadata['calendar_dates']}
+    return Timetable(arrays, metadata['keys'], metadata['stop_ids'], calendar, calendar_dates)
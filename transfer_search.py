@@ -0,0 +1,219 @@
+import heapq
+from time import perf_counter
+from path_search import DEADLINE_CHECK_INTERVAL
+from serving import check_cpu_budget
+
+MAX_TRANSFERS = 8  # จำนวนครั้งเปลี่ยนสายสูงสุดที่ค้นหา (นับช่วงเดินด้วย จำนวนรอบ = MAX_TRANSFERS + 1)
+
+
+def is_dominated(bag, time, walks):
+    """มี label ใน bag ที่เวลาและจำนวนครั้งเดินไม่มากกว่าหรือไม่"""
+    return any(t <= time and w <= walks for t, w in bag)
+
+
+def add_to_bag(bags, stop, time, walks):
+    bag = [(t, w) for t, w in bags.get(stop, ()) if not (time <= t and walks <= w)]
+    bag.append((time, walks))
+    bags[stop] = bag
+
+
+def unwind_ride(pred, board, stop):
+    """ไล่ pred จากป้ายลงกลับไปป้ายขึ้น คืนค่าช่วงที่นั่งเป็น [(ป้าย, เวลาของ edge)]"""
+    ride = []
+    while stop != board:
+        previous, edge_time = pred[stop]
+        ride.append((stop, edge_time))
+        stop = previous
+    return ride[::-1]
+
+
+def pareto_transfer_paths(graph, source, target, max_transfers=MAX_TRANSFERS, avoid_nodes=None, walk_threshold=None,
+                          boarding_wait=None, stats=None, max_expansions=None, deadline=None, edge_deltas=None,
+                          walk_scale=1.0):
+    """
+    ค้นหาแบบแบ่งรอบ (RAPTOR) บน CompiledGraph ให้ได้ชุด Pareto ของ (จำนวนครั้งเปลี่ยนสาย, เวลาเดินทาง)
+
+    รอบที่ n คือการนั่งสายที่ n: จากทุกป้ายที่ดีขึ้นในรอบก่อน ลองขึ้นทุกสายที่ผ่านป้ายนั้น
+    แล้วนั่งต่อไปตาม edge ที่มีสายเดียวกัน (การเดินต่อเนื่องนับเป็นหนึ่งช่วงเหมือนใน path_details)
+    ป้ายจะถูกบันทึกเฉพาะเมื่อ (เวลา, จำนวนครั้งเดิน) ไม่ถูกครอบโดยรอบที่เปลี่ยนสายน้อยกว่า
+    เวลาของแต่ละช่วงใช้เวลาของสายนั้นบน edge (route_min_times) ไม่ใช่ของสายที่เร็วที่สุด
+
+    boarding_wait(route_id, elapsed, stop_id) (เช่นจาก Timetable.wait_function) ใช้ค้นหาแบบขึ้นกับเวลา:
+    บวกเวลารอรถก่อนขึ้นแต่ละสาย และข้ามสายที่คืนค่า None (ไม่มีรถในวัน/เวลานั้น)
+    walk_scale: เวลาจริงของ edge WALK เท่ากับเวลาในกราฟ × walk_scale (เช่น WALK_TIME_SCALE ของ describe_path)
+    นาฬิกาที่ใช้ถามเวลารอรถเดินตามเวลาจริงนี้ ส่วนการจัดอันดับและชุด Pareto ยังใช้เวลาในกราฟ (ที่ถ่วงการเดินไว้)
+    edge_deltas (ถ้ามี) คือ dict ตำแหน่ง edge → เวลาที่บวกเพิ่มให้ทุกสายบน edge (inf = ผ่านไม่ได้)
+    เช่นจาก disruptions.DisruptionOverlay.ride_deltas
+
+    คืนค่า list ของ (num_route_changes, cost, walk_count, path, assigned_routes, waits)
+    เรียงจากเปลี่ยนสายน้อยไปมาก โดย assigned_routes คือ list ของ (route_id, travel_time) ต่อ edge
+    และ waits คือเวลารอก่อนขึ้นแต่ละช่วง (หนึ่งค่าต่อช่วงของ path_details)
+
+    stats / max_expansions / deadline ใช้เหมือนใน k_shortest_feasible_paths (นับป้ายที่ถูกขยายในทุกรอบ)
+    เมื่อหมดงบจะคืนชุด Pareto ของเส้นทางที่ไปถึงปลายทางแล้ว
+    """
+    index = graph.index
+    if source not in index or target not in index:
+        return []
+
+    blocked = {index[stop_id] for stop_id in (avoid_nodes or ()) if stop_id in index}
+    source, target = index[source], index[target]
+    if source in blocked or target in blocked:
+        return []
+
+    indptr, indices = graph.indptr, graph.indices
+    route_ptr, route_list, route_min_times = graph.route_ptr, graph.route_list, graph.route_min_times
+    walk_code = graph.walk_code
+    max_walks = walk_threshold if walk_threshold is not None else float('inf')
+    expanded = 0
+    truncated = False
+
+    def out_of_budget():
+        nonlocal truncated
+        if expanded % DEADLINE_CHECK_INTERVAL == 0:
+            check_cpu_budget()
+        if (max_expansions is not None and expanded >= max_expansions) or (
+            deadline is not None and expanded % DEADLINE_CHECK_INTERVAL == 0 and perf_counter() > deadline
+        ):
+            truncated = True
+        return truncated
+
+    def route_edges_from(u, route_code):
+        """edge ที่ออกจาก u และมีสาย route_code วิ่งผ่าน คืนค่า (v, travel_time) รวม edge_deltas แล้ว"""
+        a, b = int(indptr[u]), int(indptr[u + 1])
+        for k, v in zip(range(a, b), indices[a:b].tolist()):
+            delta = edge_deltas.get(k, 0) if edge_deltas else 0
+            if delta == float('inf'):
+                continue
+            ra, rb = int(route_ptr[k]), int(route_ptr[k + 1])
+            codes = route_list[ra:rb].tolist()
+            if route_code in codes:
+                yield v, int(route_min_times[ra + codes.index(route_code)]) + delta
+
+    def routes_at(u):
+        a, b = int(indptr[u]), int(indptr[u + 1])
+        return set(route_list[int(route_ptr[a]):int(route_ptr[b])].tolist())
+
+    def ride_route(board, route_code, start_time, start_clock, start_walks):
+        """
+        นั่งสาย route_code จากป้าย board ไปเรื่อย ๆ (Dijkstra เฉพาะ edge ของสายนี้)
+        ให้ผลเป็น (ป้าย, เวลา, นาฬิกา, จำนวนครั้งเดิน, pred) ของทุกป้ายที่ไปถึง (ใช้ pred กับ unwind_ride)
+        """
+        nonlocal expanded
+        step = 1 if route_code == walk_code else 0
+        scale = walk_scale if route_code == walk_code else 1
+        dist = {board: start_time}
+        clock = {board: start_clock}
+        pred = {board: (-1, 0)}
+        hops = {board: 0}
+        heap = [(start_time, board)]
+        done = set()
+        while heap:
+            time, u = heapq.heappop(heap)
+            if u in done:
+                continue
+            done.add(u)
+            expanded += 1
+            if out_of_budget():
+                return
+            walks = start_walks + step * hops[u]
+
+            if u != board:
+                yield u, time, clock[u], walks, pred
+
+            if u == target or walks + step > max_walks:
+                continue
+            for v, edge_time in route_edges_from(u, route_code):
+                if v in blocked or v in done:
+                    continue
+                if time + edge_time < dist.get(v, float('inf')):
+                    dist[v] = time + edge_time
+                    clock[v] = clock[u] + edge_time * scale
+                    pred[v] = (u, edge_time)
+                    hops[v] = hops[u] + 1
+                    heapq.heappush(heap, (time + edge_time, v))
+
+    # ข้อมูลของแต่ละ label: ป้าย, เวลา, จำนวนครั้งเดิน, label ก่อนหน้า, สายที่นั่งมา, ช่วงที่นั่ง
+    label_stop = [source]
+    label_time = [0]
+    label_clock = [0]
+    label_walks = [0]
+    label_parent = [-1]
+    label_route = [-1]
+    label_ride = [[]]
+    label_wait = [0]
+
+    bags = {source: [(0, 0)]}
+    target_labels = []
+    marked = [0]
+
+    for _ in range(max_transfers + 1):
+        new_marked = []
+        for label in marked:
+            board = label_stop[label]
+            for route_code in routes_at(board):
+                if route_code == label_route[label]:
+                    continue  # นั่งสายเดิมต่อถูกคิดไว้แล้วในรอบก่อน
+
+                wait = 0
+                if boarding_wait is not None and route_code != walk_code:
+                    wait = boarding_wait(graph.route_names[route_code], label_clock[label], graph.stop_ids[board])
+                    if wait is None:
+                        continue
+
+                for stop, time, clock, walks, pred in ride_route(board, route_code, label_time[label] + wait,
+                                                                 label_clock[label] + wait, label_walks[label]):
+                    if is_dominated(bags.get(stop, ()), time, walks) or is_dominated(bags.get(target, ()), time, walks):
+                        continue
+                    label_stop.append(stop)
+                    label_time.append(time)
+                    label_clock.append(clock)
+                    label_walks.append(walks)
+                    label_parent.append(label)
+                    label_route.append(route_code)
+                    label_ride.append(unwind_ride(pred, board, stop))
+                    label_wait.append(wait)
+                    add_to_bag(bags, stop, time, walks)
+                    if stop == target:
+                        target_labels.append(len(label_stop) - 1)
+                    else:
+                        new_marked.append(len(label_stop) - 1)
+                if truncated:
+                    break
+            if truncated:
+                break
+        if truncated or not new_marked:
+            break
+        marked = new_marked
+
+    if stats is not None:
+        stats["nodes_expanded"] = stats.get("nodes_expanded", 0) + expanded
+        if truncated:
+            stats["truncated"] = True
+
+    results = []
+    for label in target_labels:
+        rides = []
+        node = label
+        while label_parent[node] != -1:
+            rides.append(node)
+            node = label_parent[node]
+        rides.reverse()
+
+        path = [graph.stop_ids[source]]
+        assigned_routes = []
+        waits = [label_wait[ride_label] for ride_label in rides]
+        for ride_label in rides:
+            route_id = graph.route_names[label_route[ride_label]]
+            for stop, edge_time in label_ride[ride_label]:
+                path.append(graph.stop_ids[stop])
+                assigned_routes.append((route_id, edge_time))
+        results.append((len(rides) - 1, label_time[label], label_walks[label], path, assigned_routes, waits))
+
+    # เก็บเฉพาะชุด Pareto ของ (เปลี่ยนสาย, เวลา)
+    results.sort(key=lambda result: (result[0], result[1]))
+    pareto = []
+    for result in results:
+        if not pareto or result[1] < pareto[-1][1]:
+            pareto.append(result)
+    return pareto
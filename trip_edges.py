@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def parse_gtfs_time(times):
+    """
+    แปลงเวลา GTFS แบบ "HH:MM:SS" เป็นจำนวนวินาที (float เพื่อรองรับค่าว่าง)
+    รองรับเวลาที่เกิน 24:00:00 (เช่น "25:10:00" ของเที่ยวที่ข้ามเที่ยงคืน)
+    """
+    parts = times.astype(str).str.strip().str.split(':', expand=True)
+    hours = pd.to_numeric(parts[0], errors='coerce')
+    minutes = pd.to_numeric(parts[1], errors='coerce')
+    seconds = pd.to_numeric(parts[2], errors='coerce')
+    return (hours * 3600 + minutes * 60 + seconds).to_numpy(dtype=np.float64)
+
+
+def build_trip_edges(stop_times, trips):
+    """
+    สร้างตาราง edge ระหว่างป้ายที่ติดกันในแต่ละ trip ในรอบเดียวด้วย NumPy
+
+    คืนค่า DataFrame คอลัมน์ from_stop, to_stop, route_id, travel_time (วินาที)
+    เรียงตาม trip_id และ stop_sequence เหมือนลำดับที่ลูปเดิมเพิ่ม edge ลงกราฟ
+    """
+    data = pd.merge(stop_times, trips[['trip_id', 'route_id']], on='trip_id')
+
+    sort_columns = ['trip_id', 'stop_sequence'] if 'stop_sequence' in data.columns else ['trip_id']
+    data = data.sort_values(sort_columns, kind='mergesort')
+
+    trip_ids = data['trip_id'].to_numpy()
+    stop_ids = data['stop_id'].astype(str).to_numpy()
+    route_ids = data['route_id'].to_numpy()
+    arrival = parse_gtfs_time(data['arrival_time'])
+    departure = parse_gtfs_time(data['departure_time'])
+
+    # แถวถัดไปต้องอยู่ใน trip เดียวกันถึงจะเป็น edge
+    same_trip = trip_ids[1:] == trip_ids[:-1]
+    travel_time = arrival[1:] - departure[:-1]
+    valid = same_trip & ~np.isnan(travel_time)
+
+    # ใช้ modulo หนึ่งวันให้ได้ค่าเหมือน timedelta.seconds ของโค้ดเดิม
+    travel_time = np.mod(travel_time[valid], SECONDS_PER_DAY).astype(np.int64)
+
+    return pd.DataFrame({
+        'from_stop': stop_ids[:-1][valid],
+        'to_stop': stop_ids[1:][valid],
+        'route_id': route_ids[:-1][valid],
+        'travel_time': travel_time
+    })
@@ -0,0 +1,104 @@
+import numpy as np
+from geopy.distance import geodesic  # ใช้คำนวณระยะทางจริงเฉพาะคู่ป้ายที่ผ่านการคัดกรอง
+
+WALKING_SPEED = 1.39  # ความเร็วเดินเฉลี่ย (เมตรต่อวินาที)
+WALKING_DISTANCE_THRESHOLD = 400  # จำกัดระยะห่างของป้ายที่สามารถเดินถึงกัน (เมตร)
+WALKING_WEIGHT_MULTIPLIER = 10  # ตัวคูณ weight ของ edge WALK ที่ modify_weight.py ใช้ (ให้การค้นหาเลี่ยงการเดิน)
+
+EARTH_RADIUS_M = 6371008.8  # รัศมีเฉลี่ยของโลก (เมตร)
+
+# haversine บนทรงกลมคลาดจาก geodesic บนทรงรี WGS-84 ได้ไม่เกินราว 0.6%
+# จึงเผื่อระยะตอนคัดกรอง แล้วค่อยตัดสินด้วย geodesic อีกครั้ง
+HAVERSINE_MARGIN = 1.01
+
+# ทิศทางของช่อง grid ที่ต้องจับคู่ (ครึ่งหนึ่งของช่องรอบข้าง เพื่อไม่ให้ได้คู่ซ้ำ)
+NEIGHBOUR_CELLS = [(0, 1), (1, -1), (1, 0), (1, 1)]
+
+
+def haversine_m(lat1, lon1, lat2, lon2):
+    """คำนวณระยะทาง haversine (เมตร) แบบ vectorized บน NumPy array"""
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def grid_cells(lats, lons, cell_size):
+    """แปลงพิกัดเป็นเลขช่อง grid (x, y) ขนาด cell_size เมตร บนระนาบ equirectangular"""
+    # ใช้ละติจูดที่ห่างเส้นศูนย์สูตรที่สุดเป็นตัวย่อแกน x ระยะที่ฉายได้จึงไม่เกินระยะจริง
+    # ทำให้คู่ที่อยู่ในรัศมีตกอยู่ในช่องเดียวกันหรือช่องติดกันเสมอ
+    lat0 = np.radians(np.max(np.abs(lats)))
+    x = np.radians(lons) * np.cos(lat0) * EARTH_RADIUS_M
+    y = np.radians(lats) * EARTH_RADIUS_M
+    return np.floor(x / cell_size).astype(np.int64), np.floor(y / cell_size).astype(np.int64)
+
+
+def candidate_pairs(lats, lons, max_distance):
+    """
+    หาคู่ป้าย (i, j) ที่ i < j และ haversine ไม่เกิน max_distance (เผื่อ HAVERSINE_MARGIN)
+    โดยจับคู่เฉพาะป้ายในช่อง grid เดียวกันหรือช่องติดกันเท่านั้น
+    """
+    radius = max_distance * HAVERSINE_MARGIN
+    cx, cy = grid_cells(lats, lons, radius)
+
+    buckets = {}
+    for idx, cell in enumerate(zip(cx.tolist(), cy.tolist())):
+        buckets.setdefault(cell, []).append(idx)
+    buckets = {cell: np.array(members, dtype=np.int64) for cell, members in buckets.items()}
+
+    pairs_i, pairs_j = [], []
+    for (x, y), members in buckets.items():
+        # คู่ภายในช่องเดียวกัน
+        if len(members) > 1:
+            ii, jj = np.triu_indices(len(members), k=1)
+            pairs_i.append(members[ii])
+            pairs_j.append(members[jj])
+
+        # คู่กับช่องข้างเคียง
+        for dx, dy in NEIGHBOUR_CELLS:
+            others = buckets.get((x + dx, y + dy))
+            if others is None:
+                continue
+            pairs_i.append(np.repeat(members, len(others)))
+            pairs_j.append(np.tile(others, len(members)))
+
+    if not pairs_i:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty
+
+    i = np.concatenate(pairs_i)
+    j = np.concatenate(pairs_j)
+    # ให้ i < j เสมอ เหมือนลูปเดิม
+    i, j = np.minimum(i, j), np.maximum(i, j)
+
+    distance = haversine_m(lats[i], lons[i], lats[j], lons[j])
+    keep = distance <= radius
+    i, j = i[keep], j[keep]
+
+    order = np.lexsort((j, i))
+    return i[order], j[order]
+
+
+def build_walking_edges(stop_ids, lats, lons, max_distance=WALKING_DISTANCE_THRESHOLD, speed=WALKING_SPEED):
+    """
+    สร้าง edge การเดินระหว่างป้ายที่อยู่ห่างกันไม่เกิน max_distance เมตร
+
+    คืนค่าเป็น list ของ (stop_1_id, stop_2_id, weight) ทั้งสองทิศทาง
+    โดย weight = int(ระยะ geodesic / speed) เหมือนลูปเดิมใน create_graph.py
+    """
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+    stop_ids = [str(stop_id) for stop_id in stop_ids]
+
+    pairs_i, pairs_j = candidate_pairs(lats, lons, max_distance)
+
+    lat_list, lon_list = lats.tolist(), lons.tolist()
+
+    edges = []
+    for i, j in zip(pairs_i.tolist(), pairs_j.tolist()):
+        distance = geodesic((lat_list[i], lon_list[i]), (lat_list[j], lon_list[j])).meters
+        if distance <= max_distance:
+            walking_time = int(distance / speed)
+            edges.append((stop_ids[i], stop_ids[j], walking_time))
+            edges.append((stop_ids[j], stop_ids[i], walking_time))  # เดินกลับได้
+
+    return edges